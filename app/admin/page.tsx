@@ -77,6 +77,38 @@ export default function AdminPage() {
     };
 
     fetchReports();
+
+    // Live updates instead of re-fetching the whole list; EventSource can't
+    // send an Authorization header, so the token goes in the query string
+    const token = localStorage.getItem("access_token");
+    if (!token) return;
+    const events = new EventSource(
+      `http://localhost:8000/api/reports/stream/?token=${encodeURIComponent(token)}`
+    );
+    const refetch = () => fetchReports();
+    // Only bulk imports and missed events (reset) need the whole list again
+    events.addEventListener("bulk_created", refetch);
+    events.addEventListener("reset", refetch);
+    events.addEventListener("created", (event) => {
+      const report: Report = JSON.parse((event as MessageEvent).data);
+      setReports((prev) =>
+        prev.some((existing) => existing.id === report.id) ? prev : [report, ...prev]
+      );
+    });
+    events.addEventListener("archived", (event) => {
+      const { id } = JSON.parse((event as MessageEvent).data);
+      setReports((prev) => prev.filter((report) => report.id !== id));
+    });
+    events.addEventListener("updated", (event) => {
+      const changes = JSON.parse((event as MessageEvent).data);
+      setReports((prev) =>
+        prev.map((report) =>
+          report.id === changes.id ? { ...report, ...changes } : report
+        )
+      );
+    });
+
+    return () => events.close();
   }, []);
 
   useEffect(() => {
@@ -0,0 +1,68 @@
+"""
+Per-request cost of resolving the user id from a bearer token, without the
+MongoDB user lookup that follows it.
+
+    python -m benchmarks.bench_auth
+
+"before" builds a JWTAuthentication and verifies the signature on every
+call (the old get_user_from_token); "cached" is waste_reports.authentication
+with a warm validated-token cache; "cache miss" is the first call of each
+new token.
+"""
+from .common import configure_django, measure, print_table
+
+configure_django(
+    SECRET_KEY='bench-secret-key-that-is-long-enough-for-hs256',
+    INSTALLED_APPS=['django.contrib.contenttypes', 'django.contrib.auth'],
+    DATABASES={},
+)
+
+import django  # noqa: E402
+
+django.setup()
+
+from bson import ObjectId  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from rest_framework_simplejwt.authentication import JWTAuthentication  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from waste_reports.authentication import token_cache, user_id_from_request  # noqa: E402
+
+
+def make_request(factory):
+    token = AccessToken()
+    token['user_id'] = str(ObjectId())
+    return factory.get('/api/reports/', HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+def before(request):
+    jwt_auth = JWTAuthentication()
+    validated = jwt_auth.get_validated_token(jwt_auth.get_raw_token(jwt_auth.get_header(request)))
+    return validated.get('user_id')
+
+
+def main():
+    factory = RequestFactory()
+    request = make_request(factory)
+    fresh = [make_request(factory) for _ in range(20000)]
+    position = {'i': 0}
+
+    def miss():
+        # A token the cache has not seen yet
+        position['i'] = (position['i'] + 1) % len(fresh)
+        if position['i'] == 0:
+            token_cache.clear()
+        return user_id_from_request(fresh[position['i']])
+
+    user_id_from_request(request)
+    rows = [
+        ('before (verify every call)', measure(lambda: before(request))),
+        ('cached', measure(lambda: user_id_from_request(request))),
+        ('cache miss', measure(miss, repeat=3)),
+    ]
+    print_table("Token -> user_id per request", rows)
+    print(f"  speedup: {rows[0][1]['median'] / rows[1][1]['median']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
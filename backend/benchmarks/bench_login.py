@@ -0,0 +1,105 @@
+"""
+Login throughput next to read traffic: PBKDF2 inline in request threads vs
+the spawned hashing pool (waste_reports.passwords).
+
+    python -m benchmarks.bench_login [--duration 10] [--login-threads 8] [--read-threads 4]
+
+Login threads verify a password against a default-iteration PBKDF2 hash in
+a loop, the way a burst of logins would. Read threads stand in for list
+requests (1 ms of waiting on MongoDB, then rendering 100 reports). The
+numbers to compare are read latency while logins are running and how many
+logins were turned away (503) instead of piling up.
+"""
+import argparse
+import threading
+import time
+
+from .common import configure_django, format_seconds, percentile
+
+configure_django()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from waste_reports.passwords import HashingPoolSaturated, PasswordHashPool  # noqa: E402
+from waste_reports.renderers import ORJSONRenderer  # noqa: E402
+
+from .bench_renderers import make_reports  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def run(pool, duration, login_threads, read_threads):
+    encoded = make_password(PASSWORD)
+    payload = make_reports(100)
+    renderer = ORJSONRenderer()
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    logins = {'ok': 0, 'busy': 0}
+    reads = []
+
+    def login():
+        while time.monotonic() < deadline:
+            try:
+                pool.verify(PASSWORD, encoded)
+                outcome = 'ok'
+            except HashingPoolSaturated:
+                outcome = 'busy'
+                time.sleep(0.05)  # a client backing off on 503
+            with lock:
+                logins[outcome] += 1
+
+    def read():
+        latencies = []
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            time.sleep(0.001)
+            renderer.render(payload)
+            latencies.append(time.perf_counter() - started)
+        with lock:
+            reads.extend(latencies)
+
+    threads = ([threading.Thread(target=login) for _ in range(login_threads)]
+               + [threading.Thread(target=read) for _ in range(read_threads)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reads.sort()
+    return {
+        'logins_per_second': logins['ok'] / duration,
+        'busy': logins['busy'],
+        'reads_per_second': len(reads) / duration,
+        'read_p50': percentile(reads, 50),
+        'read_p99': percentile(reads, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput alongside read traffic")
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--read-threads', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2, help="Hashing pool processes")
+    parser.add_argument('--max-pending', type=int, default=4)
+    options = parser.parse_args()
+
+    cases = [
+        ('reads only', PasswordHashPool(workers=0), 0),
+        ('inline hashing', PasswordHashPool(workers=0, max_pending=options.login_threads), options.login_threads),
+        (f'pool, {options.workers} workers', PasswordHashPool(workers=options.workers, max_pending=options.max_pending),
+         options.login_threads),
+    ]
+    print(f"{options.login_threads} login threads, {options.read_threads} read threads, {options.duration:g}s each")
+    print(f"  {'case':<20} {'logins/s':>9} {'503s':>6} {'reads/s':>9} {'read p50':>11} {'read p99':>11}")
+    for label, pool, login_threads in cases:
+        if pool.workers:
+            pool.hash('warm up')  # start the worker processes outside the measurement
+        result = run(pool, options.duration, login_threads, options.read_threads)
+        pool.shutdown()
+        print(f"  {label:<20} {result['logins_per_second']:>9.1f} {result['busy']:>6} "
+              f"{result['reads_per_second']:>9.0f} {format_seconds(result['read_p50'])} "
+              f"{format_seconds(result['read_p99'])}")
+
+
+if __name__ == '__main__':
+    main()
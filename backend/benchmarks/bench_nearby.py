@@ -0,0 +1,118 @@
+"""
+reports/near/ lookups: in-process grid index vs MongoDB $near / $geoWithin.
+
+    python -m benchmarks.bench_nearby
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_nearby
+
+The MongoDB side loads the same synthetic reports into a scratch database
+(bench_nearby, dropped afterwards) and is skipped when BENCH_MONGODB_URI is unset.
+"""
+import os
+import random
+from datetime import datetime
+
+from bson import ObjectId
+
+from .common import configure_django, measure, print_table
+
+configure_django()
+
+from waste_reports.spatial_index import PROJECTION, GridIndex  # noqa: E402
+
+CENTRE = (77.5946, 12.9716)
+SIZES = (10000, 100000)
+RADII = (500, 1000, 5000)
+VIEWPORT = 0.02  # degrees, roughly a zoomed-in map
+
+
+def make_reports(count, seed=42):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'description': 'Garbage pile near the park entrance, not collected for days',
+        'status': rng.choice(['Pending', 'In Progress', 'Resolved']),
+        'location': {
+            'type': 'Point',
+            'coordinates': [CENTRE[0] + rng.gauss(0, 0.05), CENTRE[1] + rng.gauss(0, 0.05)]
+        },
+        'image_url': None,
+        'created_at': now,
+        'urgency_count': 0,
+        'category': 'Cleanliness',
+        'ward_id': None
+    } for _ in range(count)]
+
+
+def query_points(count=200, seed=7):
+    rng = random.Random(seed)
+    return [(CENTRE[0] + rng.gauss(0, 0.04), CENTRE[1] + rng.gauss(0, 0.04)) for _ in range(count)]
+
+
+def cycle(points):
+    """fn() that walks through the query points, one per call"""
+    state = {'i': 0}
+
+    def next_point():
+        state['i'] = (state['i'] + 1) % len(points)
+        return points[state['i']]
+    return next_point
+
+
+def mongo_collection(reports):
+    uri = os.environ.get('BENCH_MONGODB_URI')
+    if not uri:
+        return None
+    from pymongo import MongoClient
+    collection = MongoClient(uri).bench_nearby.reports
+    collection.drop()
+    collection.insert_many(reports)
+    collection.create_index([('location', '2dsphere')])
+    return collection
+
+
+def main():
+    points = query_points()
+    for size in SIZES:
+        reports = make_reports(size)
+        grid = GridIndex(0.01)
+        for report in reports:
+            grid.upsert(report)
+        collection = mongo_collection(reports)
+
+        rows = []
+        for radius in RADII:
+            point = cycle(points)
+            rows.append((f"grid near {radius} m", measure(lambda: grid.near(*point(), radius), repeat=5)))
+            if collection is not None:
+                point = cycle(points)
+                rows.append((f"mongo $near {radius} m", measure(lambda: list(collection.find({
+                    'location': {'$near': {
+                        '$geometry': {'type': 'Point', 'coordinates': list(point())},
+                        '$maxDistance': radius
+                    }}
+                }, PROJECTION)), repeat=5)))
+
+        point = cycle(points)
+
+        def viewport():
+            lng, lat = point()
+            return lng - VIEWPORT / 2, lat - VIEWPORT / 2, lng + VIEWPORT / 2, lat + VIEWPORT / 2
+        rows.append(("grid bbox", measure(lambda: grid.within_bbox(*viewport()), repeat=5)))
+        if collection is not None:
+            def mongo_bbox():
+                min_lng, min_lat, max_lng, max_lat = viewport()
+                return list(collection.find({'location': {'$geoWithin': {'$box': [
+                    [min_lng, min_lat], [max_lng, max_lat]
+                ]}}}, PROJECTION))
+            rows.append(("mongo $geoWithin bbox", measure(mongo_bbox, repeat=5)))
+            collection.database.client.drop_database('bench_nearby')
+
+        print_table(f"{size} reports", rows)
+        print()
+    if not os.environ.get('BENCH_MONGODB_URI'):
+        print("MongoDB comparison skipped: set BENCH_MONGODB_URI")
+
+
+if __name__ == '__main__':
+    main()
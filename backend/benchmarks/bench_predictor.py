@@ -0,0 +1,124 @@
+"""
+Category prediction and text preprocessing.
+
+    python -m benchmarks.bench_predictor
+    python -m benchmarks.bench_predictor --save benchmarks/baselines/predictor.json
+    python -m benchmarks.bench_predictor --save current.json --compare benchmarks/baselines/predictor.json
+
+Covers the preprocessing steps, keyword matching, single and batched
+prediction (keyword hits and model inference separately), and loading the
+model: "warm" reloads the artifacts in this process, "cold" starts a fresh
+interpreter that imports torch and the predictor and loads the model.
+Descriptions come from utils/issues.csv. Needs torch installed.
+"""
+import argparse
+import csv
+import os
+import statistics
+import subprocess
+import sys
+
+from .common import measure, print_table, save_results
+from . import compare
+
+from utils import category_predictor as predictor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BATCH_SIZES = (32, 256, 1024)
+COLD_START = (
+    "import time; started = time.perf_counter(); "
+    "from utils import category_predictor; category_predictor.load_model(); "
+    "print(time.perf_counter() - started)"
+)
+
+
+def load_descriptions():
+    with open(os.path.join(BACKEND_DIR, 'utils', 'issues.csv'), encoding='utf-8-sig', newline='') as handle:
+        return [row['description'] for row in csv.DictReader(handle) if row.get('description')]
+
+
+def cold_start(repeat=3):
+    """Import + load time in fresh interpreters, shaped like measure() results"""
+    rounds = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START], cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+        ).stdout
+        rounds.append(float(output.strip().splitlines()[-1]))
+    return {
+        'min': min(rounds),
+        'median': statistics.median(rounds),
+        'mean': statistics.mean(rounds),
+        'rounds': repeat,
+        'iterations': 1,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark category prediction")
+    parser.add_argument('--save', help="Write results as JSON (a baseline, or a run to compare)")
+    parser.add_argument('--compare', help="Baseline JSON to compare this run against (needs --save)")
+    parser.add_argument('--threshold', type=float, default=10, help="Allowed slowdown in percent")
+    parser.add_argument('--skip-cold', action='store_true', help="Skip the fresh-interpreter load timing")
+    options = parser.parse_args(argv)
+    if options.compare and not options.save:
+        parser.error("--compare needs --save")
+
+    descriptions = load_descriptions()
+    keyword_hits = [text for text in descriptions if predictor.check_keywords(predictor.clean_text(text))]
+    model_only = [text for text in descriptions if not predictor.check_keywords(predictor.clean_text(text))]
+    long_text = ' '.join(descriptions[:10])
+    predictor.load_model()
+
+    rows = []
+
+    sections = [
+        ("Preprocessing", [
+            ('clean_text', lambda: predictor.clean_text(descriptions[0])),
+            ('clean_text (long)', lambda: predictor.clean_text(long_text)),
+            ('tokenize', lambda: predictor.tokenize(descriptions[0])),
+            ('text_to_tensor', lambda: predictor.text_to_tensor(descriptions[0])),
+        ]),
+        ("Keyword matching", [
+            ('check_keywords (first rule)', lambda: predictor.check_keywords('huge pothole on the main road')),
+            ('check_keywords (last rule)', lambda: predictor.check_keywords('open manhole near the school')),
+            ('check_keywords (no match)', lambda: predictor.check_keywords('bench broken in the park')),
+        ]),
+        ("Single prediction", [
+            ('predict_category (keyword)', lambda: predictor.predict_category(keyword_hits[0])),
+            ('predict_category (model)', lambda: predictor.predict_category(model_only[0])),
+        ]),
+    ]
+    for title, cases in sections:
+        section = [(label, measure(fn)) for label, fn in cases]
+        print_table(title, section)
+        print()
+        rows.extend(section)
+
+    batched = []
+    for size in BATCH_SIZES:
+        texts = (model_only * (size // len(model_only) + 1))[:size]
+        mixed = (descriptions * (size // len(descriptions) + 1))[:size]
+        batched.append((f'predict_categories x{size} (model)', measure(lambda: predictor.predict_categories(texts), repeat=5)))
+        batched.append((f'predict_categories x{size} (mixed)', measure(lambda: predictor.predict_categories(mixed), repeat=5)))
+    print_table("Batched prediction (per call)", batched)
+    print()
+    rows.extend(batched)
+
+    loading = [('load_model (warm)', measure(lambda: predictor.load_model(force=True), repeat=5))]
+    if not options.skip_cold:
+        loading.append(('import + load_model (cold)', cold_start()))
+    print_table("Model load", loading)
+    rows.extend(loading)
+
+    if options.save:
+        save_results(options.save, 'predictor', rows)
+        print(f"\nSaved {len(rows)} cases to {options.save}")
+    if options.compare:
+        print()
+        return compare.main([options.compare, options.save, '--threshold', str(options.threshold)])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+List-endpoint render time: DRF's stdlib JSONRenderer vs ORJSONRenderer.
+
+    python -m benchmarks.bench_renderers
+"""
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from .common import configure_django, measure, print_table
+
+configure_django()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from waste_reports.renderers import ORJSONRenderer  # noqa: E402
+
+SIZES = (100, 1000, 10000)
+STATUSES = ['Pending', 'In Progress', 'Resolved']
+
+
+def make_reports(count, seed=42):
+    """Payload shaped like the get_reports response"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    reports = []
+    for _ in range(count):
+        created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        reports.append({
+            'id': str(ObjectId()),
+            'user_id': str(ObjectId()),
+            'description': 'Garbage pile near the park entrance, not collected for days',
+            'status': rng.choice(STATUSES),
+            'location': {
+                'type': 'Point',
+                'coordinates': [77.5946 + rng.uniform(-0.1, 0.1), 12.9716 + rng.uniform(-0.1, 0.1)]
+            },
+            'image_url': None,
+            'created_at': created,
+            'updated_at': created + timedelta(hours=rng.randint(0, 72)),
+            'admin_remarks': None
+        })
+    return {'reports': reports, 'count': count}
+
+
+def main():
+    renderers = [('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer())]
+    for size in SIZES:
+        payload = make_reports(size)
+        rows = []
+        for name, renderer in renderers:
+            rows.append((name, measure(lambda: renderer.render(payload), repeat=5)))
+        print_table(f"get_reports payload, {size} reports", rows)
+        speedup = rows[0][1]['median'] / rows[1][1]['median']
+        print(f"  speedup: {speedup:.1f}x\n")
+
+
+if __name__ == '__main__':
+    main()
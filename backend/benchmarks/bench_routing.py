@@ -0,0 +1,64 @@
+"""
+Crew route planning time (nearest-neighbour tour + per-batch 2-opt).
+
+    python -m benchmarks.bench_routing
+"""
+import random
+
+import numpy as np
+
+from .common import measure, print_table
+
+from waste_reports.routing import haversine_matrix, plan_routes, two_opt
+
+DEPOT = (77.5946, 12.9716)
+SIZES = (1000, 5000, 10000)
+BATCH_SIZES = (25, 50)
+
+
+def make_stops(count, seed=42):
+    """Open reports scattered over a ~30 km city, a third of them in hotspots"""
+    rng = random.Random(seed)
+    hotspots = [(DEPOT[0] + rng.uniform(-0.12, 0.12), DEPOT[1] + rng.uniform(-0.12, 0.12)) for _ in range(12)]
+    stops = []
+    for _ in range(count):
+        if rng.random() < 0.33:
+            lng, lat = rng.choice(hotspots)
+            lng, lat = lng + rng.gauss(0, 0.004), lat + rng.gauss(0, 0.004)
+        else:
+            lng, lat = DEPOT[0] + rng.uniform(-0.15, 0.15), DEPOT[1] + rng.uniform(-0.15, 0.15)
+        stops.append({'longitude': lng, 'latitude': lat})
+    return stops
+
+
+def route_length(batches):
+    return sum(batch['distance_m'] for batch in batches) / 1000
+
+
+def main():
+    for size in SIZES:
+        stops = make_stops(size)
+        rows = []
+        for batch_size in BATCH_SIZES:
+            rows.append((f"plan_routes batch={batch_size}", measure(
+                lambda: plan_routes(DEPOT, stops, batch_size=batch_size), repeat=3, number=1
+            )))
+        print_table(f"{size} stops", rows)
+        for batch_size in BATCH_SIZES:
+            print(f"  batch={batch_size}: {route_length(plan_routes(DEPOT, stops, batch_size)):.0f} km total")
+        print()
+
+    # What 2-opt buys over the greedy order inside one batch
+    stops = make_stops(50, seed=7)
+    lngs = np.radians([stop['longitude'] for stop in stops])
+    lats = np.radians([stop['latitude'] for stop in stops])
+    distances = haversine_matrix(np.concatenate(([np.radians(DEPOT[0])], lngs)),
+                                 np.concatenate(([np.radians(DEPOT[1])], lats)))
+    greedy = plan_routes(DEPOT, stops, batch_size=len(stops))[0]['distance_m']
+    print_table("2-opt on one 50-stop batch", [("two_opt", measure(lambda: two_opt(distances), repeat=5))])
+    print(f"  unordered: {distances[np.arange(50), np.arange(1, 51)].sum() / 1000:.1f} km, "
+          f"after nearest-neighbour + 2-opt: {greedy / 1000:.1f} km")
+
+
+if __name__ == '__main__':
+    main()
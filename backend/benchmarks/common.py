@@ -0,0 +1,85 @@
+import json
+import math
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+
+def configure_django(**overrides):
+    """Minimal settings for benchmarks that don't need MongoDB or the app registry"""
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure(USE_TZ=True, **overrides)
+
+
+def measure(fn, repeat=7, number=None, min_time=0.2):
+    """Time fn() and return per-call seconds (best/median/mean over `repeat` rounds)"""
+    if number is None:
+        # Calibrate so each round takes at least `min_time`
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_time:
+                break
+            number *= 2
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+
+    return {
+        'min': min(rounds),
+        'median': statistics.median(rounds),
+        'mean': statistics.mean(rounds),
+        'rounds': repeat,
+        'iterations': number,
+    }
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank q-th percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds:8.2f} s "
+
+
+def print_table(title, rows):
+    """rows: list of (label, stats) pairs as returned by measure()"""
+    print(title)
+    print(f"  {'case':<32} {'best':>11} {'median':>11}")
+    for label, stats in rows:
+        print(f"  {label:<32} {format_seconds(stats['min'])} {format_seconds(stats['median'])}")
+
+
+def save_results(path, suite, rows):
+    """Write measure() results as a JSON baseline that benchmarks.compare can read"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump({
+            'suite': suite,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'cases': {label: stats for label, stats in rows},
+        }, handle, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
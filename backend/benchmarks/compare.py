@@ -0,0 +1,60 @@
+"""
+Compare a benchmark run against a saved baseline.
+
+    python -m benchmarks.compare benchmarks/baselines/predictor.json current.json [--threshold 10]
+
+Cases are matched by label and compared on their median. Any case slower
+than the baseline by more than --threshold percent is flagged, and the exit
+status is 1 so CI can fail on it. Cases only present on one side are listed
+but never fail the comparison.
+"""
+import argparse
+import sys
+
+from .common import format_seconds, load_results
+
+
+def compare(baseline, current, threshold):
+    """[(label, baseline median, current median, change %, regressed)] for cases in both runs"""
+    rows = []
+    for label, stats in current['cases'].items():
+        before = baseline['cases'].get(label)
+        if before is None:
+            continue
+        change = (stats['median'] - before['median']) / before['median'] * 100
+        rows.append((label, before['median'], stats['median'], change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag benchmark regressions against a baseline")
+    parser.add_argument('baseline', help="JSON saved with --save from an earlier run")
+    parser.add_argument('current', help="JSON saved with --save from this run")
+    parser.add_argument('--threshold', type=float, default=10, help="Allowed slowdown in percent")
+    options = parser.parse_args(argv)
+
+    baseline = load_results(options.baseline)
+    current = load_results(options.current)
+    if baseline.get('suite') != current.get('suite'):
+        parser.error(f"suites differ: {baseline.get('suite')} vs {current.get('suite')}")
+
+    rows = compare(baseline, current, options.threshold)
+    print(f"{current['suite']}: baseline {baseline.get('recorded_at')} vs {current.get('recorded_at')}")
+    print(f"  {'case':<32} {'baseline':>11} {'current':>11} {'change':>8}")
+    for label, before, after, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"  {label:<32} {format_seconds(before)} {format_seconds(after)} {change:>+7.1f}%{flag}")
+
+    for label in sorted(set(baseline['cases']) ^ set(current['cases'])):
+        side = 'baseline' if label in baseline['cases'] else 'current run'
+        print(f"  {label:<32} only in the {side}")
+
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than the baseline by more than {options.threshold:g}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
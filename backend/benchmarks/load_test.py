@@ -0,0 +1,258 @@
+"""
+Scripted load test against a running API server.
+
+    python manage.py seed_reports --count 1000000 --seed 1
+    RATE_LIMITS_ENABLED=False python manage.py runserver --noreload   # or gunicorn, in another shell
+    python -m benchmarks.load_test --users 20 --duration 60
+    python -m benchmarks.load_test --admin-email admin@example.com --admin-password ... --json run.json
+
+Each virtual user is a thread that logs in as one of the seed_reports users
+and then loops over a weighted mix of register / login / create / list /
+near / search / stats calls until the duration is up. Throughput and
+p50/p95/p99 latency are reported per endpoint; 429s are counted as
+"limited" and any other non-2xx response or connection error as an error.
+Every virtual user comes from the same IP, so with the server's write rate
+limits on, create and register mostly measure the limiter: start the server
+with RATE_LIMITS_ENABLED=False to measure capacity. Stats calls need an
+admin account and are skipped without one.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+
+from .common import format_seconds, percentile
+
+# Same accounts `manage.py seed_reports` creates
+SEED_EMAIL = 'loadtest-{n}@example.com'
+DEFAULT_MIX = 'list=4,near=4,search=2,create=1,stats=1,login=0.5,register=0.1'
+SEARCH_TERMS = ('garbage', 'pothole', 'street light', 'drain', 'water', 'overflowing', 'dumping')
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+
+    def request(self, method, path, body=None, content_type=None):
+        """(status, parsed JSON or None)"""
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        if content_type:
+            headers['Content-Type'] = content_type
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = response.read()
+                code = response.status
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            code = e.code
+        try:
+            return code, json.loads(payload) if payload else None
+        except ValueError:
+            return code, None
+
+    def post_json(self, path, data):
+        return self.request('POST', path, json.dumps(data).encode(), 'application/json')
+
+    def post_form(self, path, fields):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+        parts.append(f'--{boundary}--\r\n')
+        return self.request('POST', path, ''.join(parts).encode(), f'multipart/form-data; boundary={boundary}')
+
+    def login(self, email, password):
+        code, body = self.post_json('/auth/login/', {'email': email, 'password': password})
+        if code == 200:
+            self.token = body['tokens']['access']
+        return code
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.limited = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, seconds, code):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][code] += 1
+            if code == 429:
+                self.limited[endpoint] += 1
+            elif not 200 <= code < 300:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            rows[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors[endpoint],
+                'limited': self.limited[endpoint],
+                'throughput_rps': round(len(values) / elapsed, 1),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': values[-1],
+                'status_codes': {str(code): count for code, count in sorted(self.statuses[endpoint].items())},
+            }
+        return rows
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, number, options, recorder, deadline, admin_token):
+        super().__init__(name=f'load-user-{number}', daemon=True)
+        self.rng = random.Random(options.seed * 1000 + number if options.seed is not None else None)
+        self.options = options
+        self.recorder = recorder
+        self.deadline = deadline
+        self.admin_token = admin_token
+        self.client = Client(options.base_url, options.timeout)
+        self.email = SEED_EMAIL.format(n=number % options.seed_users)
+        self.operations, self.weights = zip(*options.mix.items())
+
+    def call(self, endpoint, fn):
+        started = time.perf_counter()
+        try:
+            code = fn()
+        except OSError:
+            code = 0
+        self.recorder.record(endpoint, time.perf_counter() - started, code)
+        return code
+
+    def point(self):
+        lng, lat = self.options.centre
+        spread = self.options.radius_km / 111
+        return lng + self.rng.uniform(-spread, spread), lat + self.rng.uniform(-spread, spread)
+
+    def run(self):
+        if self.call('login', lambda: self.client.login(self.email, self.options.password)) != 200:
+            return
+        while time.monotonic() < self.deadline:
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            getattr(self, f'do_{operation}')()
+
+    def do_list(self):
+        self.call('list', lambda: self.client.request('GET', f"/reports/?limit={self.options.page_size}")[0])
+
+    def do_near(self):
+        lng, lat = self.point()
+        self.call('near', lambda: self.client.request('GET', f"/reports/near/?lat={lat}&lng={lng}&distance=1000")[0])
+
+    def do_search(self):
+        term = urllib.parse.quote(self.rng.choice(SEARCH_TERMS))
+        self.call('search', lambda: self.client.request('GET', f"/reports/search/?q={term}")[0])
+
+    def do_create(self):
+        lng, lat = self.point()
+        fields = {'description': 'Garbage pile near the bus stop, not collected for days',
+                  'latitude': lat, 'longitude': lng}
+        self.call('create', lambda: self.client.post_form('/reports/create/', fields)[0])
+
+    def do_stats(self):
+        if not self.admin_token:
+            return
+        admin = Client(self.options.base_url, self.options.timeout)
+        admin.token = self.admin_token
+        self.call('stats', lambda: admin.request('GET', '/dashboard/stats/')[0])
+
+    def do_login(self):
+        self.call('login', lambda: self.client.login(self.email, self.options.password))
+
+    def do_register(self):
+        anonymous = Client(self.options.base_url, self.options.timeout)
+        email = f"loadtest-new-{uuid.uuid4().hex[:12]}@example.com"
+        self.call('register', lambda: anonymous.post_json(
+            '/auth/register/', {'email': email, 'password': 'loadtest-password', 'name': 'Load Test'}
+        )[0])
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if not hasattr(VirtualUser, f'do_{name.strip()}'):
+            raise argparse.ArgumentTypeError(f"unknown operation: {name.strip()}")
+        if float(weight) > 0:
+            mix[name.strip()] = float(weight)
+    if not mix:
+        raise argparse.ArgumentTypeError("at least one operation needs a positive weight")
+    return mix
+
+
+def parse_centre(value):
+    lng, lat = (float(part) for part in value.split(','))
+    return lng, lat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000/api')
+    parser.add_argument('--users', type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=60, help="Seconds of load after login")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help="Operation weights")
+    parser.add_argument('--seed-users', type=int, default=200, help="Accounts created by seed_reports")
+    parser.add_argument('--password', default='loadtest-password', help="Password of the seed accounts")
+    parser.add_argument('--admin-email', help="Admin account for dashboard stats calls")
+    parser.add_argument('--admin-password')
+    parser.add_argument('--centre', type=parse_centre, default=(77.5946, 12.9716), help="lng,lat")
+    parser.add_argument('--radius-km', type=float, default=15)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--json', help="Also write the results to this file")
+    options = parser.parse_args()
+
+    admin_token = None
+    if options.admin_email:
+        admin = Client(options.base_url, options.timeout)
+        if admin.login(options.admin_email, options.admin_password or '') != 200:
+            parser.error("admin login failed")
+        admin_token = admin.token
+
+    recorder = Recorder()
+    started = time.monotonic()
+    users = [VirtualUser(n, options, recorder, started + options.duration, admin_token)
+             for n in range(options.users)]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.monotonic() - started
+    results = recorder.summary(elapsed)
+
+    total = sum(row['requests'] for row in results.values())
+    print(f"{options.users} users, {elapsed:.1f}s, {total} requests ({total / elapsed:.1f} req/s)")
+    print(f"  {'endpoint':<10} {'requests':>9} {'errors':>7} {'limited':>8} {'req/s':>8} "
+          f"{'p50':>11} {'p95':>11} {'p99':>11} {'max':>11}")
+    for endpoint, row in results.items():
+        print(f"  {endpoint:<10} {row['requests']:>9} {row['errors']:>7} {row['limited']:>8} "
+              f"{row['throughput_rps']:>8} {format_seconds(row['p50'])} {format_seconds(row['p95'])} "
+              f"{format_seconds(row['p99'])} {format_seconds(row['max'])}")
+    limited = sum(row['limited'] for row in results.values())
+    if limited:
+        print(f"\n{limited} requests got 429: restart the server with RATE_LIMITS_ENABLED=False "
+              f"to measure capacity rather than the rate limiter")
+
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as handle:
+            json.dump({'users': options.users, 'elapsed_seconds': elapsed, 'endpoints': results}, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ import torch.nn as nn
 import pickle
 import re
 import os
+import threading
 
 # ---------- CONFIG ----------
 EMBED_DIM = 100
@@ -12,13 +13,6 @@ MAX_LEN = 20
 # Absolute path resolution
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Load vocab and label encoder
-with open(os.path.join(BASE_DIR, "vocab.pkl"), "rb") as f:
-    vocab = pickle.load(f)
-
-with open(os.path.join(BASE_DIR, "label_encoder.pkl"), "rb") as f:
-    label_encoder = pickle.load(f)
-
 # Preprocessing functions
 def clean_text(text):
     text = text.lower()
@@ -29,6 +23,7 @@ def tokenize(text):
     return re.findall(r'\b\w+\b', text.lower())
 
 def text_to_tensor(text, max_len=MAX_LEN):
+    vocab = load_model().vocab
     tokens = tokenize(text)
     token_ids = [vocab.get(t, vocab["<UNK>"]) for t in tokens[:max_len]]
     return torch.tensor(token_ids + [0] * (max_len - len(token_ids))).unsqueeze(0)
@@ -73,16 +68,39 @@ class TextClassifier(nn.Module):
         x = x.mean(dim=1)
         return self.fc(x)
 
-# ✅ Now instantiate the model
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = TextClassifier(
-    vocab_size=len(vocab),
-    embed_dim=EMBED_DIM,
-    num_classes=len(label_encoder.classes_)
-)
-model.load_state_dict(torch.load(os.path.join(BASE_DIR, "model.pth"), map_location=device))
-model.to(device)
-model.eval()
+
+class Predictor:
+    """Vocab, label encoder and weights, loaded together"""
+    def __init__(self, vocab, label_encoder, model):
+        self.vocab = vocab
+        self.label_encoder = label_encoder
+        self.model = model
+
+_predictor = None
+_load_lock = threading.Lock()
+
+# ✅ Load the artifacts on first use (or again with force=True, e.g. after retraining)
+def load_model(force=False):
+    global _predictor
+    if _predictor is not None and not force:
+        return _predictor
+    with _load_lock:
+        if _predictor is None or force:
+            with open(os.path.join(BASE_DIR, "vocab.pkl"), "rb") as f:
+                vocab = pickle.load(f)
+            with open(os.path.join(BASE_DIR, "label_encoder.pkl"), "rb") as f:
+                label_encoder = pickle.load(f)
+            model = TextClassifier(
+                vocab_size=len(vocab),
+                embed_dim=EMBED_DIM,
+                num_classes=len(label_encoder.classes_)
+            )
+            model.load_state_dict(torch.load(os.path.join(BASE_DIR, "model.pth"), map_location=device))
+            model.to(device)
+            model.eval()
+            _predictor = Predictor(vocab, label_encoder, model)
+    return _predictor
 
 # ✅ Prediction function
 def predict_category(text: str) -> str:
@@ -93,9 +111,27 @@ def predict_category(text: str) -> str:
     if keyword_label:
         return keyword_label
     
+    predictor = load_model()
     input_tensor = text_to_tensor(text).to(device)
     with torch.no_grad():
-        output = model(input_tensor)
+        output = predictor.model(input_tensor)
         pred_idx = torch.argmax(output, dim=1).item()
-        pred_label = label_encoder.inverse_transform([pred_idx])[0]
+        pred_label = predictor.label_encoder.inverse_transform([pred_idx])[0]
     return pred_label
+
+# ✅ Batched prediction for bulk paths (imports, backfills)
+def predict_categories(texts):
+    cleaned = [clean_text(text) for text in texts]
+    labels = [check_keywords(text) for text in cleaned]
+
+    # Only texts without a keyword match go through the model, in one forward pass
+    pending = [i for i, label in enumerate(labels) if label is None]
+    if pending:
+        predictor = load_model()
+        input_tensor = torch.cat([text_to_tensor(cleaned[i]) for i in pending]).to(device)
+        with torch.no_grad():
+            output = predictor.model(input_tensor)
+            pred_idx = torch.argmax(output, dim=1).tolist()
+        for i, label in zip(pending, predictor.label_encoder.inverse_transform(pred_idx)):
+            labels[i] = label
+    return labels
@@ -0,0 +1,117 @@
+"""
+Bearer token verification with a validated-token cache.
+
+Every authenticated view resolves its user from the access token. Decoding
+and checking the signature of the same token on each of a client's calls
+is pure repeated work, so the outcome is kept in a bounded LRU keyed by a
+SHA-256 of the raw token (the token itself is never stored) until the
+token's own `exp`. Only valid tokens are cached. The user document is
+still loaded on every request, so bans and deactivation apply at once.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .cache import HitCounter
+
+jwt_token_stats = HitCounter('jwt_tokens')
+
+
+class ValidatedTokenCache:
+    """token digest -> (user_id, exp) for tokens that passed verification"""
+
+    def __init__(self, max_entries=10000, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[1] <= self.clock():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def put(self, digest, user_id, exp):
+        if exp <= self.clock():
+            return
+        with self._lock:
+            self._entries[digest] = (user_id, exp)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _config():
+    return getattr(settings, 'JWT_TOKEN_CACHE', {})
+
+
+_authenticator = None
+token_cache = ValidatedTokenCache(max_entries=_config().get('max_entries', 10000))
+
+
+def get_authenticator():
+    """One shared JWTAuthentication (built on first use, once the app registry is ready)"""
+    global _authenticator
+    if _authenticator is None:
+        _authenticator = JWTAuthentication()
+    return _authenticator
+
+
+def user_id_from_raw_token(raw_token):
+    """user_id claim of a valid access token; raises InvalidToken otherwise"""
+    if not _config().get('enabled', True):
+        return get_authenticator().get_validated_token(raw_token).get('user_id')
+
+    digest = hashlib.sha256(raw_token).digest()
+    user_id = token_cache.get(digest)
+    if user_id is not None:
+        jwt_token_stats.hit()
+        return user_id
+
+    jwt_token_stats.miss()
+    token = get_authenticator().get_validated_token(raw_token)
+    user_id = token.get('user_id')
+    if user_id and token.get('exp'):
+        token_cache.put(digest, user_id, token['exp'])
+    return user_id
+
+
+def user_id_from_request(request, query_param=None):
+    """
+    user_id from the request's bearer token, or None if missing or invalid.
+
+    With `query_param`, a token in that query parameter is accepted when
+    there is no Authorization header (for EventSource, which cannot send one).
+    """
+    authenticator = get_authenticator()
+    header = authenticator.get_header(request)
+    if header is not None:
+        raw_token = authenticator.get_raw_token(header)
+    elif query_param and request.GET.get(query_param):
+        raw_token = request.GET[query_param].encode()
+    else:
+        raw_token = None
+    if raw_token is None:
+        return None
+    try:
+        return user_id_from_raw_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'reports:version'
+LIST_CACHE_TTL = getattr(settings, 'REPORT_LIST_CACHE_TTL', 60)
+
+
+def get_cache():
+    return caches[getattr(settings, 'REPORT_CACHE_ALIAS', 'default')]
+
+
+class HitCounter:
+    """Hit/miss counters for a named cache"""
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0
+        }
+
+
+report_list_stats = HitCounter('report_list')
+dashboard_summary_stats = HitCounter('dashboard_summary')
+
+
+def _version_seed():
+    # The version key can be culled (LocMemCache) or lost with a cache restart.
+    # Restarting from a counter like 1 would revive listings still stored under
+    # old versions; a microsecond clock is always past any version handed out
+    # before, as long as writes bump less than once per microsecond.
+    return time.time_ns() // 1000
+
+
+def get_version():
+    """Current report data version; every cached listing is keyed on it"""
+    cache = get_cache()
+    try:
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            seed = _version_seed()
+            cache.add(VERSION_KEY, seed, timeout=None)
+            version = cache.get(VERSION_KEY, seed)
+        return version
+    except Exception as e:
+        logger.error(f"Failed to read report cache version: {e}")
+        return None
+
+
+def bump_version():
+    """Invalidate every cached listing at once; called from the report write paths"""
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Key missing (first write or evicted) - a fresh seed invalidates old keys
+        cache.add(VERSION_KEY, _version_seed(), timeout=None)
+    except Exception as e:
+        logger.error(f"Failed to bump report cache version: {e}")
+
+
+def list_cache_key(params, scope):
+    """Key for a listing: data version + normalized query parameters + visibility scope.
+    Returns None when the cache backend is unavailable, which disables caching."""
+    version = get_version()
+    if version is None:
+        return None
+    normalized = '&'.join(f"{name}={params[name]}" for name in sorted(params))
+    digest = hashlib.sha1(f"{scope}|{normalized}".encode()).hexdigest()
+    return f"reports:list:{version}:{digest}"
+
+
+def get_cached_list(key):
+    if key is None:
+        report_list_stats.miss()
+        return None
+    try:
+        value = get_cache().get(key)
+    except Exception as e:
+        logger.error(f"Report cache read failed: {e}")
+        value = None
+
+    if value is None:
+        report_list_stats.miss()
+    else:
+        report_list_stats.hit()
+    return value
+
+
+def set_cached_list(key, value):
+    if key is None:
+        return
+    try:
+        get_cache().set(key, value, timeout=LIST_CACHE_TTL)
+    except Exception as e:
+        logger.error(f"Report cache write failed: {e}")
+
+
+def _refresh(key, compute, ttl, stale_ttl):
+    value = compute()
+    try:
+        get_cache().set(key, (time.time() + ttl, value), timeout=ttl + stale_ttl)
+    except Exception as e:
+        logger.error(f"Cache write failed for {key}: {e}")
+    return value
+
+
+def _refresh_in_background(key, compute, ttl, stale_ttl):
+    cache = get_cache()
+    lock_key = f"{key}:refreshing"
+    try:
+        # One refresher per key across workers; the lock expires if it dies
+        if not cache.add(lock_key, 1, timeout=max(ttl, 5)):
+            return
+    except Exception as e:
+        logger.error(f"Cache lock failed for {key}: {e}")
+        return
+
+    def run():
+        try:
+            _refresh(key, compute, ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Background refresh of {key} failed: {e}")
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass
+
+    threading.Thread(target=run, name=f"refresh-{key}", daemon=True).start()
+
+
+def get_or_refresh(key, compute, ttl, stale_ttl, stats=None):
+    """
+    Stale-while-revalidate: fresh values are served for `ttl` seconds, then for
+    up to `stale_ttl` more while a single background refresh recomputes them.
+    Only a cold or fully expired key makes the caller wait on compute().
+    """
+    try:
+        cached = get_cache().get(key)
+    except Exception as e:
+        logger.error(f"Cache read failed for {key}: {e}")
+        cached = None
+
+    if cached is None:
+        if stats:
+            stats.miss()
+        return _refresh(key, compute, ttl, stale_ttl)
+
+    if stats:
+        stats.hit()
+    fresh_until, value = cached
+    if time.time() >= fresh_until:
+        _refresh_in_background(key, compute, ttl, stale_ttl)
+    return value
@@ -0,0 +1,30 @@
+import calendar
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_validators(*parts, updated_at=None):
+    """ETag and Last-Modified timestamp for a resource described by `parts`"""
+    key = '|'.join(str(part) for part in parts + (updated_at.isoformat() if updated_at else '',))
+    etag = '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+    last_modified = calendar.timegm(updated_at.utctimetuple()) if updated_at else None
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 (or 412) response when a request precondition applies, else None"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None and response.status_code == 304:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Clients may keep the copy but must revalidate it on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,9 +1,91 @@
 from pymongo import MongoClient
 from django.conf import settings
+from .metrics import MongoCommandMetrics
+from .query_budget import QueryCountListener
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def ensure_indexes(db):
+    """Create every collection index the app relies on (idempotent)"""
+    try:
+        # Create geospatial index for location-based queries
+        db.reports.create_index([("location", "2dsphere")])
+        db.reports.create_index("user_id")
+        db.reports.create_index("status")
+        db.reports.create_index("created_at")
+        db.reports.create_index([("user_id", 1), ("status", 1)])
+        # "My reports" listing: filter on user_id, newest first, without an in-memory sort
+        db.reports.create_index([("user_id", 1), ("created_at", -1)])
+        db.reports.create_index([("status", 1), ("created_at", -1)])
+        
+        # Latest-change lookups (ETag / Last-Modified) and delta sync ordering
+        db.reports.create_index([("updated_at", 1), ("_id", 1)])
+        db.reports.create_index([("status", 1), ("updated_at", -1)])
+        # Archival of resolved reports (resolved_at is only set while status is Resolved)
+        db.reports.create_index([("status", 1), ("resolved_at", 1)])
+        db.reports.create_index([("user_id", 1), ("updated_at", 1), ("_id", 1)])
+        
+        # Tombstones for delta sync; expire once clients must have resynced anyway
+        db.report_tombstones.create_index([("deleted_at", 1), ("_id", 1)])
+        db.report_tombstones.create_index([("user_id", 1), ("deleted_at", 1), ("_id", 1)])
+        db.report_tombstones.create_index(
+            "deleted_at",
+            expireAfterSeconds=settings.DELTA_SYNC['tombstone_retention_days'] * 86400
+        )
+        
+        # Bulk import row references (only present on imported reports)
+        db.reports.create_index(
+            "import_ref",
+            unique=True,
+            partialFilterExpression={"import_ref": {"$exists": True}}
+        )
+        
+        # Idempotency-Key records for report creation; removed once the replay window ends
+        db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+        
+        # Report count rollups (one document per bucket x category x status x ward)
+        db.report_rollups.create_index(
+            [("granularity", 1), ("bucket", 1), ("category", 1), ("status", 1), ("ward_id", 1)],
+            unique=True
+        )
+        
+        # Status history buckets: open-bucket upserts and newest-first reads per report
+        db.report_status_events.create_index([("report_id", 1), ("window_start", 1), ("count", 1)])
+        db.report_status_events.create_index([("report_id", 1), ("last_at", -1)])
+        
+        # Per-ward listings and stats
+        db.reports.create_index([("ward_id", 1), ("created_at", -1)])
+        db.reports.create_index([("ward_id", 1), ("updated_at", -1)])
+        
+        # Dashboard summary: covers every field the $facet counting panels read
+        db.reports.create_index([
+            ("ward_id", 1), ("status", 1), ("category", 1),
+            ("urgency_count", 1), ("updated_at", 1), ("_id", 1)
+        ])
+        
+        # Crew work queue: only open reports carry priority_key
+        db.reports.create_index(
+            [("priority_key", -1)],
+            partialFilterExpression={"priority_key": {"$exists": True}}
+        )
+        
+        # User collection indexes
+        db.users.create_index("email", unique=True)
+        db.users.create_index("created_at")
+        
+        # Text index for search
+        db.reports.create_index([
+            ("description", "text"),
+            ("admin_remarks", "text")
+        ])
+        
+        logger.info("MongoDB indexes created successfully")
+    except Exception as e:
+        logger.error(f"Failed to create MongoDB indexes: {e}")
+
+
 class MongoDBConnection:
     _instance = None
     _client = None
@@ -17,7 +99,10 @@ class MongoDBConnection:
     def __init__(self):
         if self._client is None:
             try:
-                self._client = MongoClient(settings.MONGODB_SETTINGS['host'])
+                self._client = MongoClient(
+                    settings.MONGODB_SETTINGS['host'],
+                    event_listeners=[MongoCommandMetrics(), QueryCountListener()]
+                )
                 self._db = self._client[settings.MONGODB_SETTINGS['db']]
                 
                 # Test connection
@@ -31,28 +116,7 @@ class MongoDBConnection:
                 raise
     
     def create_indexes(self):
-        try:
-            # Create geospatial index for location-based queries
-            self._db.reports.create_index([("location", "2dsphere")])
-            self._db.reports.create_index("user_id")
-            self._db.reports.create_index("status")
-            self._db.reports.create_index("created_at")
-            self._db.reports.create_index([("user_id", 1), ("status", 1)])
-            self._db.reports.create_index([("status", 1), ("created_at", -1)])
-            
-            # User collection indexes
-            self._db.users.create_index("email", unique=True)
-            self._db.users.create_index("created_at")
-            
-            # Text index for search
-            self._db.reports.create_index([
-                ("description", "text"),
-                ("admin_remarks", "text")
-            ])
-            
-            logger.info("MongoDB indexes created successfully")
-        except Exception as e:
-            logger.error(f"Failed to create MongoDB indexes: {e}")
+        ensure_indexes(self._db)
     
     @property
     def db(self):
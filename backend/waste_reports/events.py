@@ -0,0 +1,227 @@
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from pymongo.errors import OperationFailure
+
+from .renderers import ORJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+EVENT_SETTINGS = getattr(settings, 'REPORT_EVENTS', {})
+HISTORY_SIZE = EVENT_SETTINGS.get('history', 1000)
+CLIENT_BUFFER = EVENT_SETTINGS.get('client_buffer', 256)
+MAX_SUBSCRIBERS = EVENT_SETTINGS.get('max_subscribers', 50)
+
+_renderer = ORJSONRenderer()
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data')
+
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+
+    def encode(self):
+        """Server-Sent Events wire format"""
+        payload = _renderer.render(self.data).decode()
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+def reset_event():
+    """Tells a client it missed events and must refetch its list"""
+    return Event('', 'reset', {})
+
+
+class TooManySubscribers(Exception):
+    """Every stream slot in this process is taken; the client should retry later"""
+
+
+class Subscription:
+    """One client's bounded buffer. If the client falls CLIENT_BUFFER events behind,
+    the buffer is dropped and the client gets a single reset event instead."""
+
+    def __init__(self, maxlen=CLIENT_BUFFER):
+        self._queue = deque(maxlen=maxlen)
+        self._condition = threading.Condition()
+        self._overflowed = False
+
+    def push(self, event):
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self._queue.clear()
+                self._overflowed = True
+            if not self._overflowed:
+                self._queue.append(event)
+            self._condition.notify()
+
+    def get(self, timeout):
+        """Next event, or None after `timeout` seconds without one"""
+        with self._condition:
+            if not self._queue and not self._overflowed:
+                self._condition.wait(timeout)
+            if self._overflowed:
+                self._overflowed = False
+                return reset_event()
+            if self._queue:
+                return self._queue.popleft()
+            return None
+
+
+class ReportEventBus:
+    """
+    Fan-out of report create/update/archive events to SSE subscribers.
+
+    Events come either from the model write paths (in-process, ids are
+    "<boot id>-<sequence>") or, when the deployment supports them, from a
+    MongoDB change stream (ids are resume tokens), in which case local
+    publishes are ignored so every write is seen exactly once - including
+    writes made by other worker processes.
+    """
+
+    def __init__(self, history=HISTORY_SIZE, max_subscribers=MAX_SUBSCRIBERS):
+        self._lock = threading.Lock()
+        # Each open stream holds a server thread, so their number is capped
+        self.max_subscribers = max_subscribers
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._listeners = []
+        self._watcher = None
+        self.change_streams_active = False
+
+    def publish(self, event_type, data, event_id=None):
+        with self._lock:
+            if event_id is None:
+                event_id = f"{self._boot_id}-{next(self._sequence)}"
+            event = Event(event_id, event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+        for subscription in subscribers:
+            subscription.push(event)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Report event listener failed on {event.type}: {e}")
+
+    def add_listener(self, callback):
+        """In-process consumers (e.g. caches): callback(event) runs synchronously on every publish"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def publish_local(self, event_type, data):
+        """Called from the model write paths; a no-op while a change stream feeds the bus"""
+        if not self.change_streams_active:
+            self.publish(event_type, data)
+
+    def subscribe(self, last_event_id=None):
+        self._ensure_watcher()
+        subscription = Subscription()
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            if last_event_id:
+                ids = [event.id for event in self._history]
+                if last_event_id in ids:
+                    for event in list(self._history)[ids.index(last_event_id) + 1:]:
+                        subscription.push(event)
+                else:
+                    # Too old, or from another process/restart - client must resync
+                    subscription.push(reset_event())
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _ensure_watcher(self):
+        if self._watcher is not None or not EVENT_SETTINGS.get('change_streams', True):
+            return
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = ChangeStreamWatcher(self)
+            if self._watcher.supported():
+                self.change_streams_active = True
+                self._watcher.start()
+
+
+def report_event_data(report):
+    """The public fields clients need to patch their local copy"""
+    return {
+        'id': str(report['_id']),
+        'user_id': report.get('user_id'),
+        'description': report.get('description'),
+        'status': report.get('status'),
+        'category': report.get('category'),
+        'ward_id': report.get('ward_id'),
+        'location': report.get('location'),
+        'image_url': report.get('image_url'),
+        'urgency_count': report.get('urgency_count', 0),
+        'admin_remarks': report.get('admin_remarks'),
+        'created_at': report.get('created_at'),
+        'updated_at': report.get('updated_at')
+    }
+
+
+class ChangeStreamWatcher(threading.Thread):
+    """Feeds the bus from a change stream on the reports collection (replica sets / sharded clusters)"""
+
+    OPERATION_TYPES = {'insert': 'created', 'update': 'updated', 'replace': 'updated', 'delete': 'archived'}
+
+    def __init__(self, bus):
+        super().__init__(name='report-change-stream', daemon=True)
+        self.bus = bus
+        self._resume_token = None
+
+    def supported(self):
+        from .database import mongodb
+        try:
+            hello = mongodb.client.admin.command('hello')
+            return 'setName' in hello or hello.get('msg') == 'isdbgrid'
+        except Exception as e:
+            logger.error(f"Could not detect change stream support: {e}")
+            return False
+
+    def run(self):
+        from .models import Report
+        while True:
+            try:
+                with Report.collection.watch(
+                    full_document='updateLookup',
+                    resume_after=self._resume_token
+                ) as stream:
+                    for change in stream:
+                        self._resume_token = change['_id']
+                        self._publish(change)
+            except OperationFailure as e:
+                # e.g. the resume point fell off the oplog - start from now
+                logger.error(f"Report change stream failed, restarting without resume token: {e}")
+                self._resume_token = None
+                time.sleep(1)
+            except Exception as e:
+                logger.error(f"Report change stream interrupted, reconnecting: {e}")
+                time.sleep(1)
+
+    def _publish(self, change):
+        event_type = self.OPERATION_TYPES.get(change['operationType'])
+        if not event_type:
+            return
+        if event_type == 'archived' or not change.get('fullDocument'):
+            data = {'id': str(change['documentKey']['_id'])}
+        else:
+            data = report_event_data(change['fullDocument'])
+        self.bus.publish(event_type, data, event_id=change['_id']['_data'])
+
+
+report_events = ReportEventBus()
@@ -0,0 +1,198 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime, time
+
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .geo import bbox_geometry, parse_bbox
+from .models import Report
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # In requirements.txt; without it Parquet exports answer 501
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ('csv', 'jsonl', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORT_FIELDS = [
+    'id', 'user_id', 'description', 'category', 'status', 'ward_id', 'latitude', 'longitude',
+    'image_url', 'urgency_count', 'admin_remarks', 'created_at', 'updated_at'
+]
+PROJECTION = {
+    'user_id': 1, 'description': 1, 'category': 1, 'status': 1, 'ward_id': 1, 'location': 1,
+    'image_url': 1, 'urgency_count': 1, 'admin_remarks': 1, 'created_at': 1, 'updated_at': 1
+}
+DEFAULT_BATCH_SIZE = getattr(settings, 'EXPORT_BATCH_SIZE', 2000)
+
+
+def parse_when(value, end_of_day=False):
+    # Bare dates first: parse_datetime also accepts them (as midnight), which would drop the end day
+    day = parse_date(value)
+    if day is not None:
+        return datetime.combine(day, time.max if end_of_day else time.min)
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value}")
+    return parsed
+
+
+def build_export_query(status=None, category=None, start=None, end=None, bbox=None, ward=None):
+    """Build a Mongo filter from export query parameters (raises ValueError on bad input)"""
+    query = {}
+    if status:
+        query['status'] = status
+    if category:
+        query['category'] = category
+    if ward:
+        query['ward_id'] = ward
+    if start or end:
+        query['created_at'] = {}
+        if start:
+            query['created_at']['$gte'] = parse_when(start)
+        if end:
+            query['created_at']['$lte'] = parse_when(end, end_of_day=True)
+    if bbox:
+        query['location'] = {'$geoWithin': {'$geometry': bbox_geometry(parse_bbox(bbox))}}
+    return query
+
+
+def iter_reports(query, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield flat report rows straight off a Mongo cursor, one batch in memory at a time"""
+    cursor = (Report.collection.find(query, PROJECTION)
+              .sort('_id', 1)
+              .batch_size(batch_size))
+    try:
+        for report in cursor:
+            longitude, latitude = report['location']['coordinates']
+            yield {
+                'id': str(report['_id']),
+                'user_id': report.get('user_id'),
+                'description': report.get('description'),
+                'category': report.get('category'),
+                'status': report.get('status'),
+                'ward_id': report.get('ward_id'),
+                'latitude': latitude,
+                'longitude': longitude,
+                'image_url': report.get('image_url'),
+                'urgency_count': report.get('urgency_count', 0),
+                'admin_remarks': report.get('admin_remarks'),
+                'created_at': report.get('created_at'),
+                'updated_at': report.get('updated_at')
+            }
+    finally:
+        cursor.close()
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class _Echo:
+    """File-like object whose write() returns the data, for csv.writer streaming"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_isoformat(row[field]) for field in EXPORT_FIELDS])
+
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps({field: _isoformat(row[field]) for field in EXPORT_FIELDS}) + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only sink that hands back what was written while keeping tell() absolute,
+    so the Parquet footer offsets stay correct after each chunk is drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(rows, batch_size=DEFAULT_BATCH_SIZE):
+    schema = pa.schema([
+        ('id', pa.string()),
+        ('user_id', pa.string()),
+        ('description', pa.string()),
+        ('category', pa.string()),
+        ('status', pa.string()),
+        ('ward_id', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('image_url', pa.string()),
+        ('urgency_count', pa.int64()),
+        ('admin_remarks', pa.string()),
+        ('created_at', pa.timestamp('ms')),
+        ('updated_at', pa.timestamp('ms')),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+    columns = {field: [] for field in EXPORT_FIELDS}
+    pending = 0
+
+    def write_batch():
+        writer.write_batch(pa.record_batch([columns[field] for field in EXPORT_FIELDS], schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    for row in rows:
+        for field in EXPORT_FIELDS:
+            columns[field].append(row[field])
+        pending += 1
+        if pending >= batch_size:
+            write_batch()
+            pending = 0
+            yield sink.drain()
+
+    if pending:
+        write_batch()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(fmt, query, batch_size=DEFAULT_BATCH_SIZE):
+    """Chunks (str or bytes) of the export in the given format"""
+    if fmt == 'parquet' and pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    rows = iter_reports(query, batch_size=batch_size)
+    if fmt == 'csv':
+        return stream_csv(rows)
+    if fmt == 'jsonl':
+        return stream_jsonl(rows)
+    if fmt == 'parquet':
+        return stream_parquet(rows, batch_size=batch_size)
+    raise ValueError(f"Unsupported export format: {fmt}")
@@ -0,0 +1,25 @@
+def parse_bbox(value):
+    """Parse 'min_lng,min_lat,max_lng,max_lat' into a tuple of floats"""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError("bbox is out of range")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_geometry(bbox):
+    """GeoJSON polygon for a bbox, usable with $geoWithin on the 2dsphere index"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return {
+        'type': 'Polygon',
+        'coordinates': [[
+            [min_lng, min_lat],
+            [max_lng, min_lat],
+            [max_lng, max_lat],
+            [min_lng, max_lat],
+            [min_lng, min_lat]
+        ]]
+    }
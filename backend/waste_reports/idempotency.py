@@ -0,0 +1,192 @@
+"""
+Idempotency-Key support for report creation.
+
+Mobile clients on flaky networks retry POST reports/create/ when they miss
+the response. With an `Idempotency-Key` header, the first request claims the
+key (a unique insert into the idempotency_keys collection) and stores the
+response it produced. A retry with the same key gets that response back
+(marked `Idempotent-Replayed: true`) without re-uploading the image,
+re-running the classifier or inserting a second report:
+
+- same key, same request, first one finished: the stored response
+- same key while the first one is still running: 409, retry shortly
+- same key with a different request body: 422
+
+@idempotent goes above @rate_limit, so retries of a request that already
+went through are answered before the limiter charges them. The key is
+scoped to the user in the bearer token, read through the validated-token
+cache. Completed responses are also kept in a small per-process LRU, so a
+burst of retries costs no database round trip at all, and only one
+find_one otherwise. Failed requests (validation errors, 429, 5xx) release
+the key so the client can retry. Nothing renews a pending key while its
+request runs; one older than IDEMPOTENCY['lease_seconds'] is presumed
+abandoned by a request that died and may be taken over, so the lease must
+stay well above the longest create.
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from .authentication import user_id_from_request
+from .cache import HitCounter
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+idempotency_stats = HitCounter('idempotency')
+
+
+class CompletedResponses:
+    """key id -> (fingerprint, status, content, content_type, expires) for completed requests, LRU-bounded"""
+
+    def __init__(self, max_entries=1000, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key_id):
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is None:
+                return None
+            if entry[4] <= self.clock():
+                del self._entries[key_id]
+                return None
+            self._entries.move_to_end(key_id)
+            return entry
+
+    def put(self, key_id, fingerprint, status_code, content, content_type, expires):
+        with self._lock:
+            self._entries[key_id] = (fingerprint, status_code, content, content_type, expires)
+            self._entries.move_to_end(key_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _config():
+    return getattr(settings, 'IDEMPOTENCY', {})
+
+
+completed_responses = CompletedResponses(max_entries=_config().get('local_entries', 1000))
+
+
+def request_fingerprint(request, fields):
+    """SHA-256 over the submitted form fields and uploaded files' names and sizes"""
+    digest = hashlib.sha256()
+    for field in fields:
+        digest.update(f"{field}={request.POST.get(field, '')}\0".encode())
+    for name in sorted(request.FILES):
+        upload = request.FILES[name]
+        digest.update(f"{name}:{upload.name}:{upload.size}\0".encode())
+    return digest.hexdigest()
+
+
+def _replay(status_code, content, content_type):
+    response = HttpResponse(content, status=status_code, content_type=content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _mismatch():
+    return JsonResponse({'error': 'Idempotency-Key was already used for a different request'}, status=422)
+
+
+def _in_progress():
+    response = JsonResponse({'error': 'A request with this Idempotency-Key is still in progress'}, status=409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _begin(key_id, fingerprint, config):
+    """A response to answer with right away, or None once this request owns the key"""
+    cached = completed_responses.get(key_id)
+    if cached is not None:
+        idempotency_stats.hit()
+        return _replay(*cached[1:4]) if cached[0] == fingerprint else _mismatch()
+    idempotency_stats.miss()
+
+    record = IdempotencyKey.get(key_id)
+    if record is None:
+        if IdempotencyKey.claim(key_id, fingerprint, config.get('ttl_seconds', 86400)):
+            return None
+        # A concurrent duplicate claimed it first
+        record = IdempotencyKey.get(key_id)
+        if record is None:
+            return _in_progress()
+
+    if record['fingerprint'] != fingerprint:
+        return _mismatch()
+    if record['state'] == 'completed':
+        content = bytes(record['content'])
+        expires = time.time() + (record['expires_at'] - datetime.utcnow()).total_seconds()
+        completed_responses.put(key_id, fingerprint, record['status'], content, record['content_type'], expires)
+        return _replay(record['status'], content, record['content_type'])
+    lease = timedelta(seconds=config.get('lease_seconds', 60))
+    if record['locked_at'] <= datetime.utcnow() - lease and IdempotencyKey.take_over(key_id, record['locked_at']):
+        return None
+    return _in_progress()
+
+
+def idempotent(fields):
+    """
+    Run a POST view at most once per (user, Idempotency-Key) within IDEMPOTENCY['ttl_seconds'].
+
+    `fields` are the form fields that identify the request; together with
+    the uploaded files' names and sizes they must match for a replay.
+    Requests without the header, or without a valid bearer token (the view
+    answers those), pass straight through. Only 2xx responses are stored.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            config = _config()
+            if not key or request.method != 'POST' or not config.get('enabled', True):
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH or not key.isprintable():
+                return JsonResponse({'error': f'Invalid {HEADER} header'}, status=400)
+            user_id = user_id_from_request(request)
+            if not user_id:
+                return view(request, *args, **kwargs)
+
+            key_id = f"{user_id}:{key}"
+            fingerprint = request_fingerprint(request, fields)
+            early = _begin(key_id, fingerprint, config)
+            if early is not None:
+                return early
+
+            try:
+                response = view(request, *args, **kwargs)
+                if 200 <= response.status_code < 300 and hasattr(response, 'render'):
+                    # DRF responses render lazily; the stored bytes are exactly what the client gets
+                    response.render()
+            except Exception:
+                IdempotencyKey.release(key_id)
+                raise
+            if 200 <= response.status_code < 300:
+                content_type = response.get('Content-Type', 'application/json')
+                IdempotencyKey.complete(key_id, response.status_code, response.content, content_type)
+                completed_responses.put(
+                    key_id, fingerprint, response.status_code, response.content, content_type,
+                    time.time() + config.get('ttl_seconds', 86400)
+                )
+            else:
+                IdempotencyKey.release(key_id)
+            return response
+        return wrapped
+    return decorator
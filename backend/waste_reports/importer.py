@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+import logging
+import time
+
+from utils.category_predictor import predict_categories
+from .metrics import category_inference
+from .models import Report, ImportJob
+from .serializers import ReportImportSerializer
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_ERRORS = 50
+
+
+def detect_format(filename, default='csv'):
+    """Guess the import format from a file name"""
+    name = (filename or '').lower()
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def make_job_id(filename, size):
+    """Stable job id so re-running the same file resumes instead of duplicating"""
+    return f"{filename}:{size}"
+
+
+def iter_rows(stream, fmt):
+    """Yield (row_number, row_dict) from a text stream without loading it all"""
+    if fmt == 'csv':
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            yield row_number, row
+    elif fmt == 'jsonl':
+        row_number = 0
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            row_number += 1
+            try:
+                yield row_number, json.loads(line)
+            except ValueError:
+                yield row_number, None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+class ReportImporter:
+    """Streams rows into the reports collection in validated, classified chunks"""
+
+    def __init__(self, user_id, job_id, batch_size=500, resume=False, progress=None):
+        self.user_id = user_id
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.resume = resume
+        self.progress = progress
+
+        self.rows_done = 0
+        self.skipped = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self._started = None
+
+    def run(self, stream, fmt):
+        self._started = time.monotonic()
+
+        if self.resume:
+            job = ImportJob.get(self.job_id)
+            if job:
+                self.skipped = job.get('rows_done', 0)
+                self.inserted = job.get('inserted', 0)
+                self.rejected = job.get('rejected', 0)
+                self.rows_done = self.skipped
+                logger.info(f"Resuming import {self.job_id} after row {self.skipped}")
+
+        batch = []
+        for row_number, row in iter_rows(stream, fmt):
+            if row_number <= self.skipped:
+                continue
+
+            validated = self._validate(row_number, row)
+            if validated is not None:
+                batch.append((row_number, validated))
+            self.rows_done = row_number
+
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+        self._flush(batch, finished=True)
+        return self.summary()
+
+    def _validate(self, row_number, row):
+        if not isinstance(row, dict):
+            self._reject(row_number, {'row': ['Malformed row']})
+            return None
+
+        serializer = ReportImportSerializer(data=row)
+        if not serializer.is_valid():
+            self._reject(row_number, serializer.errors)
+            return None
+        return serializer.validated_data
+
+    def _reject(self, row_number, errors):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def _flush(self, batch, finished=False):
+        if batch:
+            # Only rows without a category get classified, in a single batched call
+            unlabeled = [i for i, (_, data) in enumerate(batch) if not data.get('category')]
+            if unlabeled:
+                with category_inference.time(mode='batch'):
+                    categories = predict_categories([batch[i][1]['description'] for i in unlabeled])
+                for i, category in zip(unlabeled, categories):
+                    batch[i][1]['category'] = category
+
+            documents = []
+            for row_number, data in batch:
+                document = Report.build_report_document(
+                    user_id=self.user_id,
+                    description=data['description'],
+                    latitude=data['latitude'],
+                    longitude=data['longitude'],
+                    category=data['category'],
+                    status=data['status'],
+                    created_at=data.get('created_at')
+                )
+                # Unique per job/row, so a chunk replayed after a crash is not inserted twice
+                document['import_ref'] = f"{self.job_id}:{row_number}"
+                documents.append(document)
+
+            self.inserted += Report.bulk_create_reports(documents)
+
+        ImportJob.checkpoint(self.job_id, self.rows_done, self.inserted, self.rejected, finished=finished)
+        if self.progress:
+            self.progress(self.summary())
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started if self._started else 0
+        processed = self.rows_done - self.skipped
+        return {
+            'job_id': self.job_id,
+            'rows_done': self.rows_done,
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'elapsed_seconds': round(elapsed, 2),
+            'rows_per_second': round(processed / elapsed, 1) if elapsed > 0 else 0,
+            'errors': self.errors
+        }
+
+
+def import_file(fileobj, fmt, user_id, job_id, batch_size=500, resume=False, progress=None):
+    """Run an import over a binary file object (e.g. an uploaded file)"""
+    stream = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        importer = ReportImporter(user_id, job_id, batch_size=batch_size, resume=resume, progress=progress)
+        return importer.run(stream, fmt)
+    finally:
+        stream.detach()
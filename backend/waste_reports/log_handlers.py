@@ -0,0 +1,176 @@
+"""
+Non-blocking logging.
+
+Request threads only put records on a bounded in-memory queue; one listener
+thread per process formats them and does the file/console I/O. When the
+queue is full (the disk is stalling, or something is logging in a tight
+loop) new records are dropped and counted rather than making the request
+wait. The drop count and queue depth are exported on /metrics.
+
+Configured from settings.LOGGING, e.g.
+
+    'async': {
+        'class': 'waste_reports.log_handlers.QueueLogHandler',
+        'filename': 'waste_tracker.log', 'max_bytes': 10485760, 'backup_count': 5,
+        'rotation': 'size', 'console': True, 'json': True, 'queue_size': 10000,
+    }
+
+Size rotation renames the file underneath anyone else writing to it, so it
+must have a single writer: children forked after the handler was set up
+(gunicorn --preload workers) switch to a file of their own, `name.<pid>.log`.
+Processes that each configure logging themselves (gunicorn without
+--preload) should use rotation='external': every process appends to the
+same file and an external tool (logrotate, without copytruncate) rotates it.
+"""
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import weakref
+from datetime import datetime, timezone
+
+import orjson
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_handlers = weakref.WeakSet()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields included"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'process': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # The stock put_nowait() would raise on a full queue at shutdown; wait for room instead
+        try:
+            self.queue.put(self._sentinel, timeout=5)
+        except queue.Full:
+            pass
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler with its own listener thread and target handlers.
+
+    Targets are a file (`filename`; size-rotated per `max_bytes` and
+    `backup_count`, or rotated externally) and/or the console, formatted as
+    JSON lines or plain text; tests can pass ready-made `targets` instead.
+    The listener is restarted in forked children (e.g. gunicorn workers),
+    which do not inherit threads, and a size-rotated file is swapped for one
+    named after the child's pid.
+    """
+
+    def __init__(self, filename=None, max_bytes=10 * 1024 * 1024, backup_count=5, rotation='size',
+                 console=False, json=False, queue_size=10000, targets=None):
+        if rotation not in ('size', 'external'):
+            raise ValueError(f"Unknown log rotation: {rotation}")
+        if targets is None:
+            formatter = JsonFormatter() if json else logging.Formatter()
+            targets = []
+            if filename and rotation == 'external':
+                targets.append(logging.handlers.WatchedFileHandler(filename, encoding='utf-8', delay=True))
+            elif filename:
+                targets.append(logging.handlers.RotatingFileHandler(
+                    filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+                ))
+            if console:
+                targets.append(logging.StreamHandler())
+            for target in targets:
+                target.setFormatter(formatter)
+        # Created after the targets so logging.shutdown() closes (and drains) this handler first
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.targets = targets
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._listener = None
+        self._start()
+        _handlers.add(self)
+
+    def _start(self):
+        self._listener = _Listener(self.queue, *self.targets, respect_handler_level=True)
+        self._listener.start()
+
+    def _restart_after_fork(self):
+        if self._listener is not None:
+            self.queue = queue.Queue(maxsize=self.queue_size)
+            self.targets = [_own_file(target) for target in self.targets]
+            self._start()
+
+    def prepare(self, record):
+        # Only merge the arguments here, so later changes to them don't show up in the log;
+        # exc_info stays on the record and is formatted by the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # handle() already holds this (reentrant) lock; enqueue() called directly must too
+            with self.lock:
+                self.dropped += 1
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None and listener._thread is not None:
+            listener.stop()
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+def _own_file(target):
+    """A size-rotated file target for this process alone: name.<pid>.ext"""
+    if not isinstance(target, logging.handlers.RotatingFileHandler):
+        return target
+    base, ext = os.path.splitext(target.baseFilename)
+    own = logging.handlers.RotatingFileHandler(
+        f"{base}.{os.getpid()}{ext}", maxBytes=target.maxBytes, backupCount=target.backupCount,
+        encoding=target.encoding, delay=True
+    )
+    own.setFormatter(target.formatter)
+    own.setLevel(target.level)
+    return own
+
+
+def _restart_after_fork():
+    for handler in list(_handlers):
+        handler._restart_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stats():
+    """Records dropped and currently queued, summed over this process's queue handlers"""
+    handlers = list(_handlers)
+    return {
+        'dropped': sum(handler.dropped for handler in handlers),
+        'queued': sum(handler.queue.qsize() for handler in handlers),
+    }
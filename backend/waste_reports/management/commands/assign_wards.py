@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_reports.models import Report
+from waste_reports.wards import get_ward_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Stamp ward_id on existing reports using the ward polygons in "
+        "WARDS_GEOJSON_PATH (only reports without one, unless --reassign)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reassign', action='store_true', help="Recompute ward_id for every report")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Updates per bulk write")
+
+    def handle(self, *args, **options):
+        index = get_ward_index()
+        if index is None:
+            raise CommandError("No wards loaded - set WARDS_GEOJSON_PATH to a GeoJSON FeatureCollection")
+
+        started = time.monotonic()
+        scanned, changed = Report.assign_wards(
+            reassign=options['reassign'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {scanned} reports against {len(index)} wards, updated {changed} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+        if changed:
+            self.stdout.write("Run backfill_rollups and rebuild_sla_sketches to regroup per-ward dashboards.")
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from waste_reports.models import ReportRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the hour/day report rollups from the reports collection in one "
+        "aggregation pass (requires MongoDB 5.0+). Run while report writes are paused."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Bucket documents per insert")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        buckets = ReportRollup.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {buckets} rollup buckets in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,61 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_reports.models import Report
+from waste_reports.spatial_index import nearby_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the in-process nearby index from MongoDB and check that sampled "
+        "radius queries return the same reports as MongoDB's $near."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=200, help="Random query points to compare")
+        parser.add_argument('--distance', type=int, default=1000, help="Query radius in metres")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        nearby_index.warm_up()
+        if not len(nearby_index):
+            raise CommandError("Spatial index is empty or failed to build (see logs)")
+
+        live = Report.collection.count_documents({})
+        self.stdout.write(f"Indexed {len(nearby_index)} reports, {live} in MongoDB")
+
+        # Query around existing reports so most samples have neighbours
+        rng = random.Random(options['seed'])
+        points = [report['location']['coordinates'] for report in Report.collection.aggregate([
+            {'$sample': {'size': options['samples']}},
+            {'$project': {'location': 1}}
+        ])]
+
+        mismatches = 0
+        for lng, lat in points:
+            lng += rng.uniform(-0.005, 0.005)
+            lat += rng.uniform(-0.005, 0.005)
+            local = nearby_index.near(lng, lat, options['distance'])
+            if local is None:
+                raise CommandError("Spatial index went cold during the check")
+            remote = Report.collection.find({
+                'location': {
+                    '$near': {
+                        '$geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+                        '$maxDistance': options['distance']
+                    }
+                }
+            }, {'_id': 1})
+            local_ids = {report['_id'] for report in local}
+            remote_ids = {report['_id'] for report in remote}
+            if local_ids != remote_ids:
+                mismatches += 1
+                self.stdout.write(self.style.WARNING(
+                    f"({lng:.6f}, {lat:.6f}): {len(local_ids - remote_ids)} only in index, "
+                    f"{len(remote_ids - local_ids)} only in MongoDB"
+                ))
+
+        if mismatches or len(nearby_index) != live:
+            raise CommandError(f"{mismatches}/{len(points)} samples differ; index size {len(nearby_index)} vs {live}")
+        self.stdout.write(self.style.SUCCESS(f"All {len(points)} samples match"))
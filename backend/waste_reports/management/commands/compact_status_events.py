@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from waste_reports.models import ReportStatusEvent
+
+
+class Command(BaseCommand):
+    help = "Merge status history buckets that concurrent writes left partially filled"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report-id', help="Only compact this report's history")
+
+    def handle(self, *args, **options):
+        report_ids = [options['report_id']] if options['report_id'] else ReportStatusEvent.fragmented_reports()
+
+        removed = 0
+        for report_id in report_ids:
+            removed += ReportStatusEvent.compact(report_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {len(report_ids)} reports, removed {removed} buckets"
+        ))
@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_reports.exporter import DEFAULT_BATCH_SIZE, SUPPORTED_FORMATS, build_export_query, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream reports to a CSV/JSONL/Parquet file without loading them into memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=SUPPORTED_FORMATS, default='csv')
+        parser.add_argument('--output', help="Output file (default: stdout, not available for parquet)")
+        parser.add_argument('--status', help="Only reports with this status")
+        parser.add_argument('--category', help="Only reports in this category")
+        parser.add_argument('--ward', help="Only reports in this ward")
+        parser.add_argument('--start', help="Created on or after (ISO date/datetime)")
+        parser.add_argument('--end', help="Created on or before (ISO date/datetime)")
+        parser.add_argument('--bbox', help="min_lng,min_lat,max_lng,max_lat")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Mongo cursor batch size")
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        if fmt == 'parquet' and not options['output']:
+            raise CommandError("Parquet export needs --output")
+
+        try:
+            query = build_export_query(
+                status=options['status'],
+                category=options['category'],
+                start=options['start'],
+                end=options['end'],
+                bbox=options['bbox'],
+                ward=options['ward']
+            )
+            chunks = stream_export(fmt, query, batch_size=options['batch_size'])
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            if fmt == 'parquet':
+                out = open(options['output'], 'wb')
+            else:
+                out = open(options['output'], 'w', encoding='utf-8', newline='')
+            with out:
+                for chunk in chunks:
+                    out.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Export written to {options['output']}"))
+        else:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
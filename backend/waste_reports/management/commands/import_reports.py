@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_reports.importer import SUPPORTED_FORMATS, ReportImporter, detect_format, make_job_id
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/JSONL dump of historical reports into MongoDB"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file to import")
+        parser.add_argument('--user-id', required=True, help="User id the imported reports are filed under")
+        parser.add_argument('--format', choices=SUPPORTED_FORMATS, help="Input format (default: from file extension)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per classify/insert chunk")
+        parser.add_argument('--job-id', help="Checkpoint key (default: file name and size)")
+        parser.add_argument('--resume', action='store_true', help="Skip rows already processed by this job")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+
+        fmt = options['format'] or detect_format(path)
+        job_id = options['job_id'] or make_job_id(os.path.basename(path), os.path.getsize(path))
+
+        importer = ReportImporter(
+            user_id=options['user_id'],
+            job_id=job_id,
+            batch_size=options['batch_size'],
+            resume=options['resume'],
+            progress=self._report_progress
+        )
+
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            summary = importer.run(stream, fmt)
+
+        for error in summary['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['inserted']} reports, rejected {summary['rejected']} "
+            f"in {summary['elapsed_seconds']}s ({summary['rows_per_second']} rows/sec)"
+        ))
+
+    def _report_progress(self, summary):
+        self.stdout.write(
+            f"[{summary['job_id']}] rows={summary['rows_done']} inserted={summary['inserted']} "
+            f"rejected={summary['rejected']} rate={summary['rows_per_second']} rows/sec"
+        )
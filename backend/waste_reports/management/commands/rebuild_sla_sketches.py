@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from waste_reports.models import ResolutionSketch
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild time-to-resolution sketches from Resolved reports, using resolved_at. "
+        "Reports resolved before resolved_at was recorded fall back to updated_at, which "
+        "later writes (urgency votes, ward backfills) may have moved."
+    )
+
+    def handle(self, *args, **options):
+        sketches = ResolutionSketch.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {sketches} resolution sketches"))
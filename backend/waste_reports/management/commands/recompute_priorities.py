@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from waste_reports.models import Report
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored priority_key (and open-neighbour counts) for every "
+        "report, e.g. after changing REPORT_PRIORITY weights or a bulk import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Updates per bulk write")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        scored = Report.recompute_priorities(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} open reports in {time.monotonic() - started:.1f}s"
+        ))
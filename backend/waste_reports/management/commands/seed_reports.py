@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from waste_reports.models import Report
+from waste_reports.seeding import DEFAULT_STATUS_MIX, ReportGenerator, ensure_seed_users, parse_status_mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the reports collection with synthetic, clustered reports for load testing. "
+        "Use a scratch database: seeded reports are indistinguishable from real ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help="Reports to create")
+        parser.add_argument('--users', type=int, default=200, help="Seed users the reports are spread over")
+        parser.add_argument('--password', default='loadtest-password', help="Password of the seed users")
+        parser.add_argument('--centre', default='77.5946,12.9716', help="City centre as lng,lat")
+        parser.add_argument('--radius-km', type=float, default=15, help="Radius of the seeded area")
+        parser.add_argument('--hotspots', type=int, default=40, help="Clusters reports gather around")
+        parser.add_argument('--spread-m', type=float, default=300, help="Typical distance from a hotspot")
+        parser.add_argument('--scatter', type=float, default=0.1, help="Fraction of reports placed anywhere")
+        parser.add_argument('--days', type=int, default=365, help="How far back created_at goes")
+        parser.add_argument(
+            '--status-mix',
+            default=','.join(f"{name}={weight}" for name, weight in DEFAULT_STATUS_MIX.items()),
+            help="Status weights, e.g. 'Pending=0.5,In Progress=0.2,Resolved=0.3'"
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help="Reports per insert")
+        parser.add_argument('--seed', type=int, help="Random seed for a reproducible data set")
+
+    def handle(self, *args, **options):
+        try:
+            lng, lat = (float(value) for value in options['centre'].split(','))
+            status_mix = parse_status_mix(options['status_mix'])
+        except ValueError as e:
+            raise CommandError(f"Invalid option: {e}")
+        if options['count'] < 1 or options['users'] < 1:
+            raise CommandError("--count and --users must be positive")
+
+        user_ids = ensure_seed_users(options['users'], options['password'])
+        generator = ReportGenerator(
+            user_ids, (lng, lat),
+            radius_m=options['radius_km'] * 1000,
+            hotspots=options['hotspots'],
+            spread_m=options['spread_m'],
+            scatter=options['scatter'],
+            days=options['days'],
+            status_mix=status_mix,
+            seed=options['seed']
+        )
+
+        started = time.monotonic()
+        inserted = 0
+        for batch in generator.batches(options['count'], options['batch_size']):
+            inserted += Report.bulk_create_reports(batch)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"inserted={inserted} rate={inserted / elapsed:.0f} reports/sec")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {inserted} reports for {len(user_ids)} users in {time.monotonic() - started:.1f}s. "
+            f"Run recompute_priorities to fill in neighbour density."
+        ))
@@ -0,0 +1,333 @@
+"""
+Prometheus metrics without a client library.
+
+Every thread records into its own shard (a plain dict only that thread
+writes), so the hot path is a dict update with no lock. A scrape sums the
+shards; shards of threads that have exited are folded into a retired
+shard so their counts survive. Values read from a shard while its thread
+is writing may be one observation behind, which is fine for metrics.
+
+The registry belongs to one process. Under Gunicorn with several workers
+each scrape lands on one of them, so counters would jump between workers'
+totals and look like resets. Set METRICS['multiprocess_dir'] to a directory
+shared by the workers: each process then writes its totals there every
+`flush_seconds` (and on each scrape), and a scrape sums every file. Files of
+exited workers are kept so counters never go backwards; empty the directory
+when the server starts. Collector values (cache hits, log queue) stay
+per-process and carry a `pid` label in that mode.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+INFERENCE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class Registry:
+    def __init__(self, multiprocess_dir=None, flush_seconds=10):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []       # (thread, shard) pairs
+        self._retired = {}
+        self._metrics = []
+        self._collectors = []
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_seconds = flush_seconds
+        self._flusher_pid = None
+        self._path = None
+        if multiprocess_dir:
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                # Thread-per-request servers register a shard per thread; fold
+                # finished ones here too, not only when someone scrapes
+                self._prune()
+                self._shards.append((threading.current_thread(), shard))
+            if self.multiprocess_dir and self._flusher_pid != os.getpid():
+                self._start_flusher()
+            return shard
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() -> iterable of (name, type, help, [(labels dict, value), ...]) read at scrape time"""
+        self._collectors.append(collector)
+
+    def _merge(self, target, shard):
+        for key, value in shard.copy().items():
+            if isinstance(value, list):
+                merged = target.get(key)
+                if merged is None:
+                    target[key] = list(value)
+                else:
+                    for i, item in enumerate(value):
+                        merged[i] += item
+            else:
+                target[key] = target.get(key, 0) + value
+
+    def _prune(self):
+        # Caller holds self._lock
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = alive
+
+    def collect(self):
+        """Summed values across threads: {(metric name, label values): value}"""
+        with self._lock:
+            self._prune()
+            totals = {}
+            self._merge(totals, self._retired)
+            for _, shard in self._shards:
+                self._merge(totals, shard)
+        return totals
+
+    def _after_fork(self):
+        # A forked worker starts from zero; the parent's counts are in the parent's file
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._flusher_pid = None
+        self._path = None
+
+    def _start_flusher(self):
+        with self._lock:
+            # Threads don't survive fork, so each worker starts its own
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._path = os.path.join(self.multiprocess_dir, f"metrics-{os.getpid()}-{time.time_ns()}.json")
+
+        def run():
+            while True:
+                time.sleep(self.flush_seconds)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+    def flush(self):
+        """Write this process's totals to its file in multiprocess_dir"""
+        if self._path is None or self._flusher_pid != os.getpid():
+            return
+        entries = [[name, list(values), value] for (name, values), value in self.collect().items()]
+        fd, tmp = tempfile.mkstemp(dir=self.multiprocess_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self._path)
+
+    def collect_all(self):
+        """Totals summed over every process's file (just this process without multiprocess_dir)"""
+        if not self.multiprocess_dir:
+            return self.collect()
+        self.shard()
+        self.flush()
+        totals = {}
+        for filename in os.listdir(self.multiprocess_dir):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.multiprocess_dir, filename)) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._merge(totals, {(name, tuple(values)): value for name, values, value in entries})
+        return totals
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        totals = self.collect_all()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(totals))
+        extra = {'pid': os.getpid()} if self.multiprocess_dir else {}
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels({**labels, **extra})} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = (self.name, tuple(map(labels.__getitem__, self.labelnames)))
+        shard = self.registry.shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self, totals):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for (name, values), value in sorted(totals.items(), key=_sort_key):
+            if name == self.name:
+                yield f"{self.name}{_labels(dict(zip(self.labelnames, values)))} {_number(value)}"
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        registry.register(self)
+
+    def observe(self, seconds, **labels):
+        key = (self.name, tuple(map(labels.__getitem__, self.labelnames)))
+        shard = self.registry.shard()
+        # Per-bucket (non-cumulative) counts, then +Inf, sum and count
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, seconds)] += 1
+        state[-2] += seconds
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self, totals):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for (name, values), state in sorted(totals.items(), key=_sort_key):
+            if name != self.name:
+                continue
+            labels = dict(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}"
+            yield f"{self.name}_sum{_labels(labels)} {_number(state[-2])}"
+            yield f"{self.name}_count{_labels(labels)} {state[-1]}"
+
+
+def _sort_key(item):
+    (name, values), _ = item
+    return name, tuple(str(value) for value in values)
+
+
+registry = Registry(
+    multiprocess_dir=getattr(settings, 'METRICS', {}).get('multiprocess_dir') or None,
+    flush_seconds=getattr(settings, 'METRICS', {}).get('flush_seconds', 10),
+)
+
+http_requests = Counter(
+    registry, 'http_requests_total', 'HTTP responses by URL name, method and status code',
+    ('view', 'method', 'status')
+)
+http_request_duration = Histogram(
+    registry, 'http_request_duration_seconds', 'Request latency by URL name', ('view',)
+)
+http_exceptions = Counter(
+    registry, 'http_request_exceptions_total', 'Unhandled exceptions raised by views', ('view',)
+)
+mongo_command_duration = Histogram(
+    registry, 'mongodb_command_duration_seconds', 'MongoDB command latency by command name',
+    ('command',), buckets=MONGO_BUCKETS
+)
+mongo_command_failures = Counter(
+    registry, 'mongodb_command_failures_total', 'Failed MongoDB commands by command name', ('command',)
+)
+rate_limit_decisions = Counter(
+    registry, 'rate_limit_decisions_total', 'Rate limiter decisions by endpoint, bucket scope and outcome',
+    ('endpoint', 'scope', 'decision')
+)
+category_inference = Histogram(
+    registry, 'category_inference_seconds', 'Category prediction time (single report or import batch)',
+    ('mode',), buckets=INFERENCE_BUCKETS
+)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Passed to MongoClient(event_listeners=...); pymongo reports each command's duration"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name)
+        mongo_command_failures.inc(command=event.command_name)
+
+
+def _cache_metrics():
+    from .authentication import jwt_token_stats
+    from .cache import dashboard_summary_stats, report_list_stats
+    from .idempotency import idempotency_stats
+    counters = (report_list_stats, dashboard_summary_stats, jwt_token_stats, idempotency_stats)
+    snapshots = [(counter.name, counter.snapshot()) for counter in counters]
+    yield ('cache_hits_total', 'counter', 'Cache hits by cache',
+           [({'cache': name}, snapshot['hits']) for name, snapshot in snapshots])
+    yield ('cache_misses_total', 'counter', 'Cache misses by cache',
+           [({'cache': name}, snapshot['misses']) for name, snapshot in snapshots])
+    yield ('cache_hit_ratio', 'gauge', 'Cache hit ratio since process start',
+           [({'cache': name}, snapshot['hit_rate']) for name, snapshot in snapshots])
+
+
+def _logging_metrics():
+    from .log_handlers import stats
+    snapshot = stats()
+    yield ('log_records_dropped_total', 'counter', 'Log records dropped because the logging queue was full',
+           [({}, snapshot['dropped'])])
+    yield ('log_queue_depth', 'gauge', 'Log records waiting for the logging thread', [({}, snapshot['queued'])])
+
+
+registry.add_collector(_cache_metrics)
+registry.add_collector(_logging_metrics)
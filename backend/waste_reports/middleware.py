@@ -0,0 +1,78 @@
+import logging
+import time
+
+from django.conf import settings
+
+from .metrics import http_exceptions, http_request_duration, http_requests
+from .query_budget import QueryBudgetExceeded, track_queries
+
+logger = logging.getLogger(__name__)
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def _view_name(request):
+    """URL name from urls.py, so label values stay bounded (no raw paths or ids)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+class MetricsMiddleware:
+    """Request count, latency and error metrics per named URL"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        view = _view_name(request)
+        http_request_duration.observe(time.perf_counter() - started, view=view)
+        http_requests.inc(
+            view=view,
+            method=request.method if request.method in KNOWN_METHODS else 'OTHER',
+            status=str(response.status_code)
+        )
+        return response
+
+    def process_exception(self, request, exception):
+        http_exceptions.inc(view=_view_name(request))
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts MongoDB queries per request. Adds X-DB-Queries / X-DB-Time in DEBUG,
+    and logs a warning - or raises, with QUERY_BUDGET['strict'] - when a view
+    declared with @query_budget(n) goes over n.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = getattr(settings, 'QUERY_BUDGET', {})
+        if not config.get('enabled', True):
+            return self.get_response(request)
+
+        with track_queries() as tracker:
+            response = self.get_response(request)
+
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(tracker.queries)
+            response['X-DB-Time'] = f"{tracker.seconds * 1000:.1f}ms"
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and tracker.queries > budget:
+            message = (
+                f"{request.method} {request.path} ({_view_name(request)}) issued {tracker.queries} "
+                f"MongoDB queries, budget is {budget}: {tracker.summary()}"
+            )
+            if config.get('strict', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
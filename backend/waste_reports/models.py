@@ -1,10 +1,19 @@
 from datetime import datetime
 from bson import ObjectId
-from django.contrib.auth.hashers import make_password, check_password
 from .database import mongodb
+from .cache import bump_version
+from .events import report_events, report_event_data
 import logging
-from pymongo import ASCENDING
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from datetime import timedelta
+from collections import Counter
+from .sketches import TDigest
+from . import priority
+from .wards import assign_ward
+from .geo import bbox_geometry
+from .spatial_index import nearby_index, PROJECTION as NEARBY_PROJECTION
+from . import passwords
 logger = logging.getLogger(__name__)
 
 class User:
@@ -15,7 +24,7 @@ class User:
         try:
             user_data = {
                 'email': email.lower(),
-                'password': make_password(password),
+                'password': passwords.hash_password(password),
                 'name': name,
                 'is_admin': is_admin,
                 'created_at': datetime.utcnow(),
@@ -48,86 +57,245 @@ class User:
     
     @classmethod
     def verify_password(cls, user, password):
+        """Check a login password; upgrades the stored hash when the hasher settings have changed"""
         try:
-            return check_password(password, user['password'])
+            matches, needs_rehash = passwords.verify_password(password, user['password'])
+        except passwords.HashingPoolSaturated:
+            raise
         except Exception as e:
             logger.error(f"Failed to verify password: {e}")
             return False
+        if matches and needs_rehash:
+            cls._rehash_password(user, password)
+        return matches
+    
+    @classmethod
+    def _rehash_password(cls, user, password):
+        try:
+            # Only replace the hash we verified against, in case the password changed meanwhile
+            cls.collection.update_one(
+                {'_id': user['_id'], 'password': user['password']},
+                {'$set': {'password': passwords.hash_password(password)}}
+            )
+        except passwords.HashingPoolSaturated:
+            pass  # try again on the next login
+        except Exception as e:
+            logger.error(f"Failed to rehash password for user {user['_id']}: {e}")
 
 class Report:
     collection = mongodb.db.reports
     deleted_collection = mongodb.db.deleted_data
+    tombstones = mongodb.db.report_tombstones
     
     @classmethod
     def archive_old_resolved(cls):
         try:
             ten_days_ago = datetime.utcnow() - timedelta(days=10)
+            # resolved_at, not updated_at: urgency votes and ward backfills also move updated_at.
+            # Reports resolved before resolved_at was recorded fall back to updated_at
             old_resolved = cls.collection.find({
                 'status': 'Resolved',
-                'updated_at': {'$lt': ten_days_ago}
+                '$or': [
+                    {'resolved_at': {'$lt': ten_days_ago}},
+                    {'resolved_at': {'$exists': False}, 'updated_at': {'$lt': ten_days_ago}}
+                ]
             })
-
-            for report in old_resolved:
-                cls.deleted_collection.insert_one(report)
-                cls.collection.delete_one({'_id': report['_id']})
-                logger.info(f"Archived report: {report['_id']}")
+            cls._archive(old_resolved, reason='archived')
 
         except Exception as e:
             logger.error(f"Failed to archive old resolved reports: {e}")
+
+    @classmethod
+    def archive_user_reports(cls, user_id):
+        """Move a banned user's reports out of the live collection"""
+        try:
+            return cls._archive(cls.collection.find({'user_id': user_id}), reason='user_banned')
+        except Exception as e:
+            logger.error(f"Failed to archive reports of user {user_id}: {e}")
+            raise
+
+    @classmethod
+    def _archive(cls, reports, reason):
+        """Copy reports to deleted_data, remove them and leave tombstones for delta sync"""
+        archived = 0
+        for report in reports:
+            cls.deleted_collection.insert_one(report)
+            cls.collection.delete_one({'_id': report['_id']})
+            cls.tombstones.insert_one({
+                'report_id': str(report['_id']),
+                'user_id': report.get('user_id'),
+                'reason': reason,
+                'deleted_at': datetime.utcnow()
+            })
+            archived += 1
+            report_events.publish_local('archived', {'id': str(report['_id'])})
+            logger.info(f"Archived report: {report['_id']}")
+        
+        if archived:
+            bump_version()
+        return archived
+
+    @classmethod
+    def build_report_document(cls, user_id, description, latitude, longitude, image_url=None,
+                              category=None, status='Pending', created_at=None):
+        now = datetime.utcnow()
+        report = {
+            'user_id': user_id,
+            'description': description,
+            'status': status,
+            'location': {
+                'type': 'Point',
+                'coordinates': [float(longitude), float(latitude)]
+            },
+            'image_url': image_url,
+            'urgency_count': 0,
+            'created_at': created_at or now,
+            'updated_at': now,
+            'admin_remarks': None,
+            'category': category,  # ✅ Add this line
+            'ward_id': assign_ward(longitude, latitude)
+        }
+        # Only open reports carry a priority_key, so the queue index holds nothing else
+        if status in priority.OPEN_STATUSES:
+            report['nearby_open_count'] = 0
+            report['priority_key'] = priority.priority_key(report)
+        return report
+
     @classmethod
     def create_report(cls, user_id, description, latitude, longitude, image_url=None, category=None):
         try:
-            report_data = {
-                'user_id': user_id,
-                'description': description,
-                'status': 'Pending',
-                'location': {
-                    'type': 'Point',
-                    'coordinates': [float(longitude), float(latitude)]
-                },
-                'image_url': image_url,
-                'urgency_count': 0,
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow(),
-                'admin_remarks': None,
-                'category': category  # ✅ Add this line
-            }
+            report_data = cls.build_report_document(
+                user_id, description, latitude, longitude,
+                image_url=image_url, category=category
+            )
+            nearby = cls._count_open_neighbours(report_data['location'])
+            report_data['nearby_open_count'] = nearby
+            report_data['priority_key'] = priority.priority_key(report_data, nearby)
             
             result = cls.collection.insert_one(report_data)
             report_data['_id'] = result.inserted_id
+            cls._shift_neighbour_density(report_data, 1)
+            bump_version()
+            ReportRollup.record_created([report_data])
+            report_events.publish_local('created', report_event_data(report_data))
             logger.info(f"Report created successfully: {result.inserted_id}")
             return report_data
         except Exception as e:
             logger.error(f"Failed to create report: {e}")
             raise
 
+    @classmethod
+    def bulk_create_reports(cls, documents):
+        """Insert pre-built report documents in one round trip, skipping rows that fail"""
+        if not documents:
+            return 0
+        failed = set()
+        try:
+            cls.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            logger.error(f"Bulk insert partially failed: {len(failed)} errors")
+        
+        stored = [document for i, document in enumerate(documents) if i not in failed]
+        if stored:
+            bump_version()
+            ReportRollup.record_created(stored)
+            # One summary event instead of one per row; clients refetch
+            report_events.publish_local('bulk_created', {'count': len(stored)})
+        return len(stored)
+
+    @classmethod
+    def all_reports_cursor(cls, status_filter=None, limit=100, skip=0, ward_id=None, collection=None):
+        # Cursor builders take an optional collection so the query-plan tests can explain() them
+        query = {}
+        if status_filter:
+            query['status'] = status_filter
+        if ward_id:
+            query['ward_id'] = ward_id
+        
+        return ((collection if collection is not None else cls.collection).find(query)
+                .sort('created_at', -1)
+                .limit(limit)
+                .skip(skip))
     
     @classmethod
-    def get_all_reports(cls, status_filter=None, limit=100, skip=0):
+    def get_all_reports(cls, status_filter=None, limit=100, skip=0, ward_id=None):
         try:
-            query = {}
-            if status_filter:
-                query['status'] = status_filter
-            
-            return list(cls.collection.find(query)
-                       .sort('created_at', -1)
-                       .limit(limit)
-                       .skip(skip))
+            return list(cls.all_reports_cursor(status_filter, limit, skip, ward_id=ward_id))
         except Exception as e:
             logger.error(f"Failed to get all reports: {e}")
             return []
     
+    @classmethod
+    def user_reports_cursor(cls, user_id, limit=100, skip=0, collection=None):
+        return ((collection if collection is not None else cls.collection).find({'user_id': user_id})
+                .sort('created_at', -1)
+                .limit(limit)
+                .skip(skip))
+    
     @classmethod
     def get_user_reports(cls, user_id, limit=100, skip=0):
         try:
-            return list(cls.collection.find({'user_id': user_id})
-                       .sort('created_at', -1)
-                       .limit(limit)
-                       .skip(skip))
+            return list(cls.user_reports_cursor(user_id, limit, skip))
         except Exception as e:
             logger.error(f"Failed to get user reports for {user_id}: {e}")
             return []
     
+    @classmethod
+    def get_changes_since(cls, user_id, report_after, deleted_after, until, limit=500):
+        """
+        Reports updated and tombstones recorded after the given (timestamp, id)
+        positions, up to `until`, oldest first. user_id=None means all users.
+        Returns (reports, reports_truncated, tombstones, tombstones_truncated).
+        """
+        try:
+            reports = cls._read_after(
+                cls.collection, 'updated_at', user_id, report_after, until, limit
+            )
+            tombstones = cls._read_after(
+                cls.tombstones, 'deleted_at', user_id, deleted_after, until, limit
+            )
+            return reports[:limit], len(reports) > limit, tombstones[:limit], len(tombstones) > limit
+        except Exception as e:
+            logger.error(f"Failed to get changes since {report_after}: {e}")
+            raise
+
+    @staticmethod
+    def _read_after(collection, field, user_id, after, until, limit):
+        after_time, after_id = after
+        query = {field: {'$gte': after_time, '$lte': until}}
+        if user_id:
+            query['user_id'] = user_id
+
+        # (field, _id) is the sort key; skip what the client already has at after_time
+        cursor = collection.find(query).sort([(field, 1), ('_id', 1)])
+        results = []
+        for document in cursor:
+            if document[field] == after_time and after_id and str(document['_id']) <= after_id:
+                continue
+            results.append(document)
+            if len(results) > limit:
+                break
+        cursor.close()
+        return results
+
+    @classmethod
+    def get_change_marker(cls, query=None):
+        """(max updated_at, count) for a filter - both answered from indexes, used for ETags"""
+        query = query or {}
+        try:
+            latest = cls.collection.find_one(
+                query, {'_id': 0, 'updated_at': 1}, sort=[('updated_at', -1)]
+            )
+            if query:
+                count = cls.collection.count_documents(query)
+            else:
+                count = cls.collection.estimated_document_count()
+            return (latest['updated_at'] if latest else None), count
+        except Exception as e:
+            logger.error(f"Failed to get change marker: {e}")
+            raise
+    
     @classmethod
     def get_by_id(cls, report_id):
         try:
@@ -138,6 +306,7 @@ class Report:
     
     @classmethod
     def update_status(cls, report_id, status, admin_remarks=None):
+        """Set status/remarks; returns the updated report, or None if it does not exist"""
         try:
             update_data = {
                 'status': status,
@@ -146,48 +315,262 @@ class Report:
             if admin_remarks:
                 update_data['admin_remarks'] = admin_remarks
             
-            result = cls.collection.update_one(
+            update = {'$set': update_data}
+            unset = {}
+            if status not in priority.OPEN_STATUSES:
+                unset['priority_key'] = ''
+            if status != 'Resolved':
+                unset['resolved_at'] = ''
+            if unset:
+                update['$unset'] = unset
+            
+            # The previous document tells us which rollup counters to move
+            previous = cls.collection.find_one_and_update(
                 {'_id': ObjectId(report_id)},
-                {'$set': update_data}
+                update,
+                return_document=ReturnDocument.BEFORE
             )
+            if previous is None:
+                return None
+            if status == 'Resolved' and previous['status'] != 'Resolved':
+                # Archival and the SLA sketches need the resolution time; updated_at moves on later writes
+                update_data['resolved_at'] = update_data['updated_at']
+                cls.collection.update_one(
+                    {'_id': previous['_id'], 'status': 'Resolved'},
+                    {'$set': {'resolved_at': update_data['resolved_at']}}
+                )
+            
+            report = {**previous, **update_data}
+            if status != 'Resolved':
+                report.pop('resolved_at', None)
+            was_open = previous['status'] in priority.OPEN_STATUSES
+            is_open = status in priority.OPEN_STATUSES
+            if was_open and not is_open:
+                report.pop('priority_key', None)
+                cls._shift_neighbour_density(report, -1)
+            elif is_open and not was_open:
+                cls._reopen_priority(report)
+            bump_version()
+            report_events.publish_local('updated', report_event_data(report))
+            if previous['status'] != status:
+                ReportRollup.record_status_change(previous, status)
+                ReportStatusEvent.record(previous, status, update_data['updated_at'], admin_remarks)
+                if status == 'Resolved':
+                    ResolutionSketch.record(report, update_data['updated_at'] - previous['created_at'])
             logger.info(f"Report {report_id} status updated to {status}")
-            return result
+            return report
         except Exception as e:
             logger.error(f"Failed to update report {report_id}: {e}")
             raise
     
     @classmethod
-    def get_reports_near_location(cls, longitude, latitude, max_distance=1000):
+    def increment_urgency(cls, report_id):
+        """Atomically bump urgency_count; returns the updated report or None if missing"""
         try:
-            return list(cls.collection.find({
-                'location': {
-                    '$near': {
-                        '$geometry': {
-                            'type': 'Point',
-                            'coordinates': [float(longitude), float(latitude)]
-                        },
-                        '$maxDistance': max_distance
+            # Pipeline update: priority_key moves with urgency, but only on open reports.
+            # updated_at moves too, so delta sync and the listing ETags see the vote
+            report = cls.collection.find_one_and_update(
+                {'_id': ObjectId(report_id)},
+                [{
+                    '$set': {
+                        'urgency_count': {'$add': [{'$ifNull': ['$urgency_count', 0]}, 1]},
+                        'updated_at': {'$literal': datetime.utcnow()},
+                        'priority_key': {
+                            '$cond': [
+                                {'$eq': [{'$type': '$priority_key'}, 'missing']},
+                                '$$REMOVE',
+                                {'$add': ['$priority_key', priority.urgency_increment()]}
+                            ]
+                        }
                     }
+                }],
+                return_document=ReturnDocument.AFTER
+            )
+            if report:
+                bump_version()
+                report_events.publish_local('updated', {
+                    'id': report_id, 'urgency_count': report['urgency_count']
+                })
+            return report
+        except Exception as e:
+            logger.error(f"Failed to mark report {report_id} urgent: {e}")
+            raise
+    
+    @classmethod
+    def _count_open_neighbours(cls, location, exclude_id=None):
+        query = {'location': priority.neighbourhood(location), 'priority_key': {'$exists': True}}
+        if exclude_id is not None:
+            query['_id'] = {'$ne': exclude_id}
+        return cls.collection.count_documents(query)
+
+    @classmethod
+    def _shift_neighbour_density(cls, report, delta):
+        """A report opened (+1) or closed (-1): adjust open neighbours' density terms"""
+        try:
+            cls.collection.update_many(
+                {
+                    '_id': {'$ne': report['_id']},
+                    'location': priority.neighbourhood(report['location']),
+                    'priority_key': {'$exists': True}
+                },
+                {'$inc': {
+                    'nearby_open_count': delta,
+                    'priority_key': delta * priority.density_increment()
+                }}
+            )
+        except Exception as e:
+            logger.error(f"Failed to update neighbour priorities of {report['_id']}: {e}")
+
+    @classmethod
+    def _reopen_priority(cls, report):
+        """A resolved report was reopened: recompute its own score and join its neighbours'"""
+        nearby = cls._count_open_neighbours(report['location'], exclude_id=report['_id'])
+        report['nearby_open_count'] = nearby
+        report['priority_key'] = priority.priority_key(report, nearby)
+        cls.collection.update_one(
+            {'_id': report['_id']},
+            {'$set': {'nearby_open_count': nearby, 'priority_key': report['priority_key']}}
+        )
+        cls._shift_neighbour_density(report, 1)
+
+    @classmethod
+    def recompute_priorities(cls, batch_size=500):
+        """Backfill/repair priority_key on every report; returns the number of open reports scored"""
+        open_statuses = list(priority.OPEN_STATUSES)
+        cls.collection.update_many(
+            {'status': {'$nin': open_statuses}, 'priority_key': {'$exists': True}},
+            {'$unset': {'priority_key': '', 'nearby_open_count': ''}}
+        )
+        
+        scored = 0
+        operations = []
+        cursor = cls.collection.find(
+            {'status': {'$in': open_statuses}},
+            {'category': 1, 'urgency_count': 1, 'created_at': 1, 'location': 1}
+        ).batch_size(batch_size)
+        for report in cursor:
+            nearby = cls.collection.count_documents({
+                '_id': {'$ne': report['_id']},
+                'location': priority.neighbourhood(report['location']),
+                'status': {'$in': open_statuses}
+            })
+            operations.append(UpdateOne(
+                {'_id': report['_id']},
+                {'$set': {
+                    'nearby_open_count': nearby,
+                    'priority_key': priority.priority_key(report, nearby)
+                }}
+            ))
+            if len(operations) >= batch_size:
+                cls.collection.bulk_write(operations, ordered=False)
+                scored += len(operations)
+                operations = []
+        if operations:
+            cls.collection.bulk_write(operations, ordered=False)
+            scored += len(operations)
+        bump_version()
+        return scored
+
+    @classmethod
+    def priority_queue_cursor(cls, limit=50, category=None, ward_id=None, collection=None):
+        query = {'priority_key': {'$exists': True}}
+        if category:
+            query['category'] = category
+        if ward_id:
+            query['ward_id'] = ward_id
+        return ((collection if collection is not None else cls.collection).find(query)
+                .sort('priority_key', -1)
+                .limit(limit))
+    
+    @classmethod
+    def get_priority_queue(cls, limit=50, category=None, ward_id=None):
+        """Open reports by descending priority - a walk down the priority_key index"""
+        try:
+            return list(cls.priority_queue_cursor(limit, category, ward_id))
+        except Exception as e:
+            logger.error(f"Failed to get priority queue: {e}")
+            return []
+
+    @classmethod
+    def near_location_cursor(cls, longitude, latitude, max_distance=1000, collection=None):
+        return (collection if collection is not None else cls.collection).find({
+            'location': {
+                '$near': {
+                    '$geometry': {
+                        'type': 'Point',
+                        'coordinates': [float(longitude), float(latitude)]
+                    },
+                    '$maxDistance': max_distance
                 }
-            }))
+            }
+        }, NEARBY_PROJECTION)
+    
+    @classmethod
+    def get_reports_near_location(cls, longitude, latitude, max_distance=1000):
+        try:
+            local = nearby_index.near(float(longitude), float(latitude), max_distance)
+            if local is not None:
+                return local
+            return list(cls.near_location_cursor(longitude, latitude, max_distance))
         except Exception as e:
             logger.error(f"Failed to get reports near location: {e}")
             return []
     
+    @classmethod
+    def get_reports_in_bbox(cls, bbox):
+        """Reports inside (min_lng, min_lat, max_lng, max_lat) - local index when warm, else 2dsphere"""
+        try:
+            local = nearby_index.within_bbox(*bbox)
+            if local is not None:
+                return local
+            return list(cls.collection.find(
+                {'location': {'$geoWithin': {'$geometry': bbox_geometry(bbox)}}},
+                NEARBY_PROJECTION
+            ))
+        except Exception as e:
+            logger.error(f"Failed to get reports in bbox: {e}")
+            return []
+    
+    @classmethod
+    def get_open_reports_in_area(cls, geometry=None, ward_id=None, category=None, limit=None):
+        """Open reports inside a GeoJSON polygon (via the 2dsphere index) and/or a ward"""
+        try:
+            query = {'status': {'$in': list(priority.OPEN_STATUSES)}}
+            if geometry:
+                query['location'] = {'$geoWithin': {'$geometry': geometry}}
+            if ward_id:
+                query['ward_id'] = ward_id
+            if category:
+                query['category'] = category
+            cursor = cls.collection.find(query, {
+                'description': 1, 'category': 1, 'status': 1, 'location': 1, 'urgency_count': 1
+            })
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        except Exception as e:
+            logger.error(f"Failed to get open reports in area: {e}")
+            return []
+    
+    @classmethod
+    def search_cursor(cls, search_term, limit=50, collection=None):
+        return (collection if collection is not None else cls.collection).find({
+            '$text': {'$search': search_term}
+        }).limit(limit)
+    
     @classmethod
     def search_reports(cls, search_term, limit=50):
         try:
-            return list(cls.collection.find({
-                '$text': {'$search': search_term}
-            }).limit(limit))
+            return list(cls.search_cursor(search_term, limit))
         except Exception as e:
             logger.error(f"Failed to search reports: {e}")
             return []
     
     @classmethod
-    def get_stats(cls):
+    def get_stats(cls, ward_id=None):
         try:
-            pipeline = [
+            pipeline = [{'$match': {'ward_id': ward_id}}] if ward_id else []
+            pipeline += [
                 {
                     '$group': {
                         '_id': '$status',
@@ -208,3 +591,646 @@ class Report:
         except Exception as e:
             logger.error(f"Failed to get stats: {e}")
             return {'total': 0, 'pending': 0, 'in_progress': 0, 'resolved': 0}
+    
+    # Every field the dashboard's counting facets read, plus _id, so the scan
+    # feeding $facet can be answered from this index alone
+    SUMMARY_INDEX = [
+        ('ward_id', ASCENDING), ('status', ASCENDING), ('category', ASCENDING),
+        ('urgency_count', ASCENDING), ('updated_at', ASCENDING), ('_id', ASCENDING)
+    ]
+    SUMMARY_FIELDS = {
+        'description': 1, 'category': 1, 'status': 1, 'ward_id': 1, 'location': 1,
+        'urgency_count': 1, 'created_at': 1, 'updated_at': 1
+    }
+    
+    @classmethod
+    def get_dashboard_summary(cls, ward_id=None, top_limit=10, recent_limit=10):
+        """All admin dashboard panels from one $facet aggregation (one round trip)"""
+        open_statuses = list(priority.OPEN_STATUSES)
+        
+        def full_documents(limit):
+            # Only the few listed reports are fetched whole, by _id
+            return [
+                {'$limit': limit},
+                {'$lookup': {
+                    'from': cls.collection.name,
+                    'localField': '_id',
+                    'foreignField': '_id',
+                    'as': 'report'
+                }},
+                {'$unwind': '$report'},
+                {'$replaceRoot': {'newRoot': '$report'}},
+                {'$project': cls.SUMMARY_FIELDS}
+            ]
+        
+        def counts_by(field):
+            return [
+                {'$group': {
+                    '_id': f'${field}',
+                    'count': {'$sum': 1},
+                    'open': {'$sum': {'$cond': [{'$in': ['$status', open_statuses]}, 1, 0]}}
+                }},
+                {'$sort': {'count': -1}}
+            ]
+        
+        pipeline = [
+            {'$match': {'ward_id': ward_id} if ward_id else {}},
+            {'$project': {'_id': 1, 'ward_id': 1, 'status': 1, 'category': 1, 'urgency_count': 1, 'updated_at': 1}},
+            {'$facet': {
+                'totals': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+                'by_category': counts_by('category'),
+                'by_ward': counts_by('ward_id'),
+                'top_urgent': [
+                    {'$match': {'status': {'$in': open_statuses}}},
+                    {'$sort': {'urgency_count': -1, 'updated_at': -1}},
+                    *full_documents(top_limit)
+                ],
+                'recent_activity': [
+                    {'$sort': {'updated_at': -1}},
+                    *full_documents(recent_limit)
+                ]
+            }}
+        ]
+        
+        try:
+            result = next(cls.collection.aggregate(pipeline, hint=cls.SUMMARY_INDEX, allowDiskUse=True))
+        except Exception as e:
+            logger.error(f"Failed to get dashboard summary: {e}")
+            raise
+        
+        totals = {'total': 0, 'pending': 0, 'in_progress': 0, 'resolved': 0}
+        for item in result['totals']:
+            totals[item['_id'].lower().replace(' ', '_')] = item['count']
+            totals['total'] += item['count']
+        
+        return {
+            'totals': totals,
+            'by_category': [
+                {'category': item['_id'], 'count': item['count'], 'open': item['open']}
+                for item in result['by_category']
+            ],
+            'by_ward': [
+                {'ward_id': item['_id'], 'count': item['count'], 'open': item['open']}
+                for item in result['by_ward']
+            ],
+            'top_urgent': result['top_urgent'],
+            'recent_activity': result['recent_activity']
+        }
+    
+    @classmethod
+    def assign_wards(cls, reassign=False, batch_size=1000):
+        """Stamp ward_id on existing reports (only unassigned ones unless reassign); returns (scanned, changed)"""
+        query = {} if reassign else {'ward_id': None}
+        scanned = changed = 0
+        operations = []
+        cursor = cls.collection.find(query, {'location': 1, 'ward_id': 1}).batch_size(batch_size)
+        for report in cursor:
+            scanned += 1
+            longitude, latitude = report['location']['coordinates']
+            ward_id = assign_ward(longitude, latitude)
+            if ward_id != report.get('ward_id') or 'ward_id' not in report:
+                # updated_at so delta sync and listing ETags pick up the new ward
+                operations.append(UpdateOne(
+                    {'_id': report['_id']},
+                    {'$set': {'ward_id': ward_id, 'updated_at': datetime.utcnow()}}
+                ))
+            if len(operations) >= batch_size:
+                changed += cls.collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            changed += cls.collection.bulk_write(operations, ordered=False).modified_count
+        if changed:
+            bump_version()
+        return scanned, changed
+
+
+class ImportJob:
+    """Checkpoints for resumable bulk imports, keyed by job id"""
+    collection = mongodb.db.import_jobs
+
+    @classmethod
+    def get(cls, job_id):
+        try:
+            return cls.collection.find_one({'_id': job_id})
+        except Exception as e:
+            logger.error(f"Failed to get import job {job_id}: {e}")
+            return None
+
+    @classmethod
+    def checkpoint(cls, job_id, rows_done, inserted, rejected, finished=False):
+        try:
+            cls.collection.update_one(
+                {'_id': job_id},
+                {
+                    '$set': {
+                        'rows_done': rows_done,
+                        'inserted': inserted,
+                        'rejected': rejected,
+                        'finished': finished,
+                        'updated_at': datetime.utcnow()
+                    },
+                    '$setOnInsert': {'created_at': datetime.utcnow()}
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to checkpoint import job {job_id}: {e}")
+            raise
+
+
+class IdempotencyKey:
+    """
+    Outcomes of create requests sent with an Idempotency-Key, keyed by
+    "<user_id>:<key>".
+
+    A record is inserted as 'pending' by the request that claims the key (the
+    unique _id decides concurrent duplicates) and becomes 'completed' with the
+    rendered response it produced. The TTL index on expires_at removes records after
+    the replay window.
+    """
+    collection = mongodb.db.idempotency_keys
+
+    @classmethod
+    def get(cls, key_id):
+        return cls.collection.find_one({'_id': key_id})
+
+    @classmethod
+    def claim(cls, key_id, fingerprint, ttl):
+        """True if this request inserted the pending record, False if the key already exists"""
+        now = datetime.utcnow()
+        try:
+            cls.collection.insert_one({
+                '_id': key_id,
+                'state': 'pending',
+                'fingerprint': fingerprint,
+                'locked_at': now,
+                'expires_at': now + timedelta(seconds=ttl)
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+
+    @classmethod
+    def take_over(cls, key_id, locked_at):
+        """Claim a pending record older than the lease, presumed abandoned by a request that died"""
+        result = cls.collection.update_one(
+            {'_id': key_id, 'state': 'pending', 'locked_at': locked_at},
+            {'$set': {'locked_at': datetime.utcnow()}}
+        )
+        return result.modified_count == 1
+
+    @classmethod
+    def complete(cls, key_id, status_code, content, content_type):
+        cls.collection.update_one(
+            {'_id': key_id, 'state': 'pending'},
+            {'$set': {
+                'state': 'completed',
+                'status': status_code,
+                'content': content,
+                'content_type': content_type,
+                'completed_at': datetime.utcnow()
+            }}
+        )
+
+    @classmethod
+    def release(cls, key_id):
+        """Forget a pending key so the client can retry the request"""
+        cls.collection.delete_one({'_id': key_id, 'state': 'pending'})
+
+
+class ReportRollup:
+    """
+    Pre-aggregated report counts per hour/day bucket x category x status x ward.
+
+    A report is counted in the buckets of its created_at under its current
+    status; status changes move it between status counters, so any date
+    range is answered by reading buckets instead of reports.
+    """
+    collection = mongodb.db.report_rollups
+    GRANULARITIES = ('hour', 'day')
+
+    @staticmethod
+    def bucket_start(when, granularity):
+        if granularity == 'hour':
+            return when.replace(minute=0, second=0, microsecond=0)
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def _key(cls, report, granularity, status):
+        return {
+            'granularity': granularity,
+            'bucket': cls.bucket_start(report['created_at'], granularity),
+            'category': report.get('category'),
+            'status': status,
+            'ward_id': report.get('ward_id')
+        }
+
+    @classmethod
+    def _apply(cls, increments):
+        """increments: list of (key, delta) - written in one bulk round trip"""
+        operations = [
+            UpdateOne(key, {'$inc': {'count': delta}}, upsert=True)
+            for key, delta in increments if delta
+        ]
+        if not operations:
+            return
+        try:
+            cls.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to update report rollups: {e}")
+
+    @classmethod
+    def record_created(cls, reports):
+        counts = Counter()
+        for report in reports:
+            for granularity in cls.GRANULARITIES:
+                counts[tuple(cls._key(report, granularity, report['status']).items())] += 1
+        cls._apply([(dict(key), delta) for key, delta in counts.items()])
+
+    @classmethod
+    def record_status_change(cls, previous, new_status):
+        increments = []
+        for granularity in cls.GRANULARITIES:
+            increments.append((cls._key(previous, granularity, previous['status']), -1))
+            increments.append((cls._key(previous, granularity, new_status), 1))
+        cls._apply(increments)
+
+    @classmethod
+    def get_timeseries(cls, start, end, granularity='day', category=None, status=None, ward_id=None):
+        """[{bucket, total, by_status, by_category}] for every non-empty bucket in [start, end]"""
+        try:
+            query = {
+                'granularity': granularity,
+                'bucket': {
+                    '$gte': cls.bucket_start(start, granularity),
+                    '$lte': end
+                }
+            }
+            if category:
+                query['category'] = category
+            if status:
+                query['status'] = status
+            if ward_id:
+                query['ward_id'] = ward_id
+
+            series = {}
+            for row in cls.collection.find(query, {'_id': 0}).sort('bucket', ASCENDING):
+                if row['count'] <= 0:
+                    continue
+                point = series.setdefault(row['bucket'], {
+                    'bucket': row['bucket'], 'total': 0, 'by_status': Counter(), 'by_category': Counter()
+                })
+                point['total'] += row['count']
+                point['by_status'][row['status']] += row['count']
+                point['by_category'][row['category'] or 'Uncategorized'] += row['count']
+
+            return [
+                {**point, 'by_status': dict(point['by_status']), 'by_category': dict(point['by_category'])}
+                for point in series.values()
+            ]
+        except Exception as e:
+            logger.error(f"Failed to get report timeseries: {e}")
+            raise
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Recompute every bucket from the reports collection in one aggregation pass"""
+        pipeline = [
+            {
+                '$group': {
+                    '_id': {
+                        'bucket': {'$dateTrunc': {'date': '$created_at', 'unit': 'hour'}},
+                        'category': '$category',
+                        'status': '$status',
+                        'ward_id': '$ward_id'
+                    },
+                    'count': {'$sum': 1}
+                }
+            }
+        ]
+        # Day buckets are summed from the hour buckets, so the reports are scanned once
+        hourly = []
+        daily = Counter()
+        for row in Report.collection.aggregate(pipeline, allowDiskUse=True):
+            key = row['_id']
+            hourly.append({
+                'granularity': 'hour',
+                'bucket': key['bucket'],
+                'category': key.get('category'),
+                'status': key['status'],
+                'ward_id': key.get('ward_id'),
+                'count': row['count']
+            })
+            day_key = (cls.bucket_start(key['bucket'], 'day'), key.get('category'), key['status'], key.get('ward_id'))
+            daily[day_key] += row['count']
+
+        documents = hourly + [
+            {
+                'granularity': 'day', 'bucket': bucket, 'category': category,
+                'status': status, 'ward_id': ward_id, 'count': count
+            }
+            for (bucket, category, status, ward_id), count in daily.items()
+        ]
+
+        cls.collection.delete_many({})
+        for i in range(0, len(documents), batch_size):
+            cls.collection.insert_many(documents[i:i + batch_size])
+        logger.info(f"Rebuilt report rollups: {len(documents)} buckets")
+        return len(documents)
+
+
+class ReportStatusEvent:
+    """
+    Append-only status history in bucketed documents: one document per report
+    per calendar month holding up to BUCKET_SIZE events. Recording a transition
+    is a single upsert that pushes into the open bucket (or starts a new one
+    when it is full), so the write costs one round trip and reads touch a
+    handful of documents instead of one per event.
+
+    Compaction merges a window's partially filled buckets without a
+    transaction: a source bucket is first frozen (guarded on the count that
+    was read, so no event can land in it afterwards), its events are pushed
+    into the target together with the source id in `merged`, and only then
+    is the source deleted. Readers skip buckets already listed in another
+    bucket's `merged`, and a crash at any step is finished by the next run.
+    """
+    collection = mongodb.db.report_status_events
+    BUCKET_SIZE = 50
+
+    @staticmethod
+    def window_start(at):
+        return at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def record(cls, previous, new_status, at, admin_remarks=None):
+        event = {'from_status': previous['status'], 'to_status': new_status, 'at': at}
+        if admin_remarks:
+            event['admin_remarks'] = admin_remarks
+        try:
+            cls.collection.update_one(
+                {
+                    'report_id': str(previous['_id']),
+                    'window_start': cls.window_start(at),
+                    'count': {'$lt': cls.BUCKET_SIZE},
+                    'frozen': {'$exists': False}
+                },
+                {
+                    '$push': {'events': event},
+                    '$inc': {'count': 1},
+                    '$min': {'first_at': at},
+                    '$max': {'last_at': at}
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to record status event for {previous['_id']}: {e}")
+
+    @classmethod
+    def get_history(cls, report_id, page=1, page_size=20):
+        """Newest-first page of a report's status events; returns (events, total)"""
+        try:
+            buckets = list(cls.collection.find(
+                {'report_id': report_id}, {'count': 1, 'merged': 1}
+            ).sort([('last_at', -1), ('_id', -1)]))
+            buckets = cls._drop_merged(buckets)
+            total = sum(bucket['count'] for bucket in buckets)
+
+            # Work out which buckets hold the requested slice before loading any events
+            offset = (page - 1) * page_size
+            needed, skip_first, seen = [], 0, 0
+            for bucket in buckets:
+                if seen + bucket['count'] > offset and seen < offset + page_size:
+                    if not needed:
+                        skip_first = offset - seen
+                    needed.append(bucket['_id'])
+                seen += bucket['count']
+
+            # A compaction may have merged (or deleted) one of them since the first read
+            documents = {
+                document['_id']: document
+                for document in cls._drop_merged(
+                    list(cls.collection.find({'_id': {'$in': needed}}, {'events': 1, 'merged': 1}))
+                )
+            }
+            events = []
+            for bucket_id in needed:
+                if bucket_id in documents:
+                    events.extend(sorted(documents[bucket_id]['events'], key=lambda e: e['at'], reverse=True))
+            return events[skip_first:skip_first + page_size], total
+        except Exception as e:
+            logger.error(f"Failed to get status history for {report_id}: {e}")
+            raise
+
+    @staticmethod
+    def _drop_merged(buckets):
+        """Buckets minus sources whose events were already pushed into another bucket"""
+        merged = {bucket_id for bucket in buckets for bucket_id in bucket.get('merged', ())}
+        return [bucket for bucket in buckets if bucket['_id'] not in merged]
+
+    @classmethod
+    def fragmented_reports(cls):
+        """Report ids with more than one partially filled bucket in a window, or an unfinished compaction"""
+        pipeline = [
+            {'$match': {'count': {'$lt': cls.BUCKET_SIZE}}},
+            {'$group': {'_id': {'report_id': '$report_id', 'window_start': '$window_start'}, 'buckets': {'$sum': 1}}},
+            {'$match': {'buckets': {'$gt': 1}}},
+            {'$group': {'_id': '$_id.report_id'}}
+        ]
+        report_ids = {row['_id'] for row in cls.collection.aggregate(pipeline, allowDiskUse=True)}
+        report_ids.update(cls.collection.distinct('report_id', {'frozen': True}))
+        return sorted(report_ids)
+
+    @classmethod
+    def compact(cls, report_id):
+        """Merge each window's partially filled buckets into as few as fit; returns buckets removed"""
+        buckets = list(cls.collection.find({'report_id': report_id}, {'events': 0}))
+        merged_into = {
+            bucket_id: bucket['_id'] for bucket in buckets for bucket_id in bucket.get('merged', ())
+        }
+        removed = 0
+
+        windows = {}
+        for bucket in buckets:
+            if bucket['_id'] in merged_into:
+                # Left behind by an interrupted run after its events were moved
+                removed += cls.collection.delete_one({'_id': bucket['_id'], 'frozen': True}).deleted_count
+                continue
+            if bucket.get('frozen'):
+                # Interrupted before its events were moved: it is an ordinary bucket again
+                cls.collection.update_one({'_id': bucket['_id']}, {'$unset': {'frozen': ''}})
+            if bucket['count'] < cls.BUCKET_SIZE:
+                windows.setdefault(bucket['window_start'], []).append(bucket)
+
+        for partial in windows.values():
+            # Fill the fullest bucket first, taking the smallest sources that still fit
+            partial.sort(key=lambda bucket: -bucket['count'])
+            target, sources = partial[0], sorted(partial[1:], key=lambda bucket: bucket['count'])
+            room = cls.BUCKET_SIZE - target['count']
+            for source in sources:
+                if source['count'] > room:
+                    continue
+                if cls._move(source, target['_id']):
+                    room -= source['count']
+                    removed += 1
+        return removed
+
+    @classmethod
+    def _move(cls, source, target_id):
+        """Move one bucket's events into target_id; False if it changed meanwhile or no longer fits"""
+        # Freezing on the count we read keeps record() out of it from here on
+        frozen = cls.collection.find_one_and_update(
+            {'_id': source['_id'], 'count': source['count']},
+            {'$set': {'frozen': True}},
+            return_document=ReturnDocument.AFTER
+        )
+        if frozen is None:
+            return False
+
+        events = frozen['events']
+        # The source id travels with its events, so a repeat of this step is a no-op
+        cls.collection.update_one(
+            {
+                '_id': target_id,
+                'count': {'$lte': cls.BUCKET_SIZE - len(events)},
+                'merged': {'$ne': source['_id']}
+            },
+            {
+                '$push': {'events': {'$each': events}},
+                '$inc': {'count': len(events)},
+                '$addToSet': {'merged': source['_id']},
+                '$min': {'first_at': frozen['first_at']},
+                '$max': {'last_at': frozen['last_at']}
+            }
+        )
+        if cls.collection.count_documents({'_id': target_id, 'merged': source['_id']}, limit=1):
+            cls.collection.delete_one({'_id': source['_id'], 'frozen': True})
+            return True
+
+        # The target filled up concurrently; let record() use the source again
+        cls.collection.update_one({'_id': source['_id']}, {'$unset': {'frozen': ''}})
+        return False
+
+
+class ResolutionSketch:
+    """
+    Time-to-resolution t-digests, one document per category x ward.
+
+    Durations are $push-ed into a small pending list (one atomic write per
+    resolution); once it grows past COMPACT_AFTER the list is folded into the
+    centroids with an optimistic version check, so concurrent writers never
+    lose samples. Reads merge the requested sketches, which costs the same
+    however many reports have been resolved.
+    """
+    collection = mongodb.db.resolution_sketches
+    COMPRESSION = 100
+    COMPACT_AFTER = 200
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    @staticmethod
+    def _id(category, ward_id):
+        return {'category': category, 'ward_id': ward_id}
+
+    @classmethod
+    def record(cls, report, duration):
+        hours = duration.total_seconds() / 3600
+        key = cls._id(report.get('category'), report.get('ward_id'))
+        try:
+            sketch = cls.collection.find_one_and_update(
+                {'_id': key},
+                {
+                    '$push': {'pending': hours},
+                    '$inc': {'version': 1, 'pending_count': 1}
+                },
+                projection={'pending_count': 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            if sketch['pending_count'] >= cls.COMPACT_AFTER:
+                cls.compact(key)
+        except Exception as e:
+            logger.error(f"Failed to record resolution time for {report['_id']}: {e}")
+
+    @classmethod
+    def compact(cls, key):
+        document = cls.collection.find_one({'_id': key})
+        if not document:
+            return False
+        digest = cls._digest(document)
+        result = cls.collection.update_one(
+            {'_id': key, 'version': document.get('version', 0)},
+            {
+                '$set': {'digest': digest.to_dict(), 'pending': [], 'pending_count': 0},
+                '$inc': {'version': 1}
+            }
+        )
+        # A concurrent push changed the version; the next push retries
+        return result.modified_count == 1
+
+    @classmethod
+    def _digest(cls, document):
+        digest = TDigest.from_dict(document.get('digest') or {'compression': cls.COMPRESSION})
+        for hours in document.get('pending', []):
+            digest.add(hours)
+        return digest
+
+    @classmethod
+    def _summary(cls, digest):
+        summary = {'count': int(digest.count)}
+        for q in cls.QUANTILES:
+            value = digest.quantile(q)
+            summary[f"p{int(q * 100)}_hours"] = round(value, 2) if value is not None else None
+        return summary
+
+    @classmethod
+    def get_percentiles(cls, category=None, ward_id=None, group_by='category'):
+        """Overall and per-group p50/p90/p99 hours to resolution, merged from stored sketches"""
+        try:
+            query = {}
+            if category:
+                query['_id.category'] = category
+            if ward_id:
+                query['_id.ward_id'] = ward_id
+
+            overall = TDigest(compression=cls.COMPRESSION)
+            groups = {}
+            for document in cls.collection.find(query):
+                digest = cls._digest(document)
+                group = document['_id'].get(group_by)
+                groups.setdefault(group, TDigest(compression=cls.COMPRESSION)).merge(digest)
+                overall.merge(digest)
+
+            return {
+                'overall': cls._summary(overall),
+                'groups': [
+                    {group_by: group, **cls._summary(digest)}
+                    for group, digest in sorted(groups.items(), key=lambda item: str(item[0]))
+                ]
+            }
+        except Exception as e:
+            logger.error(f"Failed to get resolution percentiles: {e}")
+            raise
+
+    @classmethod
+    def rebuild(cls):
+        """Seed sketches from currently Resolved reports, using resolved_at (or updated_at on older reports)"""
+        digests = {}
+        cursor = Report.collection.find(
+            {'status': 'Resolved'},
+            {'category': 1, 'ward_id': 1, 'created_at': 1, 'updated_at': 1, 'resolved_at': 1}
+        ).batch_size(2000)
+        for report in cursor:
+            key = (report.get('category'), report.get('ward_id'))
+            resolved_at = report.get('resolved_at', report['updated_at'])
+            hours = (resolved_at - report['created_at']).total_seconds() / 3600
+            digests.setdefault(key, TDigest(compression=cls.COMPRESSION)).add(hours)
+
+        cls.collection.delete_many({})
+        for (category, ward_id), digest in digests.items():
+            cls.collection.insert_one({
+                '_id': cls._id(category, ward_id),
+                'digest': digest.to_dict(),
+                'pending': [],
+                'pending_count': 0,
+                'version': 0
+            })
+        return len(digests)
@@ -0,0 +1,157 @@
+"""
+Password hashing off the request threads.
+
+PBKDF2 with Django's default 600k iterations costs a few hundred
+milliseconds of CPU. Run inline, a burst of logins occupies every server
+thread and core and starves the rest of the API. Here hashing runs in a
+small pool of worker processes (spawned, so nothing of the parent's
+MongoDB client or threads is inherited) behind a bounded number of slots.
+When every slot is busy the caller gets HashingPoolSaturated at once, and
+the views turn that into a 503 with Retry-After instead of queueing more
+work behind a backlog.
+
+PASSWORD_HASH_POOL['workers'] = 0 hashes inline in the calling thread, still
+bounded by the same slots.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    get_hasher, get_hashers, get_hashers_by_algorithm, identify_hasher, make_password
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HashingPoolSaturated(Exception):
+    """Every hashing slot is taken (or the wait timed out); retry later"""
+
+
+def _init_worker(hashers):
+    # Spawned workers only need the hasher list, not the whole project (no app
+    # registry, no MongoDB connection). Settings may already be configured if
+    # the parent's __main__ did so at import time; the parent's list still wins.
+    if settings.configured:
+        settings.PASSWORD_HASHERS = hashers
+        get_hashers.cache_clear()
+        get_hashers_by_algorithm.cache_clear()
+    else:
+        settings.configure(PASSWORD_HASHERS=hashers)
+
+
+def _hash(password):
+    return make_password(password)
+
+
+def _verify(password, encoded):
+    """(matches, needs_rehash) - the same checks as django's check_password, minus the setter"""
+    if not encoded:
+        return False, False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, False
+    if not hasher.verify(password, encoded):
+        return False, False
+    preferred = get_hasher('default')
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class PasswordHashPool:
+    def __init__(self, workers=2, max_pending=16, timeout=10):
+        self.workers = workers
+        self.timeout = timeout
+        # Hashes running or waiting for a worker; beyond this callers are turned away
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Executors don't survive fork (e.g. gunicorn --preload); make one per process
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(list(settings.PASSWORD_HASHERS),)
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated()
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._slots.release()
+            logger.error(f"Password hash pool unavailable, hashing inline: {e}")
+            self._reset()
+            return fn(*args)
+        # The slot is held until the worker finishes, even if this caller gives up waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingPoolSaturated()
+        except BrokenProcessPool as e:
+            logger.error(f"Password hash worker died, hashing inline: {e}")
+            self._reset()
+            return fn(*args)
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password):
+        return self._run(_hash, password)
+
+    def verify(self, password, encoded):
+        return self._run(_verify, password, encoded)
+
+    def shutdown(self):
+        self._reset()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = getattr(settings, 'PASSWORD_HASH_POOL', {})
+                _pool = PasswordHashPool(
+                    workers=config.get('workers', 2),
+                    max_pending=config.get('max_pending', 16),
+                    timeout=config.get('timeout', 10)
+                )
+    return _pool
+
+
+def hash_password(password):
+    """Encoded hash for storage; raises HashingPoolSaturated when busy"""
+    return get_pool().hash(password)
+
+
+def verify_password(password, encoded):
+    """(matches, needs_rehash); raises HashingPoolSaturated when busy"""
+    return get_pool().verify(password, encoded)
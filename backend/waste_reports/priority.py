@@ -0,0 +1,67 @@
+"""
+Crew priority score.
+
+    score(t) = category weight
+             + urgency_weight * urgency_count
+             + density_weight * open reports within density_radius_m
+             + age_weight_per_hour * hours since created_at (at time t)
+
+The age term grows at the same rate for every report, so ranking by score(t)
+is the same as ranking by score(t) - age_weight_per_hour * t. That
+time-independent value is stored as `priority_key` on open reports and
+indexed, which lets the queue be read as an index scan; score(t) is
+recovered by adding the age term back for the current time.
+"""
+from datetime import datetime
+
+from django.conf import settings
+
+OPEN_STATUSES = ('Pending', 'In Progress')
+EARTH_RADIUS_M = 6378100
+EPOCH = datetime(1970, 1, 1)
+
+
+def _settings():
+    return settings.REPORT_PRIORITY
+
+
+def hours_since_epoch(when):
+    return (when - EPOCH).total_seconds() / 3600
+
+
+def category_weight(category):
+    config = _settings()
+    return config['category_weights'].get(category, config['default_category_weight'])
+
+
+def priority_key(report, nearby_open_count=0):
+    config = _settings()
+    return (
+        category_weight(report.get('category'))
+        + config['urgency_weight'] * report.get('urgency_count', 0)
+        + config['density_weight'] * nearby_open_count
+        - config['age_weight_per_hour'] * hours_since_epoch(report['created_at'])
+    )
+
+
+def score_at(key, now=None):
+    """Turn a stored priority_key back into the score at time `now`"""
+    now = now or datetime.utcnow()
+    return key + _settings()['age_weight_per_hour'] * hours_since_epoch(now)
+
+
+def urgency_increment():
+    return _settings()['urgency_weight']
+
+
+def density_increment():
+    return _settings()['density_weight']
+
+
+def neighbourhood(location):
+    """$geoWithin filter for reports within the density radius of a GeoJSON point"""
+    return {
+        '$geoWithin': {
+            '$centerSphere': [location['coordinates'], _settings()['density_radius_m'] / EARTH_RADIUS_M]
+        }
+    }
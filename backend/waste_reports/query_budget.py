@@ -0,0 +1,86 @@
+"""
+Per-request MongoDB command accounting.
+
+A pymongo CommandListener charges every command to the tracker of the
+context that issued it (a ContextVar, so background threads and other
+requests are not mixed in). QueryBudgetMiddleware opens a tracker per
+request, reports it in X-DB-Queries / X-DB-Time when DEBUG is on, and
+compares it with the budget a view declares through @query_budget(n).
+
+getMore/killCursors are cursor continuations of a query that was already
+counted, so they add to the time but not to the query count - the budget
+catches extra round trips (N+1 patterns), not large result sets.
+"""
+import contextvars
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+CURSOR_COMMANDS = {'getMore', 'killCursors'}
+
+_tracker = contextvars.ContextVar('mongo_query_tracker', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode (tests) when a view issues more queries than it declares"""
+
+
+class QueryTracker:
+    __slots__ = ('queries', 'seconds', 'commands')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.commands = Counter()
+
+    def record(self, command_name, seconds):
+        self.seconds += seconds
+        self.commands[command_name] += 1
+        if command_name not in CURSOR_COMMANDS:
+            self.queries += 1
+
+    def summary(self):
+        return ', '.join(f"{name} x{count}" for name, count in self.commands.most_common())
+
+
+@contextmanager
+def track_queries():
+    """Count the MongoDB commands issued inside the block (by this thread/context only)"""
+    tracker = QueryTracker()
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+
+class QueryCountListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.record(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.record(event.command_name, event.duration_micros / 1e6)
+
+
+def query_budget(limit):
+    """
+    Declare the most MongoDB queries a view may issue per request.
+
+    Place it outermost (above @api_view / @csrf_exempt) so the attribute
+    sits on the function Django dispatches to.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
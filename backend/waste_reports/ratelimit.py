@@ -0,0 +1,245 @@
+"""
+Rate limiting for the write endpoints.
+
+Each endpoint named in settings.RATE_LIMITS['endpoints'] gets a token
+bucket per user and/or per client IP: `count/period` refills `count` tokens
+spread over the period, and a bucket holds at most `count` of them (or
+`burst`, if given). A request spends one token from every bucket that
+applies to it, and only if every one of them has a token: a user over
+their own limit doesn't keep draining the per-IP bucket they share with
+others behind the same NAT. Rejected requests get a 429 with Retry-After before the view
+runs, so nothing is read from MongoDB, no file is saved and no model is run.
+The user is taken from the bearer token through the validated-token cache,
+so this check needs no database lookup either.
+
+Buckets live in this process by default (sharded dicts, one lock per
+shard). With several server processes, 'backend': 'cache' counts
+fixed windows in the Django cache (Redis when REDIS_URL is set) so the
+limits hold across processes, at the cost of a cache round trip per check.
+"""
+import functools
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from .authentication import user_id_from_request
+from .metrics import rate_limit_decisions
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60,
+           'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def parse_rate(rate):
+    """'10/minute' -> (10, 60.0)"""
+    count, _, period = rate.partition('/')
+    try:
+        seconds = PERIODS[period.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown rate period in {rate!r}")
+    return int(count), float(seconds)
+
+
+class LocalBucketStore:
+    """In-process token buckets, sharded so concurrent requests rarely share a lock"""
+
+    def __init__(self, shards=16, max_keys_per_shard=10000, clock=time.monotonic):
+        self.clock = clock
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+
+    def consume(self, key, count, period, burst=None):
+        """(allowed, seconds until a token is available)"""
+        return self.consume_all([(key, count, period, burst)])[0]
+
+    def consume_all(self, requests):
+        """
+        [(key, count, period, burst), ...] -> [(allowed, wait), ...] per bucket.
+        Tokens are taken only when every bucket has one.
+        """
+        now = self.clock()
+        shards = [self._shards[hash(key) % len(self._shards)] for key, _, _, _ in requests]
+        # Each shard locked once, in a fixed order, so concurrent callers can't deadlock
+        locks = sorted({id(lock): lock for lock, _ in shards}.items())
+        for _, lock in locks:
+            lock.acquire()
+        try:
+            states = []
+            for (key, count, period, burst), (_, buckets) in zip(requests, shards):
+                capacity = burst or count
+                refill = count / period
+                tokens, updated = buckets.get(key, (capacity, now))
+                states.append((min(capacity, tokens + (now - updated) * refill), refill, capacity))
+            granted = all(tokens >= 1 for tokens, _, _ in states)
+            results = []
+            for (key, _, _, _), (_, buckets), (tokens, refill, capacity) in zip(requests, shards, states):
+                buckets[key] = (tokens - 1 if granted else tokens, now)
+                results.append((True, 0.0) if tokens >= 1 else (False, (1 - tokens) / refill))
+                if len(buckets) > self.max_keys_per_shard:
+                    self._prune(buckets, now, capacity / refill)
+        finally:
+            for _, lock in reversed(locks):
+                lock.release()
+        return results
+
+    def _prune(self, buckets, now, refill_time):
+        # A bucket untouched for a full refill is back at capacity, the same as no entry
+        for key in [key for key, (_, updated) in buckets.items() if now - updated >= refill_time]:
+            del buckets[key]
+        if len(buckets) > self.max_keys_per_shard:
+            # Still too many active clients: forget the least recently seen tenth
+            # (they start again from a full bucket) so pruning stays amortized
+            keep = int(self.max_keys_per_shard * 0.9)
+            for key, _ in sorted(buckets.items(), key=lambda item: item[1][1])[:len(buckets) - keep]:
+                del buckets[key]
+
+    def clear(self):
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+
+class CacheWindowStore:
+    """
+    Fixed-window counters in the Django cache, shared by every process using it.
+
+    Allows `count` requests per period window; `burst` does not apply.
+    """
+
+    def __init__(self, alias='default', clock=time.time):
+        self.alias = alias
+        self.clock = clock
+
+    def consume(self, key, count, period, burst=None):
+        return self.consume_all([(key, count, period, burst)])[0]
+
+    def consume_all(self, requests):
+        """
+        [(key, count, period, burst), ...] -> [(allowed, wait), ...] per bucket.
+        Every counter is incremented; if any is over its limit they are all
+        given back, so a rejected request uses up none of them.
+        """
+        cache = caches[self.alias]
+        now = self.clock()
+        counted = []
+        results = []
+        for key, count, period, _ in requests:
+            window = int(now // period)
+            cache_key = f"ratelimit:{key}:{window}"
+            # add() only sets a missing key, so the first request of a window creates it
+            cache.add(cache_key, 0, timeout=int(period) + 1)
+            try:
+                used = cache.incr(cache_key)
+            except ValueError:
+                # Expired between add() and incr()
+                cache.add(cache_key, 1, timeout=int(period) + 1)
+                used = 1
+            counted.append(cache_key)
+            results.append((True, 0.0) if used <= count else (False, (window + 1) * period - now))
+        if not all(allowed for allowed, _ in results):
+            for cache_key in counted:
+                try:
+                    cache.decr(cache_key)
+                except ValueError:
+                    pass  # the window already expired
+        return results
+
+    def clear(self):
+        pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'RATE_LIMITS', {})
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = _config()
+                if config.get('backend') == 'cache':
+                    _store = CacheWindowStore(config.get('cache_alias', 'default'))
+                else:
+                    _store = LocalBucketStore(shards=config.get('shards', 16))
+    return _store
+
+
+def reset_store():
+    """Drop the store so the next request builds one from current settings (tests)"""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+def client_ip(request):
+    """
+    The client's address, as seen by the outermost of RATE_LIMITS['trusted_proxies'].
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so with N trusted proxies the client is the Nth entry
+    from the right. Entries further left are whatever the client sent and
+    are ignored.
+    """
+    proxies = _config().get('trusted_proxies', 0)
+    if proxies > 0:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check(name, request):
+    """None if the request may proceed, else the seconds to wait"""
+    config = _config()
+    rules = config.get('endpoints', {}).get(name)
+    if not config.get('enabled', True) or not rules:
+        return None
+
+    identities = []
+    if rules.get('user'):
+        user_id = user_id_from_request(request)
+        if user_id:
+            identities.append(('user', user_id, rules['user']))
+    if rules.get('ip'):
+        identities.append(('ip', client_ip(request), rules['ip']))
+
+    buckets = [
+        (f"{name}:{scope}:{identity}", *parse_rate(rate), rules.get('burst'))
+        for scope, identity, rate in identities
+    ]
+    retry_after = None
+    for (scope, _, _), (allowed, wait) in zip(identities, get_store().consume_all(buckets)):
+        rate_limit_decisions.inc(endpoint=name, scope=scope, decision='allowed' if allowed else 'limited')
+        if not allowed:
+            retry_after = max(retry_after or 0, wait)
+    return retry_after
+
+
+def rate_limit(name):
+    """
+    Apply the RATE_LIMITS['endpoints'][name] buckets to a view's unsafe methods.
+
+    Place it outermost, so rejected requests skip DRF request parsing (and
+    multipart uploads) as well as the view.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                retry_after = check(name, request)
+                if retry_after is not None:
+                    response = JsonResponse({'error': 'Too many requests, please slow down'}, status=429)
+                    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
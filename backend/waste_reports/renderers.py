@@ -0,0 +1,56 @@
+from bson import ObjectId
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Fall back to DRF's stdlib-json renderer
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+_fallback_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    """Types orjson does not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if np is not None and isinstance(obj, np.generic):
+        return obj.item()
+    # Decimal, UUID, timedelta, lazy translation strings, ...
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson.
+
+    datetime, ObjectId and NumPy values are serialized directly, so views
+    can hand Mongo documents to Response without converting them first.
+    Pretty-printed output (browsable API, `; indent=` media types) still
+    goes through the stdlib encoder.
+    """
+    options = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=self.options)
+
+        # Keep DRF's guarantee that output is a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,123 @@
+"""
+Crew route batching.
+
+Stops are ordered with a greedy nearest-neighbour tour from the depot, cut
+into crew-sized batches along that tour, and each batch is then improved
+with 2-opt. Each greedy step is one vectorized pass over the remaining
+stops, so the tour costs O(n^2) arithmetic but only n numpy calls and O(n)
+memory. The full haversine distance matrix is only ever built per batch,
+where it is small.
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_row(lng, lat, lngs, lats):
+    """Great-circle metres from one point to arrays of points (all in radians)"""
+    a = (np.sin((lats - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_matrix(lngs, lats):
+    """Pairwise great-circle metres between points (radians), shape (n, n)"""
+    return haversine_row(lngs[:, None], lats[:, None], lngs[None, :], lats[None, :])
+
+
+def unit_vectors(lngs, lats):
+    """Points (radians) on the unit sphere, shape (n, 3)"""
+    cos_lats = np.cos(lats)
+    return np.column_stack((cos_lats * np.cos(lngs), cos_lats * np.sin(lngs), np.sin(lats)))
+
+
+def nearest_neighbour_order(depot, lngs, lats):
+    """
+    Indices of the stops in greedy nearest-neighbour order starting from the depot.
+
+    Great-circle distance falls as the dot product of unit vectors rises, so
+    each step is one (n, 3) @ (3,) product instead of a haversine row, and
+    the candidate arrays are compacted as stops are used up.
+    """
+    points = unit_vectors(lngs, lats)
+    remaining = np.arange(len(points))
+    order = np.empty(len(points), dtype=np.intp)
+    current = unit_vectors(np.array([depot[0]]), np.array([depot[1]]))[0]
+    for step in range(len(order)):
+        nearest = int(np.argmax(points @ current))
+        order[step] = remaining[nearest]
+        current = points[nearest].copy()
+        # O(1) removal: move the last candidate into the used slot
+        points[nearest] = points[-1]
+        remaining[nearest] = remaining[-1]
+        points = points[:-1]
+        remaining = remaining[:-1]
+    return order
+
+
+def two_opt(distances, max_moves=1000):
+    """
+    Improve an open path 0 -> 1 -> ... -> n-1 that starts at node 0 (the depot).
+
+    The path is closed through a virtual end node that is zero metres from
+    everything, so the last stop is free to change. Every candidate move is
+    scored in one vectorized step and the best one is applied until nothing
+    improves (or `max_moves` is reached). Returns the new order of nodes 1..n-1.
+    """
+    size = len(distances)
+    if size < 4:
+        return list(range(1, size))
+
+    matrix = np.zeros((size + 1, size + 1))
+    matrix[:size, :size] = distances
+    tour = np.arange(size + 1)
+    i_index, j_index = np.triu_indices(size, k=1)
+    keep = i_index >= 1
+    i_index, j_index = i_index[keep], j_index[keep]
+
+    for _ in range(max_moves):
+        a, b = tour[i_index - 1], tour[i_index]
+        c, d = tour[j_index], tour[j_index + 1]
+        gains = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+        best = int(np.argmin(gains))
+        if gains[best] >= -1e-6:
+            break
+        i, j = i_index[best], j_index[best]
+        tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+
+    return [int(node) for node in tour[1:size]]
+
+
+def plan_routes(depot, stops, batch_size=25):
+    """
+    Split stops into crew batches, each an ordered route starting at the depot.
+
+    `depot` is (lng, lat); `stops` is a list of dicts with 'longitude' and
+    'latitude'. Returns a list of batches, each
+    {'stops': [stop, ...], 'legs_m': [...], 'distance_m': float}.
+    """
+    if not stops:
+        return []
+
+    lngs = np.radians(np.array([stop['longitude'] for stop in stops], dtype=float))
+    lats = np.radians(np.array([stop['latitude'] for stop in stops], dtype=float))
+    depot_lng, depot_lat = np.radians(depot[0]), np.radians(depot[1])
+
+    order = nearest_neighbour_order((depot_lng, depot_lat), lngs, lats)
+
+    batches = []
+    for start in range(0, len(order), batch_size):
+        members = order[start:start + batch_size]
+        batch_lngs = np.concatenate(([depot_lng], lngs[members]))
+        batch_lats = np.concatenate(([depot_lat], lats[members]))
+        distances = haversine_matrix(batch_lngs, batch_lats)
+
+        route = two_opt(distances)
+        path = [0] + route
+        legs = [float(distances[path[k], path[k + 1]]) for k in range(len(route))]
+        batches.append({
+            'stops': [stops[members[node - 1]] for node in route],
+            'legs_m': legs,
+            'distance_m': sum(legs)
+        })
+    return batches
@@ -0,0 +1,146 @@
+"""
+Synthetic report generator for load and query-plan testing.
+
+Reports fall around a few dozen hotspots (a dumping spot, a market, a
+broken drain) rather than uniformly, with some background scatter, which is
+what makes $near, the grid index and the priority density term behave as
+they do in production. Descriptions and the category mix come from the
+labelled examples in utils/issues.csv, so the text index and category
+panels see realistic data.
+"""
+import csv
+import math
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from pymongo import UpdateOne
+
+from . import priority
+from .models import Report, User
+
+METRES_PER_DEGREE = 111320
+DEFAULT_STATUS_MIX = {'Pending': 0.45, 'In Progress': 0.2, 'Resolved': 0.35}
+ISSUES_PATH = Path(__file__).resolve().parent.parent / 'utils' / 'issues.csv'
+SEED_EMAIL = 'loadtest-{n}@example.com'
+
+
+def load_issue_examples(path=ISSUES_PATH):
+    """(description, category) rows from the labelled issues file"""
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        return [(row['description'], row['category']) for row in csv.DictReader(handle)
+                if row.get('description') and row.get('category')]
+
+
+def ensure_seed_users(count, password, email_template=SEED_EMAIL):
+    """
+    Upsert `count` regular users that the load test can log in as; returns their ids.
+
+    The password is hashed once and shared, so seeding stays fast.
+    """
+    hashed = make_password(password)
+    now = datetime.utcnow()
+    emails = [email_template.format(n=n) for n in range(count)]
+    User.collection.bulk_write([
+        UpdateOne({'email': email}, {'$setOnInsert': {
+            'email': email,
+            'password': hashed,
+            'name': f"Load Test {n}",
+            'is_admin': False,
+            'created_at': now,
+            'is_active': True
+        }}, upsert=True)
+        for n, email in enumerate(emails)
+    ], ordered=False)
+    return [str(user['_id']) for user in User.collection.find({'email': {'$in': emails}}, {'_id': 1})]
+
+
+def parse_status_mix(value):
+    """'Pending=0.5,Resolved=0.5' -> {'Pending': 0.5, 'Resolved': 0.5}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_STATUS_MIX:
+            raise ValueError(f"Unknown status: {name.strip()}")
+        mix[name.strip()] = float(weight)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Status weights must add up to more than zero")
+    return mix
+
+
+class ReportGenerator:
+    """
+    Yields report documents in batches, ready for Report.bulk_create_reports.
+
+    `centre` is (lng, lat). Hotspots are spread uniformly over a disc of
+    `radius_m`; each report lands within about `spread_m` of its hotspot,
+    except a `scatter` fraction placed anywhere on the disc. Output is
+    deterministic for a given seed.
+    """
+
+    def __init__(self, user_ids, centre, radius_m=15000, hotspots=40, spread_m=300, scatter=0.1,
+                 days=365, status_mix=None, examples=None, seed=None, now=None):
+        if not user_ids:
+            raise ValueError("At least one user id is required")
+        self.rng = random.Random(seed)
+        self.user_ids = list(user_ids)
+        self.centre = centre
+        self.radius_m = radius_m
+        self.spread_m = spread_m
+        self.scatter = scatter
+        self.days = days
+        self.now = now or datetime.utcnow()
+        mix = status_mix or DEFAULT_STATUS_MIX
+        self.statuses = list(mix)
+        self.status_weights = list(mix.values())
+        self.examples = examples if examples is not None else load_issue_examples()
+        self.hotspots = [self._point_in_disc() for _ in range(hotspots)]
+        # A few hotspots draw most of the reports, as real ones do
+        self.hotspot_weights = [1 / (rank + 1) for rank in range(hotspots)]
+
+    def _offset(self, lng, lat, east_m, north_m):
+        lat_out = lat + north_m / METRES_PER_DEGREE
+        lng_out = lng + east_m / (METRES_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        return lng_out, lat_out
+
+    def _point_in_disc(self):
+        distance = self.radius_m * math.sqrt(self.rng.random())
+        bearing = self.rng.uniform(0, 2 * math.pi)
+        return self._offset(self.centre[0], self.centre[1],
+                            distance * math.cos(bearing), distance * math.sin(bearing))
+
+    def location(self):
+        if not self.hotspots or self.rng.random() < self.scatter:
+            return self._point_in_disc()
+        lng, lat = self.rng.choices(self.hotspots, self.hotspot_weights)[0]
+        return self._offset(lng, lat, self.rng.gauss(0, self.spread_m), self.rng.gauss(0, self.spread_m))
+
+    def report(self):
+        description, category = self.rng.choice(self.examples)
+        lng, lat = self.location()
+        status = self.rng.choices(self.statuses, self.status_weights)[0]
+        created_at = self.now - timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+        document = Report.build_report_document(
+            self.rng.choice(self.user_ids), description, lat, lng,
+            category=category, status=status, created_at=created_at
+        )
+        document['urgency_count'] = int(self.rng.expovariate(0.5)) if status != 'Resolved' else 0
+        if 'priority_key' in document:
+            document['priority_key'] = priority.priority_key(document)
+        if status != 'Pending':
+            # Triage or resolution happened some hours to weeks after the report
+            handled = created_at + timedelta(hours=self.rng.expovariate(1 / 72))
+            document['updated_at'] = min(handled, self.now)
+            if status == 'Resolved':
+                document['resolved_at'] = document['updated_at']
+        else:
+            document['updated_at'] = created_at
+        return document
+
+    def batches(self, count, batch_size=5000):
+        remaining = count
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            yield [self.report() for _ in range(size)]
+            remaining -= size
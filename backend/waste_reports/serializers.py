@@ -1,3 +1,6 @@
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
 from rest_framework import serializers
 from bson import ObjectId
 
@@ -19,6 +22,7 @@ class ReportSerializer(serializers.Serializer):
     latitude = serializers.FloatField(write_only=True, required=False)
     longitude = serializers.FloatField(write_only=True, required=False)
     location = serializers.DictField(read_only=True)
+    ward_id = serializers.CharField(read_only=True, allow_null=True)
     image_url = serializers.URLField(required=False, allow_blank=True)
     created_at = serializers.DateTimeField(read_only=True)
     updated_at = serializers.DateTimeField(read_only=True)
@@ -30,6 +34,28 @@ class ReportCreateSerializer(serializers.Serializer):
     longitude = serializers.FloatField(min_value=-180, max_value=180)
     image = serializers.ImageField(required=False)
 
+class ReportImportSerializer(ReportCreateSerializer):
+    """Row validation for bulk imports - same rules as ReportCreateSerializer, no image upload"""
+    image = None
+    status = serializers.ChoiceField(
+        choices=['Pending', 'In Progress', 'Resolved'],
+        default='Pending'
+    )
+    category = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    created_at = serializers.DateTimeField(required=False, allow_null=True)
+
+    def to_internal_value(self, data):
+        # An empty CSV cell means "not given", not an invalid date
+        if data.get('created_at') == '':
+            data = {key: value for key, value in data.items() if key != 'created_at'}
+        return super().to_internal_value(data)
+
+    def validate_created_at(self, value):
+        # Reports store naive UTC everywhere; DRF returns aware datetimes under USE_TZ
+        if value is not None and timezone.is_aware(value):
+            value = timezone.make_naive(value, dt_timezone.utc)
+        return value
+
 class ReportUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=['Pending', 'In Progress', 'Resolved'])
     admin_remarks = serializers.CharField(required=False, allow_blank=True, max_length=500)
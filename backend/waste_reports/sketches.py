@@ -0,0 +1,108 @@
+import math
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl) for streaming quantiles.
+
+    Memory is bounded by the compression parameter regardless of how many
+    values are added, digests merge by concatenating centroids, and the
+    state round-trips through plain lists so it can live in a Mongo document.
+    """
+
+    def __init__(self, compression=100, centroids=None, min_value=None, max_value=None):
+        self.compression = compression
+        self.centroids = [tuple(c) for c in centroids or []]
+        self.min = min_value
+        self.max = max_value
+        self._buffer = []
+
+    @property
+    def count(self):
+        return sum(weight for _, weight in self.centroids) + sum(weight for _, weight in self._buffer)
+
+    def add(self, value, weight=1):
+        self._buffer.append((value, weight))
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self.compress()
+
+    def merge(self, other):
+        other.compress()
+        self._buffer.extend(other.centroids)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def _k_inverse(self, k):
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def compress(self):
+        if not self._buffer:
+            return
+        points = sorted(self.centroids + self._buffer)
+        self._buffer = []
+
+        total = sum(weight for _, weight in points)
+        merged = []
+        q0 = 0.0
+        q_limit = self._k_inverse(self._k(q0) + 1)
+        mean, weight = points[0]
+        for next_mean, next_weight in points[1:]:
+            if q0 + (weight + next_weight) / total <= q_limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append((mean, weight))
+                q0 += weight / total
+                q_limit = self._k_inverse(self._k(q0) + 1)
+                mean, weight = next_mean, next_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q):
+        self.compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+
+        target = q * self.count
+        cumulative = 0.0
+        previous_mean, previous_mid = self.min, 0.0
+        for mean, weight in self.centroids:
+            mid = cumulative + weight / 2
+            if target < mid:
+                if mid == previous_mid:
+                    return mean
+                return previous_mean + (mean - previous_mean) * (target - previous_mid) / (mid - previous_mid)
+            previous_mean, previous_mid = mean, mid
+            cumulative += weight
+
+        # Beyond the last centroid's midpoint: interpolate towards the max
+        if cumulative == previous_mid:
+            return self.max
+        return previous_mean + (self.max - previous_mean) * (target - previous_mid) / (cumulative - previous_mid)
+
+    def to_dict(self):
+        self.compress()
+        return {
+            'compression': self.compression,
+            'centroids': [list(c) for c in self.centroids],
+            'min': self.min,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            compression=data.get('compression', 100),
+            centroids=data.get('centroids'),
+            min_value=data.get('min'),
+            max_value=data.get('max')
+        )
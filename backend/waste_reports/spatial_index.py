@@ -0,0 +1,275 @@
+"""
+In-process spatial index for the map's nearby/bbox queries.
+
+Live reports are bucketed into a lat/lng grid of SPATIAL_INDEX['cell_degrees']
+cells. A radius query scans only the cells overlapping the circle's bounding
+box and filters by great-circle distance, so a map pan costs a few dict
+lookups instead of a $near round trip. Queries spanning more than
+SPATIAL_INDEX['max_scan_cells'] cells (a continent-sized bbox or radius)
+go to MongoDB instead, so no request holds the index lock for long.
+
+The index warms in a background thread on first use (callers fall back to
+MongoDB until it is ready) and is kept current by listening to the report
+event bus, i.e. the same create/update/archive paths that feed the SSE
+stream. With change streams active that includes writes made by other
+processes; without them each process also rebuilds every max_age_seconds
+to pick up writes it did not see.
+"""
+import logging
+import math
+import threading
+import time
+
+from bson import ObjectId
+from django.conf import settings
+
+from .events import report_events
+
+logger = logging.getLogger(__name__)
+
+# Same radius MongoDB uses for 2dsphere distances, so results agree at the edges
+EARTH_RADIUS_M = 6378100
+METRES_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+FIELDS = ('description', 'status', 'location', 'image_url', 'created_at', 'urgency_count', 'category', 'ward_id')
+PROJECTION = {field: 1 for field in FIELDS}
+FLAT_DISTANCE_LIMIT_M = 50000
+FLAT_TOLERANCE = 0.01
+
+
+def _settings():
+    return getattr(settings, 'SPATIAL_INDEX', {})
+
+
+def distance_m(lng1, lat1, lng2, lat2):
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class GridIndex:
+    """Report documents bucketed by (lng, lat) cell. Not thread-safe on its own."""
+
+    def __init__(self, cell_degrees):
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        self.cell_of = {}
+
+    def _cell(self, lng, lat):
+        return int(math.floor(lng / self.cell_degrees)), int(math.floor(lat / self.cell_degrees))
+
+    def upsert(self, report):
+        report_id = report['_id']
+        lng, lat = report['location']['coordinates']
+        cell = self._cell(lng, lat)
+        previous = self.cell_of.get(report_id)
+        if previous is not None and previous != cell:
+            self._discard(previous, report_id)
+        self.cells.setdefault(cell, {})[report_id] = report
+        self.cell_of[report_id] = cell
+
+    def patch(self, report_id, fields):
+        cell = self.cell_of.get(report_id)
+        if cell is not None:
+            self.cells[cell][report_id] = {**self.cells[cell][report_id], **fields}
+
+    def remove(self, report_id):
+        cell = self.cell_of.pop(report_id, None)
+        if cell is not None:
+            self._discard(cell, report_id)
+
+    def _discard(self, cell, report_id):
+        # Drop emptied cells so len(self.cells) counts occupied cells only
+        reports = self.cells[cell]
+        reports.pop(report_id, None)
+        if not reports:
+            del self.cells[cell]
+
+    def range_cells(self, min_lng, min_lat, max_lng, max_lat):
+        """Number of grid cells a bbox overlaps, occupied or not"""
+        min_x, min_y = self._cell(min_lng, min_lat)
+        max_x, max_y = self._cell(max_lng, max_lat)
+        return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+    def _scan(self, min_lng, min_lat, max_lng, max_lat):
+        min_x, min_y = self._cell(min_lng, min_lat)
+        max_x, max_y = self._cell(max_lng, max_lat)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self.cells):
+            # Sparse range: walking the occupied cells is cheaper than probing every coordinate
+            for (x, y), cell in self.cells.items():
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    yield from cell.values()
+            return
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                cell = self.cells.get((x, y))
+                if cell:
+                    yield from cell.values()
+
+    def within_bbox(self, min_lng, min_lat, max_lng, max_lat):
+        results = []
+        for report in self._scan(min_lng, min_lat, max_lng, max_lat):
+            lng, lat = report['location']['coordinates']
+            if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat:
+                results.append(report)
+        return results
+
+    @staticmethod
+    def near_bounds(lng, lat, max_distance):
+        """Bbox around the circle, as (min_lng, min_lat, max_lng, max_lat)"""
+        lat_span = max_distance / METRES_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(lat) + lat_span, 89.9)))
+        lng_span = min(lat_span / cos_lat, 180)
+        return lng - lng_span, lat - lat_span, lng + lng_span, lat + lat_span
+
+    def near(self, lng, lat, max_distance):
+        """Reports within max_distance metres, nearest first (like $near)"""
+        lat_span = max_distance / METRES_PER_DEGREE
+
+        # Flat-earth distance is within a fraction of a percent at city scale, so
+        # only candidates near the circle's edge need the exact haversine check
+        flat = max_distance <= FLAT_DISTANCE_LIMIT_M
+        scale = math.cos(math.radians(lat))
+        inner = (lat_span * (1 - FLAT_TOLERANCE)) ** 2
+        outer = (lat_span * (1 + FLAT_TOLERANCE)) ** 2
+
+        hits = []
+        for report in self._scan(*self.near_bounds(lng, lat, max_distance)):
+            report_lng, report_lat = report['location']['coordinates']
+            if flat:
+                dx = (report_lng - lng) * scale
+                dy = report_lat - lat
+                squared = dx * dx + dy * dy
+                if squared > outer:
+                    continue
+                if squared < inner:
+                    hits.append((math.sqrt(squared) * METRES_PER_DEGREE, report))
+                    continue
+            distance = distance_m(lng, lat, report_lng, report_lat)
+            if distance <= max_distance:
+                hits.append((distance, report))
+        hits.sort(key=lambda hit: hit[0])
+        return [report for _, report in hits]
+
+    def __len__(self):
+        return len(self.cell_of)
+
+
+class SpatialIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grid = None
+        self._built_at = None
+        self._attempted_at = None
+        self._warming = False
+        # Events seen while a rebuild's snapshot is being read, replayed onto the new grid
+        self._backlog = []
+
+    @property
+    def enabled(self):
+        return _settings().get('enabled', True)
+
+    def _ready(self):
+        """Whether queries can be answered locally; starts a (re)build in the background if needed"""
+        if not self.enabled:
+            return False
+        config = _settings()
+        now = time.monotonic()
+        if self._grid is None:
+            # Don't hammer MongoDB with rebuilds while it is failing
+            if self._attempted_at is None or now - self._attempted_at > config.get('retry_seconds', 30):
+                self.warm_up(background=True)
+            return False
+        max_age = config.get('max_age_seconds')
+        if max_age and now - self._built_at > max_age:
+            self.warm_up(background=True)
+        return True
+
+    def warm_up(self, background=False):
+        with self._lock:
+            if self._warming:
+                return
+            self._warming = True
+            self._attempted_at = time.monotonic()
+            self._backlog = []
+        if background:
+            threading.Thread(target=self._rebuild, name='spatial-index-warmup', daemon=True).start()
+        else:
+            self._rebuild()
+
+    def _rebuild(self):
+        from .models import Report
+        started = time.monotonic()
+        try:
+            grid = GridIndex(_settings().get('cell_degrees', 0.01))
+            for report in Report.collection.find({}, PROJECTION).batch_size(5000):
+                grid.upsert(report)
+            with self._lock:
+                if any(event.type == 'bulk_created' for event in self._backlog):
+                    # The snapshot may have missed an import; let the next query start over
+                    self._attempted_at = None
+                    return
+                for event in self._backlog:
+                    self._apply(grid, event)
+                self._grid = grid
+                self._built_at = time.monotonic()
+            logger.info(f"Spatial index built: {len(grid)} reports in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Failed to build spatial index: {e}")
+        finally:
+            with self._lock:
+                self._warming = False
+                self._backlog = []
+
+    def invalidate(self):
+        with self._lock:
+            self._grid = None
+
+    def on_event(self, event):
+        with self._lock:
+            if event.type == 'bulk_created':
+                # No per-report data to apply: go cold, the next query triggers a rebuild
+                self._grid = None
+                self._attempted_at = None
+            if self._warming:
+                self._backlog.append(event)
+            if self._grid is not None:
+                self._apply(self._grid, event)
+
+    def _apply(self, grid, event):
+        data = event.data
+        if event.type in ('created', 'updated') and data.get('location'):
+            grid.upsert({'_id': ObjectId(data['id']), **{field: data.get(field) for field in FIELDS}})
+        elif event.type == 'updated':
+            grid.patch(ObjectId(data['id']), {k: v for k, v in data.items() if k in FIELDS})
+        elif event.type == 'archived':
+            grid.remove(ObjectId(data['id']))
+
+    def _too_wide(self, grid, bbox):
+        return grid.range_cells(*bbox) > _settings().get('max_scan_cells', 250000)
+
+    def near(self, lng, lat, max_distance):
+        """Reports within max_distance metres, nearest first - or None while cold or too wide (use MongoDB)"""
+        if not self._ready():
+            return None
+        with self._lock:
+            if self._grid is None or self._too_wide(self._grid, GridIndex.near_bounds(lng, lat, max_distance)):
+                return None
+            return self._grid.near(lng, lat, max_distance)
+
+    def within_bbox(self, min_lng, min_lat, max_lng, max_lat):
+        """Reports inside the bbox - or None while cold or too wide (use MongoDB)"""
+        if not self._ready():
+            return None
+        with self._lock:
+            if self._grid is None or self._too_wide(self._grid, (min_lng, min_lat, max_lng, max_lat)):
+                return None
+            return self._grid.within_bbox(min_lng, min_lat, max_lng, max_lat)
+
+    def __len__(self):
+        grid = self._grid
+        return len(grid) if grid is not None else 0
+
+
+nearby_index = SpatialIndex()
+report_events.add_listener(nearby_index.on_event)
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def _to_millis(value):
+    return int((value - EPOCH) / timedelta(milliseconds=1))
+
+
+def _from_millis(value):
+    return EPOCH + timedelta(milliseconds=value)
+
+
+def encode_token(report_after, deleted_after):
+    """Opaque cursor over both the report and the tombstone streams"""
+    payload = [
+        [_to_millis(report_after[0]), report_after[1]],
+        [_to_millis(deleted_after[0]), deleted_after[1]],
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_token(token):
+    try:
+        (report_ms, report_id), (deleted_ms, deleted_id) = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return (_from_millis(report_ms), report_id), (_from_millis(deleted_ms), deleted_id)
+    except (ValueError, TypeError):
+        raise InvalidSyncToken("Invalid sync token")
+
+
+def sync_window(now=None):
+    """Upper bound for a delta read. Writes younger than the settle window are left for
+    the next call, so a write that commits slightly after its timestamp is not skipped."""
+    now = now or datetime.utcnow()
+    # Mongo stores milliseconds; truncate so the bound round-trips through the token
+    until = now - timedelta(seconds=settings.DELTA_SYNC['settle_seconds'])
+    return until.replace(microsecond=until.microsecond // 1000 * 1000)
+
+
+def token_expired(deleted_after, now=None):
+    """Tombstones older than the retention period are gone; such clients must resync"""
+    now = now or datetime.utcnow()
+    return deleted_after[0] < now - timedelta(days=settings.DELTA_SYNC['tombstone_retention_days'])
+
+
+def advance(position, documents, field, truncated, until):
+    """Next (timestamp, id) position for one stream after reading `documents`"""
+    if documents:
+        last = documents[-1]
+        position = (last[field], str(last['_id']))
+    if not truncated and position[0] < until:
+        # Everything up to `until` has been seen
+        position = (until, '')
+    return position
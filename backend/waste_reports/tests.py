@@ -1,8 +1,53 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import User, Report
+from .models import IdempotencyKey, ImportJob, User, Report, ReportRollup, ReportStatusEvent
+from .importer import ReportImporter, iter_rows
+from .renderers import ORJSONRenderer
+from .events import Event, ReportEventBus, Subscription, TooManySubscribers
+from .sketches import TDigest
+from . import priority
+from .routing import haversine_matrix, plan_routes, two_opt
+from .wards import Ward, WardIndex
+from .exporter import EXPORT_FIELDS, build_export_query, pa, stream_csv, stream_jsonl, stream_parquet
+from .geo import bbox_geometry
+from .spatial_index import GridIndex, SpatialIndex, distance_m
+from .cache import (
+    VERSION_KEY, bump_version, get_cache, get_cached_list, get_or_refresh, list_cache_key, report_list_stats,
+    set_cached_list
+)
+from .metrics import Counter, Histogram, Registry
+from .middleware import QueryBudgetMiddleware
+from .query_budget import QueryBudgetExceeded, QueryCountListener, query_budget
+from .database import ensure_indexes
+from .seeding import ReportGenerator, parse_status_mix
+from .log_handlers import QueueLogHandler, stats as log_handler_stats
+from .passwords import HashingPoolSaturated, PasswordHashPool
+from .authentication import ValidatedTokenCache, get_authenticator, token_cache, user_id_from_raw_token
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken
+from unittest.mock import patch
+from .ratelimit import CacheWindowStore, LocalBucketStore, client_ip, rate_limit, reset_store
+from .idempotency import completed_responses, idempotent, request_fingerprint as idempotency_fingerprint
+from django.contrib.auth.hashers import make_password
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory
+from types import SimpleNamespace
+from unittest import skipUnless
+from pymongo import MongoClient
+import threading
+import time
+import random
+from bson import ObjectId
+from datetime import datetime, timedelta
+import csv
+import io
+import os
+import re
+import logging
+import tempfile
 import json
+import numpy as np
 
 class UserModelTest(TestCase):
     def test_create_user(self):
@@ -51,15 +96,23 @@ class AuthAPITest(APITestCase):
 class ReportAPITest(APITestCase):
     def setUp(self):
         """Set up test data"""
+        # Models write through the shared MongoDB client, not Django's test database:
+        # a fresh user per test, removed with everything it created
+        email = f"reporttest-{ObjectId()}@example.com"
         self.user = User.create_user(
-            email="reporttest@example.com",
+            email=email,
             password="reportpass123",
             name="Report Test"
         )
+        user_id = str(self.user['_id'])
+        self.addCleanup(User.collection.delete_one, {'_id': self.user['_id']})
+        self.addCleanup(Report.collection.delete_many, {'user_id': user_id})
+        self.addCleanup(Report.tombstones.delete_many, {'user_id': user_id})
+        self.addCleanup(IdempotencyKey.collection.delete_many, {'_id': {'$regex': f"^{user_id}:"}})
         
         # Login to get token
         login_data = {
-            'email': 'reporttest@example.com',
+            'email': email,
             'password': 'reportpass123'
         }
         response = self.client.post('/api/auth/login/', login_data)
@@ -78,6 +131,25 @@ class ReportAPITest(APITestCase):
         self.assertIn('id', response.data)
         self.assertEqual(response.data['status'], 'Pending')
 
+    def test_create_report_idempotency_key(self):
+        """Test a retried create with the same Idempotency-Key returns the first report"""
+        data = {
+            'description': 'Overflowing bin outside the bus stop',
+            'latitude': 12.9716,
+            'longitude': 77.5946
+        }
+        key = str(ObjectId())
+        first = self.client.post('/api/reports/create/', data, HTTP_IDEMPOTENCY_KEY=key)
+        retry = self.client.post('/api/reports/create/', data, HTTP_IDEMPOTENCY_KEY=key)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json()['id'], first.data['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Report.collection.count_documents({'description': data['description']}), 1)
+
+        changed = self.client.post('/api/reports/create/', {**data, 'latitude': 13.0}, HTTP_IDEMPOTENCY_KEY=key)
+        self.assertEqual(changed.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
     def test_get_reports(self):
         """Test getting reports"""
         # First create a report
@@ -92,3 +164,1229 @@ class ReportAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('reports', response.data)
         self.assertGreater(len(response.data['reports']), 0)
+
+    @override_settings(DELTA_SYNC={'settle_seconds': 0, 'page_size': 500, 'tombstone_retention_days': 30})
+    def test_report_changes_since_token(self):
+        """Test the delta feed only returns reports changed after the token"""
+        first = self.client.get('/api/reports/changes/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        report = Report.create_report(
+            user_id=str(self.user['_id']),
+            description="Test report for delta sync",
+            latitude=12.9716,
+            longitude=77.5946
+        )
+        response = self.client.get('/api/reports/changes/', {'since': first.data['next']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['id'] for c in response.data['changes']], [str(report['_id'])])
+
+        response = self.client.get('/api/reports/changes/', {'since': response.data['next']})
+        self.assertEqual(response.data['changes'], [])
+
+    @override_settings(DELTA_SYNC={'settle_seconds': 0, 'page_size': 500, 'tombstone_retention_days': 30})
+    def test_urgency_vote_shows_up_in_changes(self):
+        """Test marking a report urgent moves updated_at, so the delta feed returns it"""
+        report = Report.create_report(
+            user_id=str(self.user['_id']),
+            description="Test report for urgency sync",
+            latitude=12.9716,
+            longitude=77.5946
+        )
+        since = self.client.get('/api/reports/changes/').data['next']
+
+        response = self.client.post(f"/api/reports/{report['_id']}/urgency/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/reports/changes/', {'since': since})
+        changes = {c['id']: c for c in response.data['changes']}
+        self.assertEqual(changes[str(report['_id'])]['urgency_count'], 1)
+
+    def test_report_detail_conditional_get(self):
+        """Test report detail answers If-None-Match with 304"""
+        report = Report.create_report(
+            user_id=str(self.user['_id']),
+            description="Test report for conditional get",
+            latitude=12.9716,
+            longitude=77.5946
+        )
+        url = f"/api/reports/{report['_id']}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_report_stream_requires_token(self):
+        """Test the event stream rejects requests without a valid access token"""
+        self.client.credentials()
+        self.assertEqual(self.client.get('/api/reports/stream/').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/api/reports/stream/', {'token': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_listing_revalidates_without_queries(self):
+        """Test a cached listing answers 200 and 304 from its stored validators"""
+        first = self.client.get('/api/reports/', {'limit': 7})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        with patch.object(Report, 'get_change_marker') as marker:
+            cached = self.client.get('/api/reports/', {'limit': 7})
+            revalidated = self.client.get('/api/reports/', {'limit': 7}, HTTP_IF_NONE_MATCH=first['ETag'])
+        marker.assert_not_called()
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_create_invalidates_cached_listing(self):
+        """Test a new report shows up in a listing that was cached before it was created"""
+        self.client.get('/api/reports/', {'limit': 500})
+        data = {
+            'description': f'Cache invalidation check {ObjectId()}',
+            'latitude': 12.9716,
+            'longitude': 77.5946
+        }
+        created = self.client.post('/api/reports/create/', data)
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get('/api/reports/', {'limit': 500})
+        self.assertIn(created.data['id'], [r['id'] for r in response.data['reports']])
+
+class ReportResolutionTest(TestCase):
+    def setUp(self):
+        self.user_id = f"resolution-{ObjectId()}"
+        self.addCleanup(Report.collection.delete_many, {'user_id': self.user_id})
+        self.addCleanup(Report.deleted_collection.delete_many, {'user_id': self.user_id})
+        self.addCleanup(Report.tombstones.delete_many, {'user_id': self.user_id})
+        self.report = Report.create_report(
+            user_id=self.user_id,
+            description="Test report for resolution time",
+            latitude=12.9716,
+            longitude=77.5946
+        )
+        self.report_id = str(self.report['_id'])
+
+    def test_resolved_at_survives_later_writes(self):
+        """Test resolving stamps resolved_at, later votes leave it alone and reopening clears it"""
+        Report.update_status(self.report_id, 'Resolved')
+        resolved = Report.collection.find_one({'_id': self.report['_id']})
+        self.assertEqual(resolved['resolved_at'], resolved['updated_at'])
+
+        Report.increment_urgency(self.report_id)
+        Report.update_status(self.report_id, 'Resolved', admin_remarks='Checked again')
+        stored = Report.collection.find_one({'_id': self.report['_id']})
+        self.assertEqual(stored['resolved_at'], resolved['resolved_at'])
+        self.assertGreater(stored['updated_at'], stored['resolved_at'])
+
+        Report.update_status(self.report_id, 'Pending')
+        self.assertNotIn('resolved_at', Report.collection.find_one({'_id': self.report['_id']}))
+
+    def test_archival_uses_resolution_time(self):
+        """Test a report resolved long ago is archived even if updated_at moved recently"""
+        Report.update_status(self.report_id, 'Resolved')
+        Report.collection.update_one(
+            {'_id': self.report['_id']},
+            {'$set': {'resolved_at': datetime.utcnow() - timedelta(days=11), 'updated_at': datetime.utcnow()}}
+        )
+        Report.archive_old_resolved()
+        self.assertIsNone(Report.collection.find_one({'_id': self.report['_id']}))
+
+
+class ReportImportTest(TestCase):
+    def test_iter_rows_jsonl_flags_malformed_lines(self):
+        """Test JSONL parsing keeps row numbers and marks bad lines"""
+        stream = io.StringIO('{"description": "a"}\n\nnot json\n')
+        rows = list(iter_rows(stream, 'jsonl'))
+        self.assertEqual(rows, [(1, {'description': 'a'}), (2, None)])
+
+    def test_import_csv_rejects_invalid_rows(self):
+        """Test CSV import validates rows with the create serializer rules"""
+        stream = io.StringIO(
+            "description,latitude,longitude\n"
+            "Garbage dumped near the bus stop,12.9716,77.5946\n"
+            "short,12.9716,77.5946\n"
+            "Streetlight broken on main road,95,77.5946\n"
+        )
+        # A fresh job id per run: import_ref is unique, and the shared database keeps earlier runs' rows
+        job_id = f"test-import-{ObjectId()}.csv:1"
+        self.addCleanup(ImportJob.collection.delete_one, {'_id': job_id})
+        self.addCleanup(Report.collection.delete_many, {'import_ref': {'$regex': f"^{re.escape(job_id)}:"}})
+        importer = ReportImporter(user_id='importer', job_id=job_id, batch_size=2)
+        summary = importer.run(stream, 'csv')
+        self.assertEqual(summary['rows_done'], 3)
+        self.assertEqual(summary['inserted'], 1)
+        self.assertEqual(summary['rejected'], 2)
+        self.assertEqual([e['row'] for e in summary['errors']], [2, 3])
+
+    def test_import_csv_created_at(self):
+        """Test created_at is stored as naive UTC and a blank cell falls back to the import time"""
+        stream = io.StringIO(
+            "description,latitude,longitude,created_at\n"
+            "Garbage dumped near the bus stop,12.9716,77.5946,2026-02-10T15:00:00+05:30\n"
+            "Streetlight broken on main road,12.9716,77.5946,\n"
+        )
+        job_id = f"test-import-{ObjectId()}.csv:1"
+        self.addCleanup(ImportJob.collection.delete_one, {'_id': job_id})
+        self.addCleanup(Report.collection.delete_many, {'import_ref': {'$regex': f"^{re.escape(job_id)}:"}})
+        started = datetime.utcnow()
+        summary = ReportImporter(user_id='importer', job_id=job_id).run(stream, 'csv')
+        self.assertEqual((summary['inserted'], summary['rejected']), (2, 0))
+
+        first = Report.collection.find_one({'import_ref': f"{job_id}:1"})
+        second = Report.collection.find_one({'import_ref': f"{job_id}:2"})
+        self.assertEqual(first['created_at'], datetime(2026, 2, 10, 9, 30))
+        self.assertIn('priority_key', first)
+        self.assertGreaterEqual(second['created_at'], started.replace(microsecond=0))
+
+class ORJSONRendererTest(TestCase):
+    def test_renders_mongo_types(self):
+        """Test ObjectId and datetime values render without manual conversion"""
+        oid = ObjectId()
+        rendered = ORJSONRenderer().render({'id': oid, 'created_at': datetime(2024, 1, 2, 3, 4, 5)})
+        self.assertEqual(
+            json.loads(rendered),
+            {'id': str(oid), 'created_at': '2024-01-02T03:04:05'}
+        )
+
+class ReportEventBusTest(TestCase):
+    def test_resume_replays_missed_events(self):
+        """Test Last-Event-ID resume replays only newer events"""
+        bus = ReportEventBus(history=10)
+        bus.publish('created', {'id': 'a'})
+        bus.publish('updated', {'id': 'a'})
+        first_id = list(bus._history)[0].id
+
+        subscription = bus.subscribe(last_event_id=first_id)
+        self.assertEqual(subscription.get(timeout=0).type, 'updated')
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_slow_consumer_gets_reset(self):
+        """Test a full client buffer is dropped and replaced by a reset event"""
+        subscription = Subscription(maxlen=2)
+        for i in range(5):
+            subscription.push(Event(str(i), 'created', {}))
+        self.assertEqual(subscription.get(timeout=0).type, 'reset')
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_subscribers_are_capped(self):
+        """Test subscribing past max_subscribers fails until a slot is freed"""
+        bus = ReportEventBus(history=10, max_subscribers=2)
+        first = bus.subscribe()
+        bus.subscribe()
+        with self.assertRaises(TooManySubscribers):
+            bus.subscribe()
+        bus.unsubscribe(first)
+        bus.subscribe()
+
+class TDigestTest(TestCase):
+    def test_quantiles_close_to_exact(self):
+        """Test merged digests estimate quantiles within 2% of the exact values"""
+        rng = random.Random(7)
+        values = [rng.expovariate(1 / 24) for _ in range(20000)]
+        left, right = TDigest(), TDigest()
+        for i, value in enumerate(values):
+            (left if i % 2 else right).add(value)
+        digest = TDigest.from_dict(left.merge(right).to_dict())
+
+        ordered = sorted(values)
+        for q in (0.5, 0.9, 0.99):
+            exact = ordered[int(q * len(ordered))]
+            self.assertAlmostEqual(digest.quantile(q), exact, delta=exact * 0.02)
+        self.assertLess(len(digest.centroids), 200)
+
+class PriorityScoreTest(TestCase):
+    def test_stored_key_recovers_score(self):
+        """Test the stored priority key plus the age term gives the full score"""
+        now = datetime(2024, 5, 1, 12)
+        report = {'category': 'Sanitation', 'urgency_count': 2, 'created_at': now - timedelta(hours=10)}
+        key = priority.priority_key(report, nearby_open_count=3)
+        expected = 15 + 5.0 * 2 + 2.0 * 3 + 0.1 * 10
+        self.assertAlmostEqual(priority.score_at(key, now), expected, places=6)
+
+    def test_older_report_outranks_newer_equal_report(self):
+        """Test age raises priority for otherwise identical reports"""
+        now = datetime(2024, 5, 1, 12)
+        old = priority.priority_key({'category': 'Roads', 'created_at': now - timedelta(days=3)})
+        new = priority.priority_key({'category': 'Roads', 'created_at': now})
+        self.assertGreater(old, new)
+
+class CrewRoutingTest(TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.depot = (77.59, 12.97)
+        self.stops = [
+            {'id': str(i), 'longitude': 77.59 + rng.uniform(-0.05, 0.05), 'latitude': 12.97 + rng.uniform(-0.05, 0.05)}
+            for i in range(230)
+        ]
+
+    def test_batches_cover_every_stop_once(self):
+        """Test routes are crew-sized and visit each stop exactly once"""
+        batches = plan_routes(self.depot, self.stops, batch_size=25)
+        self.assertEqual([len(batch['stops']) for batch in batches], [25] * 9 + [5])
+        visited = [stop['id'] for batch in batches for stop in batch['stops']]
+        self.assertCountEqual(visited, [stop['id'] for stop in self.stops])
+
+    def test_two_opt_never_lengthens_path(self):
+        """Test 2-opt returns a path no longer than the one it was given"""
+        stops = self.stops[:40]
+        distances = haversine_matrix(
+            np.radians([self.depot[0]] + [stop['longitude'] for stop in stops]),
+            np.radians([self.depot[1]] + [stop['latitude'] for stop in stops])
+        )
+        path = [0] + two_opt(distances)
+        self.assertCountEqual(path, range(41))
+        improved = sum(distances[path[k], path[k + 1]] for k in range(40))
+        self.assertLessEqual(improved, sum(distances[k, k + 1] for k in range(40)))
+
+class WardIndexTest(TestCase):
+    def square(self, x, y, size=0.01):
+        return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+    def setUp(self):
+        wards = [
+            Ward(f"{i}-{j}", None, {'type': 'Polygon', 'coordinates': [self.square(77 + i * 0.01, 12 + j * 0.01)]})
+            for i in range(1, 20) for j in range(20)
+        ]
+        # Column 0 is one ward with a hole, plus an island elsewhere
+        wards.append(Ward('holed', None, {
+            'type': 'MultiPolygon',
+            'coordinates': [
+                [[[77, 12], [77.01, 12], [77.01, 12.2], [77, 12.2], [77, 12]],
+                 self.square(77.004, 12.004, 0.002)],
+                [self.square(78, 13)]
+            ]
+        }))
+        self.index = WardIndex(wards)
+
+    def test_locates_containing_ward(self):
+        """Test points resolve to the polygon that contains them"""
+        self.assertEqual(self.index.locate(77.0155, 12.0123), '1-1')
+        self.assertEqual(self.index.locate(77.195, 12.195), '19-19')
+        self.assertEqual(self.index.locate(77.001, 12.15), 'holed')
+        self.assertEqual(self.index.locate(78.005, 13.005), 'holed')
+
+    def test_holes_and_outside_points_have_no_ward(self):
+        """Test points in a hole or outside every ward get None"""
+        self.assertIsNone(self.index.locate(77.005, 12.005))
+        self.assertIsNone(self.index.locate(76.5, 12.5))
+
+class GridIndexTest(TestCase):
+    def setUp(self):
+        rng = random.Random(5)
+        self.reports = [
+            {'_id': ObjectId(), 'location': {'type': 'Point', 'coordinates': [77.59 + rng.gauss(0, 0.03), 12.97 + rng.gauss(0, 0.03)]}}
+            for _ in range(3000)
+        ]
+        self.grid = GridIndex(0.01)
+        for report in self.reports:
+            self.grid.upsert(report)
+
+    def test_near_matches_exhaustive_search(self):
+        """Test radius queries return exactly the reports within the distance, nearest first"""
+        for radius in (200, 1000, 8000):
+            found = self.grid.near(77.6, 12.98, radius)
+            expected = {
+                report['_id'] for report in self.reports
+                if distance_m(77.6, 12.98, *report['location']['coordinates']) <= radius
+            }
+            self.assertEqual({report['_id'] for report in found}, expected)
+            distances = [distance_m(77.6, 12.98, *report['location']['coordinates']) for report in found]
+            # Ordering uses a flat-earth approximation, so ties may swap within 1%
+            for nearer, farther in zip(distances, distances[1:]):
+                self.assertLessEqual(nearer, farther * 1.01)
+
+    def test_moves_and_removals(self):
+        """Test a moved report is found at its new cell only and removed reports disappear"""
+        report = self.reports[0]
+        moved = {**report, 'location': {'type': 'Point', 'coordinates': [80.0, 15.0]}}
+        self.grid.upsert(moved)
+        self.assertEqual([r['_id'] for r in self.grid.within_bbox(79.9, 14.9, 80.1, 15.1)], [report['_id']])
+        self.grid.remove(report['_id'])
+        self.assertEqual(self.grid.within_bbox(79.9, 14.9, 80.1, 15.1), [])
+        self.assertEqual(len(self.grid), len(self.reports) - 1)
+
+    def test_wide_queries_walk_occupied_cells(self):
+        """Test world-sized ranges visit occupied cells instead of every cell coordinate"""
+        self.assertEqual(len(self.grid.within_bbox(-180, -90, 180, 90)), len(self.reports))
+        self.assertEqual(len(self.grid.near(77.6, 12.98, 20000000)), len(self.reports))
+
+    @override_settings(SPATIAL_INDEX={'enabled': True, 'max_scan_cells': 10000})
+    def test_index_defers_too_wide_queries_to_mongodb(self):
+        """Test queries over more than max_scan_cells cells are left to MongoDB"""
+        index = SpatialIndex()
+        index._grid, index._built_at = self.grid, time.monotonic()
+        self.assertIsNotNone(index.within_bbox(77.5, 12.9, 77.7, 13.0))
+        self.assertIsNotNone(index.near(77.6, 12.98, 5000))
+        self.assertIsNone(index.within_bbox(60, 0, 90, 30))
+        self.assertIsNone(index.near(77.6, 12.98, 500000))
+
+class StaleWhileRevalidateTest(TestCase):
+    def setUp(self):
+        get_cache().delete('test:swr')
+        self.calls = []
+        self.refreshed = threading.Event()
+
+    def compute(self):
+        self.calls.append(len(self.calls) + 1)
+        if len(self.calls) > 1:
+            self.refreshed.set()
+        return len(self.calls)
+
+    def test_fresh_value_is_reused(self):
+        """Test a fresh cached value is returned without recomputing"""
+        self.assertEqual(get_or_refresh('test:swr', self.compute, ttl=60, stale_ttl=60), 1)
+        self.assertEqual(get_or_refresh('test:swr', self.compute, ttl=60, stale_ttl=60), 1)
+        self.assertEqual(self.calls, [1])
+
+    def test_stale_value_served_while_refreshing(self):
+        """Test a stale value is returned immediately and refreshed in the background"""
+        get_or_refresh('test:swr', self.compute, ttl=0, stale_ttl=60)
+        self.assertEqual(get_or_refresh('test:swr', self.compute, ttl=0, stale_ttl=60), 1)
+        self.assertTrue(self.refreshed.wait(timeout=5))
+
+
+class ReportListCacheTest(TestCase):
+    def setUp(self):
+        get_cache().delete(VERSION_KEY)
+
+    def test_write_changes_listing_key(self):
+        """Test bump_version moves every listing onto a new key"""
+        key = list_cache_key({'limit': 10}, scope='all')
+        self.assertEqual(list_cache_key({'limit': 10}, scope='all'), key)
+        self.assertNotEqual(list_cache_key({'limit': 10}, scope='user:1'), key)
+        bump_version()
+        self.assertNotEqual(list_cache_key({'limit': 10}, scope='all'), key)
+
+    def test_evicted_version_does_not_revive_old_entries(self):
+        """Test a version key lost from the cache restarts past every earlier version"""
+        set_cached_list(list_cache_key({'limit': 10}, scope='all'), {'data': 'old'})
+        bump_version()
+        get_cache().delete(VERSION_KEY)
+        self.assertIsNone(get_cached_list(list_cache_key({'limit': 10}, scope='all')))
+
+        get_cache().delete(VERSION_KEY)
+        bump_version()
+        self.assertIsNone(get_cached_list(list_cache_key({'limit': 10}, scope='all')))
+
+    def test_hit_and_miss_counters(self):
+        """Test listing reads count hits and misses, including a disabled cache"""
+        before = report_list_stats.snapshot()
+        key = list_cache_key({'limit': 10}, scope='all')
+        get_cached_list(key)
+        set_cached_list(key, {'data': []})
+        get_cached_list(key)
+        get_cached_list(None)
+        after = report_list_stats.snapshot()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 2)
+
+
+class MetricsRegistryTest(TestCase):
+    def test_counts_from_all_threads_are_summed(self):
+        """Test per-thread shards, including those of finished threads, add up in the exposition"""
+        registry = Registry()
+        requests = Counter(registry, 'requests_total', 'Requests', ('view',))
+        latency = Histogram(registry, 'latency_seconds', 'Latency', ('view',), buckets=(0.1, 1.0))
+
+        def work():
+            for _ in range(100):
+                requests.inc(view='get_reports')
+                latency.observe(0.5, view='get_reports')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        work()
+
+        output = registry.render()
+        self.assertIn('requests_total{view="get_reports"} 500', output)
+        self.assertIn('latency_seconds_bucket{view="get_reports",le="0.1"} 0', output)
+        self.assertIn('latency_seconds_bucket{view="get_reports",le="1.0"} 500', output)
+        self.assertIn('latency_seconds_count{view="get_reports"} 500', output)
+
+    def test_finished_threads_are_pruned_on_registration(self):
+        """Test shards of exited threads are folded in when a new thread registers, without a scrape"""
+        registry = Registry()
+        requests = Counter(registry, 'requests_total', 'Requests', ('view',))
+        for _ in range(20):
+            thread = threading.Thread(target=requests.inc, kwargs={'view': 'get_reports'})
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(registry._shards), 1)
+        self.assertIn('requests_total{view="get_reports"} 20', registry.render())
+
+    def test_multiprocess_dir_sums_workers(self):
+        """Test a scrape in shared-directory mode sums the totals every worker wrote"""
+        with tempfile.TemporaryDirectory() as shared:
+            workers = [Registry(multiprocess_dir=shared, flush_seconds=3600) for _ in range(2)]
+            counters = [Counter(registry, 'requests_total', 'Requests', ('view',)) for registry in workers]
+            counters[0].inc(3, view='get_reports')
+            counters[1].inc(4, view='get_reports')
+            workers[1].flush()
+
+            output = workers[0].render()
+        self.assertIn('requests_total{view="get_reports"} 7', output)
+
+class QueryBudgetMiddlewareTest(TestCase):
+    def run_view(self, budget, queries):
+        listener = QueryCountListener()
+
+        @query_budget(budget)
+        def view(request):
+            for _ in range(queries):
+                listener.succeeded(SimpleNamespace(command_name='find', duration_micros=1500))
+            listener.succeeded(SimpleNamespace(command_name='getMore', duration_micros=500))
+            return HttpResponse('ok')
+
+        def get_response(request):
+            # What Django's handler does between the middleware and the view
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        return middleware(RequestFactory().get('/api/reports/'))
+
+    @override_settings(DEBUG=True, QUERY_BUDGET={'enabled': True, 'strict': True})
+    def test_headers_report_queries_and_time(self):
+        """Test X-DB-Queries excludes cursor getMores while X-DB-Time includes them"""
+        response = self.run_view(budget=3, queries=2)
+        self.assertEqual(response['X-DB-Queries'], '2')
+        self.assertEqual(response['X-DB-Time'], '3.5ms')
+
+    @override_settings(DEBUG=True, QUERY_BUDGET={'enabled': True, 'strict': True})
+    def test_strict_mode_fails_over_budget(self):
+        """Test exceeding a declared budget raises in strict mode"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.run_view(budget=1, queries=2)
+
+
+@skipUnless(os.environ.get('MONGODB_TEST_URI'), 'set MONGODB_TEST_URI to run query-plan checks against a local mongod')
+class QueryPlanTest(TestCase):
+    """explain() the hot read paths against a seeded database and fail on plan regressions"""
+    REPORTS = 5000
+    USERS = 50
+    WARDS = 20
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.client = MongoClient(os.environ['MONGODB_TEST_URI'])
+        cls.client.drop_database('waste_tracker_plan_tests')
+        cls.db = cls.client['waste_tracker_plan_tests']
+        ensure_indexes(cls.db)
+
+        rng = random.Random(43)
+        statuses = ['Pending', 'In Progress', 'Resolved', 'Rejected']
+        words = ['garbage', 'overflowing', 'bin', 'plastic', 'street', 'drain', 'smell', 'pile']
+        start = datetime(2024, 1, 1)
+        documents = []
+        for number in range(cls.REPORTS):
+            report = Report.build_report_document(
+                f'user{number % cls.USERS}',
+                ' '.join(rng.choice(words) for _ in range(6)) + (' asbestos' if number % 500 == 0 else ''),
+                19.0 + rng.random() * 0.2, 72.8 + rng.random() * 0.2,
+                category=rng.choice(['Plastic', 'Organic', 'Hazardous']),
+                status=rng.choice(statuses),
+                created_at=start + timedelta(minutes=number)
+            )
+            report['ward_id'] = f'W{number % cls.WARDS}'
+            documents.append(report)
+        cls.db.reports.insert_many(documents)
+        cls.reports = cls.db.reports
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.drop_database('waste_tracker_plan_tests')
+        cls.client.close()
+        super().tearDownClass()
+
+    def stages(self, plan):
+        """Every stage name in a winning plan, whichever query engine produced it"""
+        names = [plan['stage']] if 'stage' in plan else []
+        for key in ('inputStage', 'queryPlan'):
+            if key in plan:
+                names += self.stages(plan[key])
+        for child in plan.get('inputStages', []):
+            names += self.stages(child)
+        return names
+
+    def assertEfficientPlan(self, cursor, max_examined_per_result=2, slack=20):
+        explain = cursor.explain()
+        stages = self.stages(explain['queryPlanner']['winningPlan'])
+        stats = explain['executionStats']
+        self.assertNotIn('COLLSCAN', stages)
+        self.assertNotIn('SORT', stages)
+        self.assertGreater(stats['nReturned'], 0)
+        self.assertLessEqual(stats['totalDocsExamined'], stats['nReturned'] * max_examined_per_result + slack)
+
+    def test_all_reports_uses_index_order(self):
+        """Test the admin listing walks created_at instead of sorting in memory"""
+        self.assertEfficientPlan(Report.all_reports_cursor(collection=self.reports))
+        self.assertEfficientPlan(Report.all_reports_cursor('Pending', collection=self.reports))
+        self.assertEfficientPlan(Report.all_reports_cursor(ward_id='W3', collection=self.reports))
+
+    def test_user_reports_uses_index_order(self):
+        """Test the my-reports listing is served by the (user_id, created_at) index"""
+        self.assertEfficientPlan(Report.user_reports_cursor('user7', limit=20, collection=self.reports))
+
+    def test_search_uses_text_index(self):
+        """Test description search only fetches matching documents"""
+        self.assertEfficientPlan(Report.search_cursor('asbestos', collection=self.reports))
+
+    def test_nearby_uses_geo_index(self):
+        """Test the $near fallback examines roughly the documents it returns"""
+        self.assertEfficientPlan(
+            Report.near_location_cursor(72.9, 19.1, 500, collection=self.reports),
+            max_examined_per_result=3
+        )
+
+    def test_priority_queue_walks_partial_index(self):
+        """Test the crew queue reads the top of the priority_key index only"""
+        self.assertEfficientPlan(Report.priority_queue_cursor(limit=50, collection=self.reports))
+
+
+class ReportGeneratorTest(TestCase):
+    EXAMPLES = [('Garbage not collected for a week', 'Cleanliness'), ('Deep pothole near the school', 'Roads')]
+
+    def make_generator(self, **overrides):
+        options = {'user_ids': ['u1', 'u2'], 'centre': (77.59, 12.97), 'examples': self.EXAMPLES,
+                   'seed': 5, 'now': datetime(2024, 6, 1)}
+        options.update(overrides)
+        return ReportGenerator(**options)
+
+    def test_same_seed_same_reports(self):
+        """Test a seeded generator is reproducible"""
+        first = [(r['location'], r['status'], r['created_at']) for r in next(self.make_generator().batches(50, 20))]
+        second = [(r['location'], r['status'], r['created_at']) for r in next(self.make_generator().batches(50, 20))]
+        self.assertEqual(first, second)
+
+    def test_reports_cluster_inside_the_area(self):
+        """Test reports stay near the seeded area and pile up at hotspots"""
+        generator = self.make_generator(radius_m=5000, hotspots=5, spread_m=100, scatter=0)
+        reports = [report for batch in generator.batches(2000, 500) for report in batch]
+        self.assertEqual(len(reports), 2000)
+        for report in reports:
+            lng, lat = report['location']['coordinates']
+            self.assertLess(distance_m(77.59, 12.97, lng, lat), 5000 + 100 * 6)
+        # Most reports are within a few spreads of some hotspot
+        near_hotspot = sum(
+            1 for report in reports
+            if min(distance_m(*report['location']['coordinates'], *hotspot) for hotspot in generator.hotspots) < 400
+        )
+        self.assertGreater(near_hotspot, 1900)
+
+    def test_status_mix_and_fields(self):
+        """Test status weights are honoured and only open reports get a priority_key"""
+        generator = self.make_generator(status_mix=parse_status_mix('Pending=1,Resolved=1'))
+        reports = [report for batch in generator.batches(1000) for report in batch]
+        statuses = {report['status'] for report in reports}
+        self.assertEqual(statuses, {'Pending', 'Resolved'})
+        for report in reports:
+            self.assertIn((report['description'], report['category']), self.EXAMPLES)
+            self.assertEqual('priority_key' in report, report['status'] == 'Pending')
+            self.assertGreaterEqual(report['updated_at'], report['created_at'])
+        with self.assertRaises(ValueError):
+            parse_status_mix('Closed=1')
+
+
+class QueueLogHandlerTest(TestCase):
+    def make_logger(self, handler):
+        log = logging.getLogger(f'waste_reports.tests.queue.{id(handler)}')
+        log.propagate = False
+        log.addHandler(handler)
+        self.addCleanup(log.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return log
+
+    def test_listener_writes_json_lines(self):
+        """Test records reach the file as JSON lines with extra fields and tracebacks"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'app.log')
+            handler = QueueLogHandler(filename=path, json=True)
+            log = self.make_logger(handler)
+            log.info("Report %s created", 'r1', extra={'user_id': 'u1'})
+            try:
+                raise ValueError('bad')
+            except ValueError:
+                log.exception("Create failed")
+            handler.close()
+
+            with open(path, encoding='utf-8') as handle:
+                lines = [json.loads(line) for line in handle]
+        self.assertEqual(lines[0]['message'], 'Report r1 created')
+        self.assertEqual(lines[0]['user_id'], 'u1')
+        self.assertEqual(lines[0]['level'], 'INFO')
+        self.assertIn('ValueError: bad', lines[1]['exception'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test a stalled writer costs dropped records, not blocked callers"""
+        release = threading.Event()
+
+        class StalledHandler(logging.Handler):
+            def emit(self, record):
+                release.wait(5)
+
+        handler = QueueLogHandler(queue_size=2, targets=[StalledHandler()])
+        log = self.make_logger(handler)
+        self.addCleanup(release.set)
+        for i in range(50):
+            log.warning("record %d", i)
+        # At most one record in the stalled writer plus two queued
+        self.assertGreaterEqual(handler.dropped, 47)
+        self.assertGreaterEqual(log_handler_stats()['dropped'], handler.dropped)
+
+    @skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_forked_child_writes_its_own_file(self):
+        """Test a forked worker logs to name.<pid>.log so only one process rotates each file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'app.log')
+            handler = QueueLogHandler(filename=path)
+            log = self.make_logger(handler)
+            log.warning("from parent")
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    log.warning("from child")
+                    handler.close()
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+            handler.close()
+
+            with open(path, encoding='utf-8') as handle:
+                self.assertEqual(handle.read(), "from parent\n")
+            with open(os.path.join(directory, f'app.{pid}.log'), encoding='utf-8') as handle:
+                self.assertEqual(handle.read(), "from child\n")
+
+    def test_external_rotation_reopens_moved_file(self):
+        """Test rotation='external' follows a file renamed by logrotate"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'app.log')
+            handler = QueueLogHandler(filename=path, rotation='external')
+            log = self.make_logger(handler)
+            log.warning("before")
+            handler.queue.join()
+            os.rename(path, path + '.1')
+            log.warning("after")
+            handler.close()
+
+            with open(path + '.1', encoding='utf-8') as handle:
+                self.assertEqual(handle.read(), "before\n")
+            with open(path, encoding='utf-8') as handle:
+                self.assertEqual(handle.read(), "after\n")
+
+
+class PasswordHashPoolTest(TestCase):
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_verify_flags_hashes_from_an_old_hasher(self):
+        """Test a match on a non-default hasher asks for a rehash"""
+        pool = PasswordHashPool(workers=0)
+        encoded = make_password('s3cret-pass', hasher='md5')
+        self.assertEqual(pool.verify('s3cret-pass', encoded), (True, True))
+        self.assertEqual(pool.verify('wrong-pass', encoded), (False, False))
+        self.assertEqual(pool.verify('s3cret-pass', None), (False, False))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_current_hash_needs_no_rehash(self):
+        """Test a hash from the default hasher verifies without a rehash"""
+        pool = PasswordHashPool(workers=0)
+        self.assertEqual(pool.verify('s3cret-pass', pool.hash('s3cret-pass')), (True, False))
+
+    def test_saturated_pool_fails_fast(self):
+        """Test callers are turned away when every slot is taken"""
+        pool = PasswordHashPool(workers=0, max_pending=0)
+        pool._slots.acquire()
+        with self.assertRaises(HashingPoolSaturated):
+            pool.hash('s3cret-pass')
+        pool._slots.release()
+        self.assertTrue(pool.hash('s3cret-pass'))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_worker_process_round_trip(self):
+        """Test hashing in a spawned worker uses the parent's hasher settings"""
+        pool = PasswordHashPool(workers=1)
+        self.addCleanup(pool.shutdown)
+        encoded = pool.hash('s3cret-pass')
+        self.assertTrue(encoded.startswith('md5$'))
+        self.assertEqual(pool.verify('s3cret-pass', encoded), (True, False))
+
+
+class ValidatedTokenCacheTest(TestCase):
+    def test_entries_expire_with_the_token(self):
+        """Test a cached token stops matching once its exp has passed"""
+        now = [1000.0]
+        cache = ValidatedTokenCache(clock=lambda: now[0])
+        cache.put(b'digest', 'user-1', exp=1060)
+        self.assertEqual(cache.get(b'digest'), 'user-1')
+        now[0] = 1060
+        self.assertIsNone(cache.get(b'digest'))
+        self.assertEqual(len(cache), 0)
+        cache.put(b'expired', 'user-2', exp=1000)
+        self.assertIsNone(cache.get(b'expired'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test the cache stays bounded and keeps recently used tokens"""
+        cache = ValidatedTokenCache(max_entries=2, clock=lambda: 0)
+        cache.put(b'a', 'user-a', exp=100)
+        cache.put(b'b', 'user-b', exp=100)
+        cache.get(b'a')
+        cache.put(b'c', 'user-c', exp=100)
+        self.assertEqual(cache.get(b'a'), 'user-a')
+        self.assertIsNone(cache.get(b'b'))
+        self.assertEqual(cache.get(b'c'), 'user-c')
+
+    def test_valid_tokens_are_verified_once(self):
+        """Test repeat calls with one token skip signature verification, bad tokens are not cached"""
+        token = AccessToken()
+        token['user_id'] = str(ObjectId())
+        raw = str(token).encode()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        with patch.object(get_authenticator(), 'get_validated_token',
+                          wraps=get_authenticator().get_validated_token) as verify:
+            self.assertEqual(user_id_from_raw_token(raw), token['user_id'])
+            self.assertEqual(user_id_from_raw_token(raw), token['user_id'])
+            self.assertEqual(verify.call_count, 1)
+            for _ in range(2):
+                with self.assertRaises(InvalidToken):
+                    user_id_from_raw_token(raw[:-2] + b'xx')
+            self.assertEqual(verify.call_count, 3)
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        self.now = [1000.0]
+        reset_store()
+        self.addCleanup(reset_store)
+
+    def test_token_bucket_refills_over_the_period(self):
+        """Test a bucket allows `count` at once, then one more per count/period seconds"""
+        store = LocalBucketStore(clock=lambda: self.now[0])
+        results = [store.consume('k', 3, 60) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertAlmostEqual(results[-1][1], 20)
+        self.now[0] += 20
+        self.assertTrue(store.consume('k', 3, 60)[0])
+        self.assertFalse(store.consume('k', 3, 60)[0])
+
+    def test_local_store_stays_bounded(self):
+        """Test many distinct clients don't grow a shard without limit"""
+        store = LocalBucketStore(shards=1, max_keys_per_shard=10, clock=lambda: self.now[0])
+        for i in range(100):
+            store.consume(f'ip:{i}', 5, 60)
+        self.assertLessEqual(len(store._shards[0][1]), 10)
+
+    def test_cache_store_counts_fixed_windows(self):
+        """Test the shared backend allows `count` per window and resets with the next one"""
+        get_cache().clear()
+        store = CacheWindowStore(clock=lambda: self.now[0])
+        self.assertEqual([store.consume('k', 2, 60)[0] for _ in range(3)], [True, True, False])
+        self.assertAlmostEqual(store.consume('k', 2, 60)[1], 20)
+        self.now[0] = 1020
+        self.assertTrue(store.consume('k', 2, 60)[0])
+
+    @override_settings(RATE_LIMITS={'enabled': True, 'endpoints': {'test_write': {'ip': '2/minute'}}})
+    def test_decorator_returns_429_with_retry_after(self):
+        """Test over-limit writes get 429 + Retry-After without reaching the view"""
+        calls = []
+
+        @rate_limit('test_write')
+        def view(request):
+            calls.append(request.method)
+            return HttpResponse('ok')
+
+        factory = RequestFactory()
+        statuses = [view(factory.post('/write/')).status_code for _ in range(2)]
+        limited = view(factory.post('/write/'))
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(limited.status_code, 429)
+        self.assertGreaterEqual(int(limited['Retry-After']), 1)
+        self.assertEqual(len(calls), 2)
+        # Reads and other clients are unaffected
+        self.assertEqual(view(factory.get('/write/')).status_code, 200)
+        self.assertEqual(view(factory.post('/write/', REMOTE_ADDR='10.0.0.2')).status_code, 200)
+
+    @override_settings(RATE_LIMITS={'enabled': True, 'endpoints': {'test_write': {'user': '1/minute', 'ip': '3/minute'}}})
+    def test_rejected_request_spends_no_shared_tokens(self):
+        """Test a user over their own limit doesn't drain the per-IP bucket of others behind the same address"""
+        @rate_limit('test_write')
+        def view(request):
+            return HttpResponse('ok')
+
+        factory = RequestFactory()
+        with patch('waste_reports.ratelimit.user_id_from_request', return_value='noisy'):
+            statuses = [view(factory.post('/write/')).status_code for _ in range(5)]
+        self.assertEqual(statuses, [200, 429, 429, 429, 429])
+        with patch('waste_reports.ratelimit.user_id_from_request', side_effect=['quiet-1', 'quiet-2']):
+            self.assertEqual([view(factory.post('/write/')).status_code for _ in range(2)], [200, 200])
+
+    def test_cache_store_refunds_rejected_requests(self):
+        """Test the shared backend gives counters back when any bucket rejects the request"""
+        get_cache().clear()
+        store = CacheWindowStore(clock=lambda: self.now[0])
+        self.assertTrue(store.consume('user', 1, 60)[0])
+        for _ in range(3):
+            results = store.consume_all([('user', 1, 60, None), ('ip', 2, 60, None)])
+            self.assertEqual([allowed for allowed, _ in results], [False, True])
+        self.assertEqual([store.consume('ip', 2, 60)[0] for _ in range(3)], [True, True, False])
+
+    def test_client_ip_ignores_client_supplied_forwarded_for(self):
+        """Test the client IP is taken trusted_proxies entries from the right of X-Forwarded-For"""
+        factory = RequestFactory()
+        spoofed = factory.post('/write/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7')
+        with override_settings(RATE_LIMITS={'trusted_proxies': 0}):
+            self.assertEqual(client_ip(spoofed), '10.0.0.1')
+        with override_settings(RATE_LIMITS={'trusted_proxies': 1}):
+            self.assertEqual(client_ip(spoofed), '203.0.113.7')
+            # Fewer entries than proxies: the request did not come through them
+            self.assertEqual(client_ip(factory.post('/write/', REMOTE_ADDR='10.0.0.1')), '10.0.0.1')
+        with override_settings(RATE_LIMITS={'trusted_proxies': 2}):
+            self.assertEqual(client_ip(spoofed), '6.6.6.6')
+
+
+class FakeIdempotencyKeys:
+    """In-memory stand-in for the IdempotencyKey collection methods"""
+
+    def __init__(self):
+        self.records = {}
+
+    def get(self, key_id):
+        return self.records.get(key_id)
+
+    def claim(self, key_id, fingerprint, ttl):
+        if key_id in self.records:
+            return False
+        now = datetime.utcnow()
+        self.records[key_id] = {'state': 'pending', 'fingerprint': fingerprint, 'locked_at': now,
+                                'expires_at': now + timedelta(seconds=ttl)}
+        return True
+
+    def take_over(self, key_id, locked_at):
+        record = self.records.get(key_id)
+        if record and record['state'] == 'pending' and record['locked_at'] == locked_at:
+            record['locked_at'] = datetime.utcnow()
+            return True
+        return False
+
+    def complete(self, key_id, status_code, content, content_type):
+        self.records[key_id].update(state='completed', status=status_code, content=content, content_type=content_type)
+
+    def release(self, key_id):
+        if self.records.get(key_id, {}).get('state') == 'pending':
+            del self.records[key_id]
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        self.keys = FakeIdempotencyKeys()
+        for target, value in (('waste_reports.idempotency.IdempotencyKey', self.keys),
+                              ('waste_reports.idempotency.user_id_from_request', lambda request: 'user-1')):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        completed_responses.clear()
+        self.addCleanup(completed_responses.clear)
+        reset_store()
+        self.addCleanup(reset_store)
+        self.calls = 0
+        self.status_code = 201
+
+        @idempotent(('description',))
+        @rate_limit('test_create')
+        def view(request):
+            self.calls += 1
+            return JsonResponse({'id': str(self.calls)}, status=self.status_code)
+        self.view = view
+
+    def post(self, key='key-1', description='Garbage pile'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.view(RequestFactory().post('/create/', {'description': description}, **headers))
+
+    def fingerprint(self, description='Garbage pile'):
+        return idempotency_fingerprint(RequestFactory().post('/create/', {'description': description}), ('description',))
+
+    def test_replays_first_response(self):
+        """Test a repeat runs the view once and replays its response, from the DB after a restart"""
+        first = self.post()
+        retry = self.post()
+        completed_responses.clear()
+        after_restart = self.post()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first.status_code, 201)
+        for response in (retry, after_restart):
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.content, first.content)
+            self.assertEqual(response['Idempotent-Replayed'], 'true')
+
+    @override_settings(RATE_LIMITS={'enabled': True, 'endpoints': {'test_create': {'ip': '1/minute'}}})
+    def test_replays_are_not_rate_limited(self):
+        """Test retries of a completed request get the stored response, not a 429"""
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual([self.post().status_code for _ in range(5)], [201] * 5)
+        self.assertEqual(self.post(key='key-2').status_code, 429)
+        self.assertEqual(self.calls, 1)
+
+    def test_without_key_always_runs(self):
+        """Test requests without the header are not deduplicated"""
+        self.post(key=None)
+        self.post(key=None)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.keys.records, {})
+
+    def test_in_progress_and_mismatch(self):
+        """Test a concurrent duplicate gets 409 and a reused key with another body gets 422"""
+        self.keys.claim('user-1:key-1', self.fingerprint(), 60)
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(self.post(description='Other').status_code, 422)
+        self.assertEqual(self.calls, 0)
+
+    def test_stale_pending_key_is_taken_over(self):
+        """Test a pending key older than the lease is claimed by the retry"""
+        self.keys.claim('user-1:key-1', self.fingerprint(), 60)
+        self.keys.records['user-1:key-1']['locked_at'] -= timedelta(minutes=5)
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(self.calls, 1)
+
+    def test_failure_releases_key(self):
+        """Test an error response is not stored, so a corrected retry runs again"""
+        self.status_code = 400
+        self.assertEqual(self.post().status_code, 400)
+        self.assertEqual(self.keys.records, {})
+        self.status_code = 201
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+
+class ReportStatusEventTest(TestCase):
+    def setUp(self):
+        self.report_id = str(ObjectId())
+        self.start = datetime(2026, 3, 1, 8, 0)
+        self.addCleanup(ReportStatusEvent.collection.delete_many, {'report_id': self.report_id})
+
+    def record(self, count, offset=0):
+        for i in range(offset, offset + count):
+            ReportStatusEvent.record(
+                {'_id': self.report_id, 'status': 'Pending'}, 'In Progress', self.start + timedelta(minutes=i)
+            )
+
+    def insert_bucket(self, minutes):
+        """A partially filled bucket, as concurrent first writes in a window leave behind"""
+        events = [{'from_status': 'Pending', 'to_status': 'In Progress', 'at': self.start + timedelta(minutes=m)}
+                  for m in minutes]
+        return ReportStatusEvent.collection.insert_one({
+            'report_id': self.report_id,
+            'window_start': ReportStatusEvent.window_start(self.start),
+            'count': len(events),
+            'first_at': events[0]['at'],
+            'last_at': events[-1]['at'],
+            'events': events
+        }).inserted_id
+
+    def history(self):
+        events, total = ReportStatusEvent.get_history(self.report_id, 1, 1000)
+        return [event['at'] for event in events], total
+
+    def counts(self):
+        return sorted(bucket['count'] for bucket in ReportStatusEvent.collection.find({'report_id': self.report_id}))
+
+    def test_new_bucket_after_bucket_size(self):
+        """Test a full bucket is left alone and the next event starts another"""
+        self.record(ReportStatusEvent.BUCKET_SIZE + 1)
+        self.assertEqual(self.counts(), [1, ReportStatusEvent.BUCKET_SIZE])
+
+    def test_history_pages_newest_first_across_buckets(self):
+        """Test pages slice the newest-first history across bucket boundaries"""
+        self.record(ReportStatusEvent.BUCKET_SIZE + 11)
+        pages = [ReportStatusEvent.get_history(self.report_id, page, 20) for page in (1, 2, 3, 4)]
+        self.assertEqual([total for _, total in pages], [61] * 4)
+        self.assertEqual([len(events) for events, _ in pages], [20, 20, 20, 1])
+        seen = [event['at'] for events, _ in pages for event in events]
+        self.assertEqual(seen, sorted((self.start + timedelta(minutes=i) for i in range(61)), reverse=True))
+
+    def test_compact_merges_partial_buckets(self):
+        """Test compaction merges a window's partial buckets without losing or repeating events"""
+        self.insert_bucket(range(0, 20))
+        self.insert_bucket(range(20, 30))
+        self.insert_bucket(range(30, 35))
+        before = self.history()
+
+        self.assertEqual(ReportStatusEvent.fragmented_reports().count(self.report_id), 1)
+        self.assertEqual(ReportStatusEvent.compact(self.report_id), 2)
+        self.assertEqual(self.counts(), [35])
+        self.assertEqual(self.history(), before)
+        # New events go into the merged bucket again
+        self.record(1, offset=40)
+        self.assertEqual(self.counts(), [36])
+
+    def test_compact_skips_bucket_written_meanwhile(self):
+        """Test a source whose count changed after it was read is not moved"""
+        target = self.insert_bucket(range(0, 20))
+        source = self.insert_bucket(range(20, 30))
+        stale = ReportStatusEvent.collection.find_one({'_id': source})
+        # A record() landing in the source after compaction read it
+        ReportStatusEvent.collection.update_one({'_id': source}, {
+            '$push': {'events': {'from_status': 'Pending', 'to_status': 'Resolved',
+                                 'at': self.start + timedelta(minutes=30)}},
+            '$inc': {'count': 1}
+        })
+
+        self.assertFalse(ReportStatusEvent._move(stale, target))
+        self.assertEqual(self.history()[1], 31)
+        self.assertEqual(len(set(self.history()[0])), 31)
+
+    def test_compact_finishes_interrupted_run(self):
+        """Test a source already pushed into its target is hidden from readers and removed next run"""
+        target = self.insert_bucket(range(0, 20))
+        source = self.insert_bucket(range(20, 30))
+        moved = ReportStatusEvent.collection.find_one_and_update({'_id': source}, {'$set': {'frozen': True}})
+        ReportStatusEvent.collection.update_one({'_id': target}, {
+            '$push': {'events': {'$each': moved['events']}},
+            '$inc': {'count': moved['count']},
+            '$addToSet': {'merged': source}
+        })
+
+        self.assertEqual(self.history()[1], 30)
+        self.assertEqual(len(set(self.history()[0])), 30)
+        self.assertEqual(ReportStatusEvent.fragmented_reports().count(self.report_id), 1)
+        self.assertEqual(ReportStatusEvent.compact(self.report_id), 1)
+        self.assertEqual(self.counts(), [30])
+
+
+class ReportRollupTest(TestCase):
+    def setUp(self):
+        # A ward of its own keeps these counters apart from other tests' reports
+        self.ward = f"test-ward-{ObjectId()}"
+        self.addCleanup(ReportRollup.collection.delete_many, {'ward_id': self.ward})
+        self.reports = [
+            {'created_at': datetime(2026, 2, 10, 9, 15), 'status': 'Pending', 'category': 'Garbage', 'ward_id': self.ward},
+            {'created_at': datetime(2026, 2, 10, 9, 50), 'status': 'Pending', 'category': 'Pothole', 'ward_id': self.ward},
+            {'created_at': datetime(2026, 2, 10, 14, 5), 'status': 'Pending', 'category': 'Garbage', 'ward_id': self.ward},
+            {'created_at': datetime(2026, 2, 12, 8, 0), 'status': 'Pending', 'category': None, 'ward_id': self.ward},
+        ]
+        ReportRollup.record_created(self.reports)
+
+    def series(self, granularity='day', **filters):
+        return ReportRollup.get_timeseries(
+            datetime(2026, 2, 1), datetime(2026, 3, 1), granularity, ward_id=self.ward, **filters
+        )
+
+    def test_bucket_start_truncates(self):
+        """Test hour buckets drop minutes and day buckets drop the time of day"""
+        when = datetime(2026, 2, 10, 9, 15, 42, 123)
+        self.assertEqual(ReportRollup.bucket_start(when, 'hour'), datetime(2026, 2, 10, 9))
+        self.assertEqual(ReportRollup.bucket_start(when, 'day'), datetime(2026, 2, 10))
+
+    def test_created_reports_fill_hour_and_day_buckets(self):
+        """Test each report is counted once per granularity, grouped by status and category"""
+        days = self.series('day')
+        self.assertEqual([point['bucket'] for point in days], [datetime(2026, 2, 10), datetime(2026, 2, 12)])
+        self.assertEqual(days[0]['total'], 3)
+        self.assertEqual(days[0]['by_category'], {'Garbage': 2, 'Pothole': 1})
+        self.assertEqual(days[1]['by_category'], {'Uncategorized': 1})
+
+        hours = self.series('hour')
+        self.assertEqual([(point['bucket'].hour, point['total']) for point in hours], [(9, 2), (14, 1), (8, 1)])
+
+    def test_status_change_moves_counts(self):
+        """Test a status change moves the report between status counters at both granularities"""
+        ReportRollup.record_status_change(self.reports[0], 'In Progress')
+        ReportRollup.record_status_change(self.reports[1], 'Resolved')
+        nine_am = self.series('hour')[0]
+        self.assertEqual(nine_am['total'], 2)
+        self.assertEqual(nine_am['by_status'], {'In Progress': 1, 'Resolved': 1})
+        tenth = self.series('day')[0]
+        self.assertEqual(tenth['total'], 3)
+        self.assertEqual(tenth['by_status'], {'Pending': 1, 'In Progress': 1, 'Resolved': 1})
+
+    def test_timeseries_filters(self):
+        """Test category/status filters, and that emptied counters are left out"""
+        ReportRollup.record_status_change(self.reports[3], 'Resolved')
+        self.assertEqual([point['total'] for point in self.series(category='Garbage')], [2])
+        self.assertEqual([point['total'] for point in self.series(status='Pending')], [3])
+        resolved = self.series(status='Resolved')
+        self.assertEqual([(point['bucket'], point['total']) for point in resolved], [(datetime(2026, 2, 12), 1)])
+        # The 12th's Pending counter is now 0 and must not show up
+        self.assertEqual(self.series()[1]['by_status'], {'Resolved': 1})
+        self.assertEqual(ReportRollup.get_timeseries(
+            datetime(2026, 2, 11), datetime(2026, 2, 11, 23), 'day', ward_id=self.ward
+        ), [])
+
+
+class ReportExportTest(APITestCase):
+    def row(self, **fields):
+        row = {field: None for field in EXPORT_FIELDS}
+        row.update({'id': 'r1', 'latitude': 12.97, 'longitude': 77.59, 'urgency_count': 0,
+                    'created_at': datetime(2026, 2, 10, 9, 15)})
+        row.update(fields)
+        return row
+
+    def test_build_export_query_filters(self):
+        """Test status/category/ward filters, date range bounds and bbox geometry"""
+        query = build_export_query(
+            status='Pending', category='Garbage', ward='ward-7',
+            start='2026-02-01', end='2026-02-28', bbox='77.5,12.9,77.7,13.1'
+        )
+        self.assertEqual(query['status'], 'Pending')
+        self.assertEqual(query['category'], 'Garbage')
+        self.assertEqual(query['ward_id'], 'ward-7')
+        # A bare end date includes that whole day
+        self.assertEqual(query['created_at'], {
+            '$gte': datetime(2026, 2, 1), '$lte': datetime(2026, 2, 28, 23, 59, 59, 999999)
+        })
+        self.assertEqual(query['location']['$geoWithin']['$geometry'], bbox_geometry((77.5, 12.9, 77.7, 13.1)))
+        self.assertEqual(build_export_query(start='2026-02-01T10:30:00')['created_at'],
+                         {'$gte': datetime(2026, 2, 1, 10, 30)})
+        self.assertEqual(build_export_query(), {})
+
+    def test_build_export_query_rejects_bad_input(self):
+        """Test invalid dates and bboxes raise ValueError (answered with 400)"""
+        for kwargs in ({'start': 'yesterday'}, {'end': '2026-13-40'}, {'bbox': '1,2,3'}, {'bbox': '10,0,5,5'}):
+            with self.assertRaises(ValueError):
+                build_export_query(**kwargs)
+
+    def test_csv_escapes_descriptions(self):
+        """Test commas, quotes and newlines in descriptions survive a CSV round trip"""
+        description = 'Bins overflowing, "again"\nsecond line'
+        output = ''.join(stream_csv([self.row(description=description)]))
+        header, row = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(header, EXPORT_FIELDS)
+        self.assertEqual(row[EXPORT_FIELDS.index('description')], description)
+        self.assertEqual(row[EXPORT_FIELDS.index('created_at')], '2026-02-10T09:15:00')
+
+    def test_jsonl_one_object_per_line(self):
+        """Test each row is a single JSON line, with newlines escaped and dates in ISO format"""
+        rows = [self.row(id='r1', description='first\nsecond'), self.row(id='r2')]
+        lines = ''.join(stream_jsonl(rows)).splitlines()
+        self.assertEqual(len(lines), 2)
+        first = json.loads(lines[0])
+        self.assertEqual(list(first), EXPORT_FIELDS)
+        self.assertEqual(first['description'], 'first\nsecond')
+        self.assertEqual(first['created_at'], '2026-02-10T09:15:00')
+        self.assertEqual(json.loads(lines[1])['id'], 'r2')
+
+    @skipUnless(pa, 'pyarrow is not installed')
+    def test_parquet_round_trip(self):
+        """Test the chunked Parquet stream reads back as one table with every row"""
+        import pyarrow.parquet as pq
+        rows = [self.row(id='r1', description='a, "b"\nc'), self.row(id='r2')]
+        table = pq.read_table(io.BytesIO(b''.join(stream_parquet(rows, batch_size=1))))
+        self.assertEqual(table.column_names, EXPORT_FIELDS)
+        self.assertEqual(table.column('id').to_pylist(), ['r1', 'r2'])
+        self.assertEqual(table.column('description')[0].as_py(), 'a, "b"\nc')
+
+    def test_parquet_without_pyarrow_is_501(self):
+        """Test the parquet export answers 501 when pyarrow is not installed"""
+        admin = User.create_user(email=f"export-{ObjectId()}@example.com", password="exportpass123",
+                                 name="Export Admin", is_admin=True)
+        self.addCleanup(User.collection.delete_one, {'_id': admin['_id']})
+        token = AccessToken()
+        token['user_id'] = str(admin['_id'])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with patch('waste_reports.exporter.pa', None):
+            response = self.client.get('/api/reports/export/', {'export_format': 'parquet'})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertIn('pyarrow', response.data['error'])
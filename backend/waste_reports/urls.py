@@ -16,12 +16,23 @@ urlpatterns = [
     path('reports/', views.get_reports, name='get_reports'),
     path("users/<str:user_id>/ban/", views.ban_user, name="ban_user"),
     path('reports/create/', views.create_report, name='create_report'),
+    path('reports/import/', views.import_reports, name='import_reports'),
+    path('reports/export/', views.export_reports, name='export_reports'),
+    path('reports/stream/', views.stream_reports, name='stream_reports'),
+    path('reports/changes/', views.get_report_changes, name='get_report_changes'),
+    path('reports/queue/', views.get_priority_queue, name='get_priority_queue'),
+    path('reports/route/', views.get_crew_routes, name='get_crew_routes'),
     path('reports/search/', views.search_reports, name='search_reports'),
     path('reports/near/', views.get_reports_near_location, name='get_reports_near_location'),
     path('reports/<str:report_id>/', views.get_report_detail, name='get_report_detail'),
     path("reports/<str:report_id>/urgency/", views.mark_urgent, name="mark_urgent"),
+    path('reports/<str:report_id>/history/', views.get_report_history, name='get_report_history'),
     path('reports/<str:report_id>/update/', views.update_report_status, name='update_report_status'),
     
     # Dashboard (admin only)
     path('dashboard/stats/', views.get_dashboard_stats, name='get_dashboard_stats'),
+    path('dashboard/summary/', views.get_dashboard_summary, name='get_dashboard_summary'),
+    path('dashboard/timeseries/', views.get_dashboard_timeseries, name='get_dashboard_timeseries'),
+    path('dashboard/sla/', views.get_resolution_sla, name='get_resolution_sla'),
+    path('dashboard/cache/', views.get_cache_stats, name='get_cache_stats'),
 ]
@@ -6,12 +6,41 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.conf import settings
 from bson import ObjectId
+from datetime import datetime, timedelta
 import os
+import time
 import uuid
 import logging
 from utils.category_predictor import predict_category
-from .models import User, Report
+from .models import User, Report, ReportRollup, ReportStatusEvent, ResolutionSketch
+from .cache import (
+    dashboard_summary_stats, get_cached_list, get_or_refresh, get_version as get_cache_version,
+    list_cache_key, report_list_stats, set_cached_list
+)
+from .events import TooManySubscribers, report_events
+from .conditional import make_validators, not_modified, set_validators
+from .exporter import (
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES, SUPPORTED_FORMATS as EXPORT_FORMATS,
+    build_export_query, parse_when, stream_export
+)
+from .importer import SUPPORTED_FORMATS, detect_format, import_file, make_job_id
+from .priority import score_at as priority_score_at
+from .routing import plan_routes
+from .metrics import category_inference, registry as metrics_registry
+from .query_budget import query_budget
+from .passwords import HashingPoolSaturated
+from .authentication import jwt_token_stats, user_id_from_request
+from .ratelimit import rate_limit
+from .idempotency import idempotency_stats, idempotent
+from .geo import bbox_geometry, parse_bbox
+from .sync import (
+    EPOCH as SYNC_EPOCH, InvalidSyncToken, advance as sync_advance,
+    decode_token, encode_token, sync_window, token_expired
+)
 from .serializers import (
     UserSerializer, ReportSerializer, ReportCreateSerializer,
     ReportUpdateSerializer, LoginSerializer, RegisterSerializer,
@@ -25,21 +54,25 @@ class CustomJWTAuthentication:
     
     @staticmethod
     def get_user_from_token(request):
-        from rest_framework_simplejwt.authentication import JWTAuthentication
-        from rest_framework_simplejwt.exceptions import InvalidToken
-        
         try:
-            jwt_auth = JWTAuthentication()
-            validated_token = jwt_auth.get_validated_token(
-                jwt_auth.get_raw_token(jwt_auth.get_header(request))
-            )
-            user_id = validated_token.get('user_id')
+            # Signature checks are cached per token until it expires; the user is always reloaded
+            user_id = user_id_from_request(request)
             if user_id:
                 return User.get_by_id(user_id)
             return None
-        except (InvalidToken, Exception):
+        except Exception:
             return None
 
+def hashing_busy_response():
+    """503 for register/login when every password hashing slot is taken"""
+    response = Response(
+        {'error': 'Server busy, please retry shortly'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(settings.PASSWORD_HASH_POOL.get('retry_after', 1))
+    return response
+
+@rate_limit('register')
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register(request):
@@ -73,6 +106,8 @@ def register(request):
                 }
             }, status=status.HTTP_201_CREATED)
             
+        except HashingPoolSaturated:
+            return hashing_busy_response()
         except Exception as e:
             logger.error(f"Registration error: {e}")
             return Response(
@@ -113,6 +148,8 @@ def login(request):
                     {'error': 'Invalid credentials or account disabled'},
                     status=status.HTTP_401_UNAUTHORIZED
                 )
+        except HashingPoolSaturated:
+            return hashing_busy_response()
         except Exception as e:
             logger.error(f"Login error: {e}")
             return Response(
@@ -122,6 +159,10 @@ def login(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@idempotent(('description', 'latitude', 'longitude'))
+@rate_limit('create_report')
+# 5 for the create itself, plus the Idempotency-Key lookup, claim and completion
+@query_budget(8)
 @api_view(['POST'])
 @permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
 @parser_classes([MultiPartParser, FormParser])
@@ -157,7 +198,8 @@ def create_report(request):
             
             # Create report
             # Predict category using ML or rule-based logic
-            predicted_category = predict_category(serializer.validated_data['description'])
+            with category_inference.time(mode='single'):
+                predicted_category = predict_category(serializer.validated_data['description'])
 
             # Create report with predicted category
             report = Report.create_report(
@@ -195,6 +237,121 @@ def create_report(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+@parser_classes([MultiPartParser, FormParser])
+def import_reports(request):
+    """Bulk import reports from a CSV/JSONL upload - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response(
+            {'error': 'A CSV or JSONL file is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    fmt = request.data.get('format') or detect_format(upload.name)
+    if fmt not in SUPPORTED_FORMATS:
+        return Response(
+            {'error': f"Unsupported format: {fmt}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        batch_size = int(request.data.get('batch_size', 500))
+    except ValueError:
+        return Response(
+            {'error': 'Invalid batch size'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        summary = import_file(
+            upload.file,
+            fmt,
+            user_id=request.data.get('user_id') or str(user['_id']),
+            job_id=request.data.get('job_id') or make_job_id(upload.name, upload.size),
+            batch_size=max(1, batch_size),
+            resume=str(request.data.get('resume', 'false')).lower() == 'true'
+        )
+        return Response(summary, status=status.HTTP_200_OK)
+        
+    except UnicodeDecodeError:
+        return Response(
+            {'error': 'File must be UTF-8 encoded'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Import reports error: {e}")
+        return Response(
+            {'error': 'Failed to import reports'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def export_reports(request):
+    """Stream a filtered report export as CSV, JSONL or Parquet - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    # `format` is reserved by DRF for content negotiation
+    fmt = request.GET.get('export_format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return Response(
+            {'error': f"Unsupported format: {fmt}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        query = build_export_query(
+            status=request.GET.get('status'),
+            category=request.GET.get('category'),
+            start=request.GET.get('start'),
+            end=request.GET.get('end'),
+            bbox=request.GET.get('bbox'),
+            ward=request.GET.get('ward')
+        )
+        chunks = stream_export(fmt, query)
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except RuntimeError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    
+    filename = f"reports-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@query_budget(4)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Now truly public
 def get_reports(request):
@@ -206,14 +363,47 @@ def get_reports(request):
         user_id = str(user['_id']) if user else None
 
         status_filter = request.GET.get('status')
+        ward_id = request.GET.get('ward')
         user_only = request.GET.get('user_only', 'false').lower() == 'true'
         limit = int(request.GET.get('limit', 100))
         skip = int(request.GET.get('skip', 0))
 
+        # Listings are identical for every caller except user_only ones
+        if user_only and user_id:
+            params, scope = {'limit': limit, 'skip': skip}, f"user:{user_id}"
+            marker_query = {'user_id': user_id}
+        else:
+            params, scope = {'status': status_filter or '', 'ward': ward_id or '', 'limit': limit, 'skip': skip}, 'all'
+            marker_query = {}
+            if status_filter:
+                marker_query['status'] = status_filter
+            if ward_id:
+                marker_query['ward_id'] = ward_id
+
+        # Cached listings carry their validators, so a hit (304 or 200) needs no MongoDB query
+        cache_key = list_cache_key(params, scope=scope)
+        cached = get_cached_list(cache_key)
+        if cached is not None:
+            conditional = not_modified(request, cached['etag'], cached['last_modified'])
+            if conditional is not None:
+                return conditional
+            return set_validators(
+                Response(cached['data'], status=status.HTTP_200_OK), cached['etag'], cached['last_modified']
+            )
+
+        # Miss: answer revalidations from the indexed change marker, before any payload work
+        updated_at, total = Report.get_change_marker(marker_query)
+        etag, last_modified = make_validators(
+            scope, *sorted(params.items()), total, updated_at=updated_at
+        )
+        conditional = not_modified(request, etag, last_modified)
+        if conditional is not None:
+            return conditional
+
         if user_only and user_id:
             reports = Report.get_user_reports(user_id, limit, skip)
         else:
-            reports = Report.get_all_reports(status_filter, limit, skip)
+            reports = Report.get_all_reports(status_filter, limit, skip, ward_id=ward_id)
 
         reports_data = []
         for report in reports:
@@ -223,16 +413,19 @@ def get_reports(request):
                 'description': report['description'],
                 'status': report['status'],
                 'location': report['location'],
+                'ward_id': report.get('ward_id'),
                 'image_url': report.get('image_url'),
                 'created_at': report['created_at'],
                 'updated_at': report['updated_at'],
                 'admin_remarks': report.get('admin_remarks')
             })
 
-        return Response({
+        response_data = {
             'reports': reports_data,
             'count': len(reports_data)
-        }, status=status.HTTP_200_OK)
+        }
+        set_cached_list(cache_key, {'data': response_data, 'etag': etag, 'last_modified': last_modified})
+        return set_validators(Response(response_data, status=status.HTTP_200_OK), etag, last_modified)
 
     except Exception as e:
         logger.error(f"Get reports error: {e}")
@@ -243,6 +436,226 @@ def get_reports(request):
 
         
 
+@query_budget(3)
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_report_changes(request):
+    """Reports changed and deleted since a sync token - AUTHENTICATION REQUIRED"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    # Admins sync every report unless they ask for their own
+    user_only = request.GET.get('user_only', 'true').lower() == 'true'
+    scope_user_id = str(user['_id']) if user_only or not user.get('is_admin', False) else None
+    
+    until = sync_window()
+    since = request.GET.get('since')
+    try:
+        if since:
+            report_after, deleted_after = decode_token(since)
+        else:
+            # First sync: every current report, and deletions from now on
+            report_after, deleted_after = (SYNC_EPOCH, ''), (until, '')
+    except InvalidSyncToken as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if since and token_expired(deleted_after):
+        return Response(
+            {'error': 'Sync token expired, fetch the full list again'},
+            status=status.HTTP_410_GONE
+        )
+    
+    try:
+        reports, reports_truncated, tombstones, tombstones_truncated = Report.get_changes_since(
+            scope_user_id, report_after, deleted_after, until,
+            limit=settings.DELTA_SYNC['page_size']
+        )
+        
+        changes = []
+        for report in reports:
+            changes.append({
+                'id': str(report['_id']),
+                'user_id': report['user_id'],
+                'description': report['description'],
+                'status': report['status'],
+                'location': report['location'],
+                'image_url': report.get('image_url'),
+                'category': report.get('category'),
+                'ward_id': report.get('ward_id'),
+                'urgency_count': report.get('urgency_count', 0),
+                'created_at': report['created_at'],
+                'updated_at': report['updated_at'],
+                'admin_remarks': report.get('admin_remarks')
+            })
+        
+        next_token = encode_token(
+            sync_advance(report_after, reports, 'updated_at', reports_truncated, until),
+            sync_advance(deleted_after, tombstones, 'deleted_at', tombstones_truncated, until)
+        )
+        
+        return Response({
+            'changes': changes,
+            'deleted': [tombstone['report_id'] for tombstone in tombstones],
+            'next': next_token,
+            'has_more': reports_truncated or tombstones_truncated
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Get report changes error: {e}")
+        return Response(
+            {'error': 'Failed to get report changes'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_priority_queue(request):
+    """Open reports ranked by crew priority score - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    try:
+        limit = min(int(request.GET.get('limit', 50)), 500)
+    except ValueError:
+        return Response(
+            {'error': 'limit must be an integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        reports = Report.get_priority_queue(
+            limit=limit,
+            category=request.GET.get('category'),
+            ward_id=request.GET.get('ward')
+        )
+        now = datetime.utcnow()
+        queue = []
+        for report in reports:
+            serializer = ReportSerializer(report)
+            queue.append({
+                **serializer.data,
+                'priority_score': round(priority_score_at(report['priority_key'], now), 2),
+                'nearby_open_count': report.get('nearby_open_count', 0),
+                'age_hours': round((now - report['created_at']).total_seconds() / 3600, 1)
+            })
+        
+        return Response({
+            'queue': queue,
+            'count': len(queue)
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Get priority queue error: {e}")
+        return Response(
+            {'error': 'Failed to get priority queue'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_crew_routes(request):
+    """Open reports in a bbox or ward, ordered into crew-sized routes from a depot - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    ward_id = request.GET.get('ward')
+    if not request.GET.get('bbox') and not ward_id:
+        return Response(
+            {'error': 'bbox or ward is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        depot_lng, depot_lat = (float(part) for part in request.GET.get('depot', '').split(','))
+        if not (-180 <= depot_lng <= 180 and -90 <= depot_lat <= 90):
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': 'depot must be lng,lat'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        geometry = bbox_geometry(parse_bbox(request.GET['bbox'])) if request.GET.get('bbox') else None
+        batch_size = int(request.GET.get('batch_size', settings.ROUTING['crew_batch_size']))
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        reports = Report.get_open_reports_in_area(
+            geometry=geometry,
+            ward_id=ward_id,
+            category=request.GET.get('category'),
+            limit=settings.ROUTING['max_stops']
+        )
+        stops = [{
+            'id': str(report['_id']),
+            'description': report.get('description'),
+            'category': report.get('category'),
+            'status': report.get('status'),
+            'urgency_count': report.get('urgency_count', 0),
+            'longitude': report['location']['coordinates'][0],
+            'latitude': report['location']['coordinates'][1]
+        } for report in reports]
+        
+        batches = plan_routes((depot_lng, depot_lat), stops, batch_size=batch_size)
+        routes = [{
+            'crew': number,
+            'stops': [
+                {**stop, 'leg_m': round(leg, 1)}
+                for stop, leg in zip(batch['stops'], batch['legs_m'])
+            ],
+            'distance_m': round(batch['distance_m'], 1)
+        } for number, batch in enumerate(batches, start=1)]
+        
+        return Response({
+            'depot': {'longitude': depot_lng, 'latitude': depot_lat},
+            'routes': routes,
+            'stop_count': len(stops),
+            'total_distance_m': round(sum(batch['distance_m'] for batch in batches), 1)
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Get crew routes error: {e}")
+        return Response(
+            {'error': 'Failed to plan crew routes'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
 def get_report_detail(request, report_id):
@@ -269,6 +682,11 @@ def get_report_detail(request, report_id):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        etag, last_modified = make_validators(report['_id'], updated_at=report['updated_at'])
+        conditional = not_modified(request, etag, last_modified)
+        if conditional is not None:
+            return conditional
+        
         report_data = {
             'id': str(report['_id']),
             'user_id': report['user_id'],
@@ -281,7 +699,7 @@ def get_report_detail(request, report_id):
             'admin_remarks': report.get('admin_remarks')
         }
         
-        return Response(report_data, status=status.HTTP_200_OK)
+        return set_validators(Response(report_data, status=status.HTTP_200_OK), etag, last_modified)
         
     except Exception as e:
         logger.error(f"Get report detail error: {e}")
@@ -290,6 +708,57 @@ def get_report_detail(request, report_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@query_budget(4)
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_report_history(request, report_id):
+    """Paginated status history of a report, newest first - AUTHENTICATION REQUIRED"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+        page_size = min(100, max(1, int(request.GET.get('page_size', 20))))
+    except ValueError:
+        return Response(
+            {'error': 'Invalid page or page_size'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        report = Report.get_by_id(report_id)
+        if not report:
+            return Response(
+                {'error': 'Report not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if not user.get('is_admin', False) and report['user_id'] != str(user['_id']):
+            return Response(
+                {'error': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        events, total = ReportStatusEvent.get_history(report_id, page, page_size)
+        return Response({
+            'events': events,
+            'page': page,
+            'page_size': page_size,
+            'total': total
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Get report history error: {e}")
+        return Response(
+            {'error': 'Failed to get report history'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@query_budget(7)
 @api_view(['PUT'])
 @permission_classes([AllowAny])  # Public access
 def update_report_status(request, report_id):
@@ -298,20 +767,18 @@ def update_report_status(request, report_id):
     serializer = ReportUpdateSerializer(data=request.data)
     if serializer.is_valid():
         try:
-            result = Report.update_status(
+            updated_report = Report.update_status(
                 report_id=report_id,
                 status=serializer.validated_data['status'],
                 admin_remarks=serializer.validated_data.get('admin_remarks')
             )
 
-            if result.modified_count == 0:
+            if updated_report is None:
                 return Response(
                     {'error': 'Report not found or no changes made'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Get updated report from DB
-            updated_report = Report.get_by_id(report_id)
             report_data = {
                 'id': str(updated_report['_id']),
                 'user_id': updated_report['user_id'],
@@ -336,6 +803,7 @@ def update_report_status(request, report_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # REQUIRE AUTHENTICATION FOR MAP DATA
 def get_reports_near_location(request):
@@ -347,18 +815,32 @@ def get_reports_near_location(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    try:
-        latitude = float(request.GET.get('lat', 0))
-        longitude = float(request.GET.get('lng', 0))
-        max_distance = int(request.GET.get('distance', 1000))  # meters
-        
-        if latitude == 0 or longitude == 0:
+    if request.GET.get('bbox'):
+        try:
+            bbox = parse_bbox(request.GET['bbox'])
+        except ValueError as e:
             return Response(
-                {'error': 'Latitude and longitude are required'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        reports = Report.get_reports_near_location(longitude, latitude, max_distance)
+    else:
+        bbox = None
+    
+    try:
+        if bbox:
+            reports = Report.get_reports_in_bbox(bbox)
+        else:
+            latitude = float(request.GET.get('lat', 0))
+            longitude = float(request.GET.get('lng', 0))
+            max_distance = int(request.GET.get('distance', 1000))  # meters
+            
+            if latitude == 0 or longitude == 0:
+                return Response(
+                    {'error': 'Latitude and longitude are required'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            reports = Report.get_reports_near_location(longitude, latitude, max_distance)
         
         reports_data = []
         for report in reports:
@@ -389,6 +871,7 @@ def get_reports_near_location(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@query_budget(4)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
 def get_dashboard_stats(request):
@@ -408,7 +891,16 @@ def get_dashboard_stats(request):
         )
     
     try:
-        stats = Report.get_stats()
+        ward_id = request.GET.get('ward')
+        
+        # Every status change moves max(updated_at); archival changes the count
+        updated_at, total = Report.get_change_marker({'ward_id': ward_id} if ward_id else None)
+        etag, last_modified = make_validators('stats', ward_id or '', total, updated_at=updated_at)
+        conditional = not_modified(request, etag, last_modified)
+        if conditional is not None:
+            return conditional
+        
+        stats = Report.get_stats(ward_id=ward_id)
         
         # Calculate resolution rate
         resolution_rate = 0
@@ -423,7 +915,7 @@ def get_dashboard_stats(request):
             'resolution_rate': round(resolution_rate, 2)
         }
         
-        return Response(response_data, status=status.HTTP_200_OK)
+        return set_validators(Response(response_data, status=status.HTTP_200_OK), etag, last_modified)
         
     except Exception as e:
         logger.error(f"Get dashboard stats error: {e}")
@@ -432,6 +924,190 @@ def get_dashboard_stats(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def _summary_report(report):
+    return {
+        'id': str(report['_id']),
+        'description': report.get('description'),
+        'category': report.get('category'),
+        'status': report.get('status'),
+        'ward_id': report.get('ward_id'),
+        'location': report.get('location'),
+        'urgency_count': report.get('urgency_count', 0),
+        'created_at': report.get('created_at'),
+        'updated_at': report.get('updated_at')
+    }
+
+
+def _build_dashboard_summary(ward_id):
+    summary = Report.get_dashboard_summary(ward_id=ward_id)
+    totals = summary['totals']
+    resolution_rate = (totals['resolved'] / totals['total']) * 100 if totals['total'] else 0
+    return {
+        'totals': {**totals, 'resolution_rate': round(resolution_rate, 2)},
+        'by_category': summary['by_category'],
+        'by_ward': summary['by_ward'],
+        'top_urgent': [_summary_report(report) for report in summary['top_urgent']],
+        'recent_activity': [_summary_report(report) for report in summary['recent_activity']],
+        'generated_at': datetime.utcnow()
+    }
+
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_dashboard_summary(request):
+    """Every dashboard panel in one aggregation, cached with stale-while-revalidate - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    ward_id = request.GET.get('ward')
+    try:
+        summary = get_or_refresh(
+            f"dashboard:summary:{ward_id or ''}",
+            lambda: _build_dashboard_summary(ward_id),
+            ttl=settings.DASHBOARD_SUMMARY_TTL,
+            stale_ttl=settings.DASHBOARD_SUMMARY_STALE_TTL,
+            stats=dashboard_summary_stats
+        )
+        return Response(summary, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Get dashboard summary error: {e}")
+        return Response(
+            {'error': 'Failed to get dashboard summary'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_dashboard_timeseries(request):
+    """Report counts per hour/day bucket from the rollup collection - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in ReportRollup.GRANULARITIES:
+        return Response(
+            {'error': 'granularity must be hour or day'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        end = parse_when(request.GET['end'], end_of_day=True) if request.GET.get('end') else datetime.utcnow()
+        start = parse_when(request.GET['start']) if request.GET.get('start') else end - timedelta(days=30)
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        series = ReportRollup.get_timeseries(
+            start, end,
+            granularity=granularity,
+            category=request.GET.get('category'),
+            status=request.GET.get('status'),
+            ward_id=request.GET.get('ward')
+        )
+        return Response({
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'series': series
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Get dashboard timeseries error: {e}")
+        return Response(
+            {'error': 'Failed to get timeseries'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_resolution_sla(request):
+    """Time-to-resolution percentiles per category or ward - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    group_by = request.GET.get('group_by', 'category')
+    if group_by not in ('category', 'ward_id'):
+        return Response(
+            {'error': 'group_by must be category or ward_id'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        percentiles = ResolutionSketch.get_percentiles(
+            category=request.GET.get('category'),
+            ward_id=request.GET.get('ward'),
+            group_by=group_by
+        )
+        return Response(percentiles, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Get resolution SLA error: {e}")
+        return Response(
+            {'error': 'Failed to get resolution times'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
+def get_cache_stats(request):
+    """Get report listing cache hit rate - ADMIN ONLY"""
+    user = CustomJWTAuthentication.get_user_from_token(request)
+    if not user:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    if not user.get('is_admin', False):
+        return Response(
+            {'error': 'Admin access required'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    return Response({
+        'report_list': report_list_stats.snapshot(),
+        'dashboard_summary': dashboard_summary_stats.snapshot(),
+        'jwt_tokens': jwt_token_stats.snapshot(),
+        'idempotency': idempotency_stats.snapshot(),
+        'version': get_cache_version()
+    }, status=status.HTTP_200_OK)
+
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([AllowAny])  # REQUIRE AUTHENTICATION
 def search_reports(request):
@@ -484,6 +1160,7 @@ def search_reports(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@query_budget(1)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
@@ -551,28 +1228,76 @@ from django.views.decorators.csrf import csrf_exempt
 from .models import Report
 from bson.objectid import ObjectId
 
+@rate_limit('mark_urgent')
+@query_budget(1)
 @csrf_exempt
 def mark_urgent(request, report_id):
     if request.method == "POST":
         try:
-            report = Report.collection.find_one({"_id": ObjectId(report_id)})
+            # Atomic increment - no read-modify-write race between concurrent clicks
+            report = Report.increment_urgency(report_id)
             if not report:
                 return JsonResponse({"error": "Report not found"}, status=404)
 
-            # Increment urgency count
-            urgency_count = report.get("urgency_count", 0) + 1
-
-            Report.collection.update_one(
-                {"_id": ObjectId(report_id)},
-                {"$set": {"urgency_count": urgency_count}}
-            )
-
-            return JsonResponse({"message": "Marked as urgent", "urgency_count": urgency_count})
+            return JsonResponse({"message": "Marked as urgent", "urgency_count": report["urgency_count"]})
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "Method not allowed"}, status=405)
 
+def _event_stream(subscription, heartbeat, max_seconds):
+    try:
+        # Reconnect quickly if the connection drops
+        yield 'retry: 3000\n\n'
+        # Streams end after max_seconds so their threads are handed back; the
+        # browser reconnects with Last-Event-ID and misses nothing
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if event is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                continue
+            yield event.encode()
+    finally:
+        report_events.unsubscribe(subscription)
+
+@require_GET
+def stream_reports(request):
+    """Server-Sent Events feed of report created/updated/archived events - AUTHENTICATION REQUIRED"""
+    # EventSource cannot set headers, so the access token may come as ?token=
+    user_id = user_id_from_request(request, query_param='token')
+    user = User.get_by_id(user_id) if user_id else None
+    if not user:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if not user.get('is_active', True):
+        return JsonResponse({'error': 'Account is disabled'}, status=403)
+
+    last_event_id = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id')
+    try:
+        subscription = report_events.subscribe(last_event_id)
+    except TooManySubscribers:
+        response = JsonResponse({'error': 'Too many open streams, please retry shortly'}, status=503)
+        response['Retry-After'] = '30'
+        return response
+    heartbeat = settings.REPORT_EVENTS.get('heartbeat', 15)
+    max_seconds = settings.REPORT_EVENTS.get('max_stream_seconds', 300)
+
+    response = StreamingHttpResponse(
+        _event_stream(subscription, heartbeat, max_seconds), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable nginx response buffering
+    return response
+
+@require_GET
+def metrics(request):
+    """Prometheus scrape endpoint; requires `Authorization: Bearer <METRICS_TOKEN>` when one is set"""
+    token = settings.METRICS.get('token')
+    if token and request.META.get('HTTP_AUTHORIZATION') != f"Bearer {token}":
+        return HttpResponse(status=401)
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 from .database import mongodb
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 @api_view(["DELETE"])
@@ -584,6 +1309,8 @@ def ban_user(request, user_id):
         result = users_collection.delete_one({"_id": ObjectId(user_id)})  # ✅ Cast to ObjectId
 
         if result.deleted_count == 1:
+            # Their reports leave the live collection; delta-sync clients get tombstones
+            Report.archive_user_reports(user_id)
             return Response({"message": "User banned (deleted) successfully."}, status=status.HTTP_200_OK)
         else:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
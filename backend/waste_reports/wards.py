@@ -0,0 +1,180 @@
+"""
+Ward lookup for report coordinates.
+
+Ward polygons are read once from the GeoJSON FeatureCollection at
+settings.WARDS_GEOJSON_PATH into a Sort-Tile-Recursive packed R-tree over
+their bounding boxes. A lookup walks the tree to the few wards whose box
+contains the point and runs an exact ray-casting point-in-polygon test on
+those only, so stamping a report costs microseconds rather than a
+$geoIntersects query per ward.
+"""
+import json
+import logging
+import math
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+NODE_CAPACITY = 16
+
+
+def _ring_contains(ring, x, y):
+    inside = False
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for point in ring:
+        x2, y2 = point[0], point[1]
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _polygon_contains(rings, x, y):
+    """GeoJSON polygon rings: the outer ring, then holes"""
+    if not _ring_contains(rings[0], x, y):
+        return False
+    return not any(_ring_contains(hole, x, y) for hole in rings[1:])
+
+
+def _bounds(polygons):
+    xs = [point[0] for rings in polygons for point in rings[0]]
+    ys = [point[1] for rings in polygons for point in rings[0]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _box_contains(box, x, y):
+    return box[0] <= x <= box[2] and box[1] <= y <= box[3]
+
+
+class Ward:
+    __slots__ = ('ward_id', 'name', 'polygons', 'bbox')
+
+    def __init__(self, ward_id, name, geometry):
+        if geometry['type'] == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            raise ValueError(f"Ward {ward_id}: unsupported geometry type {geometry['type']}")
+        self.ward_id = ward_id
+        self.name = name
+        self.polygons = polygons
+        self.bbox = _bounds(polygons)
+
+    def contains(self, x, y):
+        return any(_polygon_contains(rings, x, y) for rings in self.polygons)
+
+
+class STRTree:
+    """
+    Static R-tree bulk-loaded with Sort-Tile-Recursive packing.
+
+    Items are (bbox, value) pairs with non-list values; query_point() yields
+    the values whose bbox contains the point. Built once, never updated.
+    """
+
+    def __init__(self, items, capacity=NODE_CAPACITY):
+        self.capacity = capacity
+        # Leaves hold items; each upper level holds (bbox, children) nodes
+        level = self._pack(list(items))
+        while len(level) > capacity:
+            level = self._pack(level)
+        self.root = level
+
+    def _pack(self, entries):
+        """Group entries into nodes of `capacity`: sort by x centre into vertical slices, then by y"""
+        if not entries:
+            return []
+        node_count = math.ceil(len(entries) / self.capacity)
+        slice_count = math.ceil(math.sqrt(node_count))
+        slice_size = slice_count * self.capacity
+
+        entries = sorted(entries, key=lambda entry: entry[0][0] + entry[0][2])
+        nodes = []
+        for start in range(0, len(entries), slice_size):
+            column = sorted(entries[start:start + slice_size], key=lambda entry: entry[0][1] + entry[0][3])
+            for offset in range(0, len(column), self.capacity):
+                children = column[offset:offset + self.capacity]
+                bbox = (
+                    min(child[0][0] for child in children),
+                    min(child[0][1] for child in children),
+                    max(child[0][2] for child in children),
+                    max(child[0][3] for child in children),
+                )
+                nodes.append((bbox, children))
+        return nodes
+
+    def query_point(self, x, y):
+        stack = list(self.root)
+        while stack:
+            bbox, payload = stack.pop()
+            if not _box_contains(bbox, x, y):
+                continue
+            if isinstance(payload, list):
+                stack.extend(payload)
+            else:
+                yield payload
+
+
+class WardIndex:
+    def __init__(self, wards):
+        self.wards = {ward.ward_id: ward for ward in wards}
+        self.tree = STRTree((ward.bbox, ward) for ward in wards)
+
+    @classmethod
+    def from_geojson(cls, path, id_property='ward_id', name_property='name'):
+        with open(path, encoding='utf-8') as handle:
+            collection = json.load(handle)
+
+        wards = []
+        for number, feature in enumerate(collection.get('features', [])):
+            properties = feature.get('properties') or {}
+            ward_id = properties.get(id_property, feature.get('id'))
+            if ward_id is None or not feature.get('geometry'):
+                logger.warning(f"Skipping ward feature {number}: missing {id_property} or geometry")
+                continue
+            wards.append(Ward(str(ward_id), properties.get(name_property), feature['geometry']))
+        return cls(wards)
+
+    def locate(self, longitude, latitude):
+        """ward_id containing the point, or None (points on a shared border go to one of the wards)"""
+        for ward in self.tree.query_point(longitude, latitude):
+            if ward.contains(longitude, latitude):
+                return ward.ward_id
+        return None
+
+    def __len__(self):
+        return len(self.wards)
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_ward_index():
+    """The configured WardIndex, loaded on first use; None when no ward file is configured"""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                path = getattr(settings, 'WARDS_GEOJSON_PATH', '')
+                if path:
+                    try:
+                        _index = WardIndex.from_geojson(
+                            path, id_property=getattr(settings, 'WARD_ID_PROPERTY', 'ward_id')
+                        )
+                        logger.info(f"Loaded {len(_index)} wards from {path}")
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error(f"Failed to load wards from {path}: {e}")
+                _index_loaded = True
+    return _index
+
+
+def assign_ward(longitude, latitude):
+    index = get_ward_index()
+    if index is None:
+        return None
+    return index.locate(float(longitude), float(latitude))
@@ -22,6 +22,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'waste_reports.middleware.MetricsMiddleware',  # outermost, so latency covers the whole stack
+    'waste_reports.middleware.QueryBudgetMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -66,12 +68,122 @@ MONGODB_SETTINGS = {
     'db': config('MONGODB_DB', default='waste_tracker')
 }
 
+# Cache (local memory by default; set REDIS_URL to share it between workers)
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'waste-tracker',
+    }
+}
+if REDIS_URL:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+
+# Seconds a public report listing may be served from cache; writes invalidate it immediately
+REPORT_LIST_CACHE_TTL = config('REPORT_LIST_CACHE_TTL', default=60, cast=int)
+# dashboard/summary/ is served from cache for TTL seconds, then stale for up to
+# STALE_TTL more while one background refresh recomputes it
+DASHBOARD_SUMMARY_TTL = config('DASHBOARD_SUMMARY_TTL', default=15, cast=int)
+DASHBOARD_SUMMARY_STALE_TTL = config('DASHBOARD_SUMMARY_STALE_TTL', default=60, cast=int)
+
+# Live report feed (reports/stream/). Change streams are used when MongoDB is a
+# replica set or sharded cluster; otherwise events come from this process's writes.
+REPORT_EVENTS = {
+    'change_streams': config('REPORT_EVENTS_CHANGE_STREAMS', default=True, cast=bool),
+    'history': 1000,        # recent events kept for Last-Event-ID resume
+    'client_buffer': 256,   # per-client backlog before the client is told to resync
+    'heartbeat': 15,        # seconds between keep-alive comments
+    'max_subscribers': 50,  # open streams per process (each holds a server thread); then 503
+    'max_stream_seconds': 300,  # streams end after this and the browser resumes via Last-Event-ID
+}
+
+# Delta sync (reports/changes/)
+DELTA_SYNC = {
+    'settle_seconds': 1,             # newest writes are held back this long
+    'page_size': 500,
+    'tombstone_retention_days': 30,  # older sync tokens get 410 Gone and must resync
+}
+
+# Crew work queue scoring (reports/queue/), see waste_reports/priority.py
+REPORT_PRIORITY = {
+    'urgency_weight': 5.0,          # per "mark urgent"
+    'age_weight_per_hour': 0.1,     # 2.4 points per day open
+    'density_weight': 2.0,          # per open report within density_radius_m
+    'density_radius_m': 250,
+    'category_weights': {
+        'Public Safety': 20,
+        'Sanitation': 15,
+        'Water Supply': 15,
+        'Roads': 10,
+        'Obstructions': 8,
+        'Lighting': 8,
+        'Cleanliness': 5,
+    },
+    'default_category_weight': 5,
+}
+
+# Ward boundaries: a GeoJSON FeatureCollection of (Multi)Polygons. Reports are
+# stamped with the ward_id property of the ward containing them; leave empty to skip.
+WARDS_GEOJSON_PATH = config('WARDS_GEOJSON_PATH', default='')
+WARD_ID_PROPERTY = config('WARD_ID_PROPERTY', default='ward_id')
+
+# In-process grid index answering reports/near/ without a MongoDB round trip
+SPATIAL_INDEX = {
+    'enabled': config('SPATIAL_INDEX_ENABLED', default=True, cast=bool),
+    'cell_degrees': 0.01,       # ~1.1 km grid cells
+    'max_age_seconds': 300,     # rebuild to catch other workers' writes when change streams are off
+    'retry_seconds': 30,        # wait between failed warm-ups
+    'max_scan_cells': 250000,   # wider queries (~5 x 5 degrees) go to MongoDB
+}
+
+# Prometheus endpoint (/metrics); set METRICS_TOKEN to require a bearer token.
+# Metrics are kept per process: with several Gunicorn workers, each scrape
+# sees one worker's counters, which then look like resets. Point
+# METRICS_MULTIPROCESS_DIR at a directory the workers share (emptied on
+# startup) and every worker writes its totals there every flush_seconds for
+# the scrape to sum.
+METRICS = {
+    'token': config('METRICS_TOKEN', default=''),
+    'multiprocess_dir': config('METRICS_MULTIPROCESS_DIR', default=''),
+    'flush_seconds': config('METRICS_FLUSH_SECONDS', default=10, cast=int),
+}
+
+# Password hashing (register/login) runs in spawned worker processes so PBKDF2
+# doesn't tie up request threads; workers=0 hashes inline. When workers plus
+# max_pending hashes are in flight, register/login answer 503 + Retry-After.
+PASSWORD_HASH_POOL = {
+    'workers': config('PASSWORD_HASH_WORKERS', default=2, cast=int),
+    'max_pending': 16,
+    'timeout': 10,          # seconds to wait for a result before answering 503
+    'retry_after': 1,
+}
+
+# Per-request MongoDB query budgets (@query_budget on views). Over-budget requests
+# are logged; strict mode raises instead, so tests fail on query regressions.
+QUERY_BUDGET = {
+    'enabled': True,
+    'strict': config('QUERY_BUDGET_STRICT', default=False, cast=bool),
+}
+
+# Crew route batching (reports/route/)
+ROUTING = {
+    'crew_batch_size': 25,      # stops per crew route
+    'max_stops': 10000,         # cap on open reports pulled for one plan
+}
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (),  # Disable Django's JWT-based user resolution
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'waste_reports.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 
@@ -84,6 +196,46 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Write endpoint rate limits (@rate_limit on views): token buckets per user and
+# per client IP, 'count/period' with period s/m/h/d. Over-limit requests get a
+# 429 + Retry-After before the view runs. backend 'local' keeps buckets in each
+# process; 'cache' shares fixed-window counts through CACHES (set REDIS_URL).
+# trusted_proxies is the number of reverse proxies in front of Django that
+# append to X-Forwarded-For; the client IP is read that many entries from the
+# right. Leaving it at 0 behind a proxy makes every client share the proxy's
+# REMOTE_ADDR, so the per-IP limits (e.g. register) become site-wide limits.
+# Setting it higher than the real number of proxies lets clients pick their IP.
+RATE_LIMITS = {
+    'enabled': config('RATE_LIMITS_ENABLED', default=True, cast=bool),
+    'backend': config('RATE_LIMIT_BACKEND', default='local'),
+    'trusted_proxies': config('RATE_LIMIT_TRUSTED_PROXIES', default=0, cast=int),
+    'endpoints': {
+        'create_report': {'user': '10/minute', 'ip': '30/minute'},
+        'mark_urgent': {'ip': '30/minute'},
+        'register': {'ip': '5/hour'},
+    },
+}
+
+# Idempotency-Key on report creation: the first response is stored for
+# ttl_seconds and replayed to retries (before the rate limiter charges them).
+# Pending keys are not renewed while their request runs: one older than
+# lease_seconds is presumed abandoned and can be taken over, so keep it well
+# above the slowest create. Completed responses are also kept in a
+# per-process LRU of local_entries
+IDEMPOTENCY = {
+    'enabled': config('IDEMPOTENCY_ENABLED', default=True, cast=bool),
+    'ttl_seconds': config('IDEMPOTENCY_TTL_SECONDS', default=86400, cast=int),
+    'lease_seconds': 60,
+    'local_entries': 1000,
+}
+
+# Validated access tokens are remembered (by SHA-256 digest) until their exp,
+# so repeat calls skip the signature check; the user is still loaded each time
+JWT_TOKEN_CACHE = {
+    'enabled': config('JWT_TOKEN_CACHE_ENABLED', default=True, cast=bool),
+    'max_entries': 10000,
+}
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -126,24 +278,28 @@ USE_TZ = True
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Logging
+# Logging: request threads only enqueue records, a listener thread does the I/O (waste_reports/log_handlers.py)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'waste_tracker.log',
-        },
-        'console': {
+        'async': {
             'level': 'INFO',
-            'class': 'logging.StreamHandler',
+            'class': 'waste_reports.log_handlers.QueueLogHandler',
+            'filename': config('LOG_FILE', default='waste_tracker.log'),
+            'max_bytes': config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int),
+            'backup_count': config('LOG_BACKUP_COUNT', default=5, cast=int),
+            # 'size' rotates LOG_FILE in-process; forked (--preload) workers each get LOG_FILE.<pid>.
+            # Several workers that each load the app must use 'external' (logrotate) instead
+            'rotation': config('LOG_ROTATION', default='size'),
+            'console': True,
+            'json': config('LOG_JSON', default=False, cast=bool),
+            'queue_size': 10000,    # records beyond this are dropped (counted on /metrics)
         },
     },
     'loggers': {
         'waste_reports': {
-            'handlers': ['file', 'console'],
+            'handlers': ['async'],
             'level': 'INFO',
             'propagate': True,
         },
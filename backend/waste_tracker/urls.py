@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from waste_reports.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('waste_reports.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 if settings.DEBUG: